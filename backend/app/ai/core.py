@@ -1,8 +1,10 @@
 
+import time
 from typing import Any, Dict, List, Optional
 from pydantic import BaseModel
-import openai
 from app.core.config import settings
+from app.core.metrics import LLM_LATENCY, LLM_TOKENS, TOOL_LATENCY
+from app.core.tracing import annotate, span, traced
 from app.ai.mcp_client import mcp_manager
 
 # Note: We will use a simplified Agent structure here.
@@ -18,6 +20,8 @@ class BaseAgent:
     def __init__(self, model: str = "gpt-4-turbo-preview"):
         self.model = model
         self.provider = model_gateway.get_provider_client(model)
+        import openai # deferred: the SDK takes longer to import than the rest of the app
+
         self.client = openai.AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
         self.system_prompt = "You are a helpful AI assistant with access to external tools via MCP."
 
@@ -167,7 +171,9 @@ class BaseAgent:
                         "type": "object",
                         "properties": {
                             "task_name": {"type": "string", "description": "Name of the task (e.g., 'scrape_rss')"},
-                            "python_code": {"type": "string", "description": "Complete, valid Python code to execute."}
+                            "python_code": {"type": "string", "description": "Complete, valid Python code to execute."},
+                            "pure": {"type": "boolean", "description": "True if the output depends only on the code and inputs (no network, clock or randomness), so results can be reused."},
+                            "inputs": {"type": "object", "description": "Optional JSON inputs, available to the script as json.loads(sys.argv[1])."}
                         },
                         "required": ["task_name", "python_code"]
                     }
@@ -177,12 +183,15 @@ class BaseAgent:
         
         return openai_tools + internal_tools
 
+    @traced("agent.chat")
     async def chat(self, user_message: str) -> AgentResponse:
         """
         Process a user message, determine if tools are needed, and return a response.
         Executes internal tools 'In Process' for single-prompt capabilities.
         """
+        annotate(model=self.model, provider=self.provider)
         tools = await self._get_tools_schema()
+        tool_names = {tool["function"]["name"] for tool in tools}
         
         messages = [
             {"role": "system", "content": self.system_prompt},
@@ -198,11 +207,12 @@ class BaseAgent:
             # For simplicity in this demo, we just pass the prompt
             async with httpx.AsyncClient() as client:
                 try:
-                    ollama_res = await client.post("http://localhost:11434/api/chat", json={
-                        "model": "llama3", # Default local model
-                        "messages": messages,
-                        "stream": False
-                    }, timeout=60.0)
+                    with LLM_LATENCY.time("llama3", provider), span("llm.chat", model="llama3", provider=provider):
+                        ollama_res = await client.post("http://localhost:11434/api/chat", json={
+                            "model": "llama3", # Default local model
+                            "messages": messages,
+                            "stream": False
+                        }, timeout=60.0)
                     if ollama_res.status_code == 200:
                         data = ollama_res.json()
                         message = type('obj', (object,), {'content': data['message']['content'], 'tool_calls': []})
@@ -212,12 +222,16 @@ class BaseAgent:
                      message = type('obj', (object,), {'content': f"Local AI unavailable: {str(e)}", 'tool_calls': []})
         else:
             # Standard OpenAI/Compatible API
-            response = await self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                tools=tools if tools else None,
-                tool_choice="auto" if tools else None
-            )
+            with LLM_LATENCY.time(self.model, provider), span("llm.chat", model=self.model, provider=provider):
+                response = await self.client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    tools=tools if tools else None,
+                    tool_choice="auto" if tools else None
+                )
+            if response.usage is not None:
+                LLM_TOKENS.labels(self.model, "prompt").inc(response.usage.prompt_tokens or 0)
+                LLM_TOKENS.labels(self.model, "completion").inc(response.usage.completion_tokens or 0)
             message = response.choices[0].message
         
         # If tool calls are requested
@@ -238,55 +252,73 @@ class BaseAgent:
                 args = json.loads(tool_call.function.arguments)
                 
                 result = None
-                
-                if fn_name == "provision_hosting":
-                    result = await provisioning_service.provision_space("user_auto", args.get("project_name"), args.get("tech_stack"))
-                    content_response += f"✅ Successfully provisioned {args.get('project_name')} ({args.get('tech_stack')}). URL: {result.url}\n"
+                tool_status = "error"
+                tool_started = time.perf_counter()
+                with span(f"tool.{fn_name}"):
+                    try:
+                        if fn_name == "provision_hosting":
+                            result = await provisioning_service.provision_space("user_auto", args.get("project_name"), args.get("tech_stack"))
+                            content_response += f"✅ Successfully provisioned {args.get('project_name')} ({args.get('tech_stack')}). URL: {result.url}\n"
                     
-                elif fn_name == "check_domain_availability":
-                    results = await domain_service.check_availability(args.get("keyword"))
-                    avail = [d.domain for d in results if d.available]
-                    content_response += f"🔎 Domain Check: Available: {', '.join(avail[:3])}\n"
+                        elif fn_name == "check_domain_availability":
+                            results = await domain_service.check_availability(args.get("keyword"))
+                            avail = [d.domain for d in results if d.available]
+                            content_response += f"🔎 Domain Check: Available: {', '.join(avail[:3])}\n"
 
-                elif fn_name == "deploy_k3s_cluster":
-                   # Mock node
-                   from app.services.node_manager import ServerNode
-                   node = ServerNode(ip=args.get("node_ip"), name=args.get("node_name", "k3s-master"))
-                   res = await k3s_manager.bootstrap_master(node)
-                   content_response += f"☸️  K3s Cluster '{res.name}' deployed (Status: {res.status}).\n"
+                        elif fn_name == "deploy_k3s_cluster":
+                           # Mock node
+                           from app.services.node_manager import ServerNode
+                           node = ServerNode(ip=args.get("node_ip"), name=args.get("node_name", "k3s-master"))
+                           res = await k3s_manager.bootstrap_master(node)
+                           content_response += f"☸️  K3s Cluster '{res.name}' deployed (Status: {res.status}).\n"
 
-                elif fn_name == "create_gcp_server":
-                   from app.services.gcp_manager import gcp_manager
-                   res = await gcp_manager.create_free_tier_instance(args.get("project_id"), args.get("instance_name"))
-                   content_response += f"☁️  Google Cloud: Server '{res.name}' created at {res.ip_address} ({res.machine_type}).\n"
+                        elif fn_name == "create_gcp_server":
+                           from app.services.gcp_manager import gcp_manager
+                           res = await gcp_manager.create_free_tier_instance(args.get("project_id"), args.get("instance_name"))
+                           content_response += f"☁️  Google Cloud: Server '{res.name}' created at {res.ip_address} ({res.machine_type}).\n"
                    
-                elif fn_name == "search_nearby_business":
-                    from app.services.data.google import google_service
-                    res = await google_service.search_nearby_business(args.get("keyword"), args.get("location", "37.7749,-122.4194"))
-                    names = [p.name for p in res]
-                    content_response += f"📍 Found {len(res)} businesses near you: {', '.join(names[:3])}...\n"
+                        elif fn_name == "search_nearby_business":
+                            from app.services.data.google import google_service
+                            location = args.get("location") or "37.7749,-122.4194"
+                            try:
+                                res = await google_service.search_nearby_business(args.get("keyword"), location)
+                            except ValueError:
+                                # Free-text places ("Hyderabad") are not geocoded
+                                res = None
+                                content_response += f"📍 Could not search near '{location}': please give the location as 'lat,lng'.\n"
+                            if res is not None:
+                                names = [p.name for p in res]
+                                content_response += f"📍 Found {len(res)} businesses near you: {', '.join(names[:3])}...\n"
 
-                elif fn_name == "search_social_identity":
-                    from app.services.data.social import social_service
-                    res = await social_service.search_social_identity(args.get("query"))
-                    found = [f"{p.platform}: {p.username}" for p in res]
-                    content_response += f"👥 Social Identities Found: {', '.join(found)}\n"
+                        elif fn_name == "search_social_identity":
+                            from app.services.data.social import social_service
+                            res = await social_service.search_social_identity(args.get("query"))
+                            found = [f"{p.platform}: {p.username}" for p in res]
+                            content_response += f"👥 Social Identities Found: {', '.join(found)}\n"
                     
-                elif fn_name == "lookup_phone":
-                    from app.services.data.identity import identity_service
-                    res = await identity_service.lookup_phone(args.get("phone_number"))
-                    content_response += f"📞 Caller ID Result: {res.get('name')} ({res.get('carrier')})\n"
+                        elif fn_name == "lookup_phone":
+                            from app.services.data.identity import identity_service
+                            res = await identity_service.lookup_phone(args.get("phone_number"))
+                            content_response += f"📞 Caller ID Result: {res.get('name')} ({res.get('carrier')})\n"
                 
-                elif fn_name == "search_products":
-                    from app.services.data.commerce import commerce_service
-                    res = await commerce_service.search_products(args.get("keyword"))
-                    found_strs = [f"{p.store}: {p.title} - {p.price} {p.currency}" for p in res[:3]]
-                    content_response += f"🛒 Commerce Results: {', '.join(found_strs)}\n"
+                        elif fn_name == "search_products":
+                            from app.services.data.commerce import commerce_service
+                            res = await commerce_service.search_products(args.get("keyword"))
+                            found_strs = [f"{p.store}: {p.title} - {p.price} {p.currency}" for p in res[:3]]
+                            content_response += f"🛒 Commerce Results: {', '.join(found_strs)}\n"
                 
-                elif fn_name == "generate_workflow":
-                    from app.services.workflow import workflow_engine
-                    res = await workflow_engine.generate_and_execute(args.get("task_name"), args.get("python_code"))
-                    content_response += f"🧬 Autonomous Workflow '{res.filename}' finished ({res.status}).\nOutput:\n{res.output}\n"
+                        elif fn_name == "generate_workflow":
+                            from app.services.workflow import workflow_engine
+                            res = await workflow_engine.generate_and_execute(
+                                args.get("task_name"), args.get("python_code"),
+                                pure=bool(args.get("pure")), inputs=args.get("inputs"),
+                            )
+                            content_response += f"🧬 Autonomous Workflow '{args.get('task_name')}' finished ({res.status}{', cached' if res.cached else ''}).\nOutput:\n{res.output}\n"
+                        tool_status = "ok"
+                    finally:
+                        # The name comes from the model: only registered tools get their own series
+                        tool_label = fn_name if fn_name in tool_names else "unknown"
+                        TOOL_LATENCY.labels(tool_label, tool_status).observe(time.perf_counter() - tool_started)
 
                 # Record the call
                 tool_calls_data.append({
@@ -1,10 +1,11 @@
 
 import asyncio
+import logging
 from typing import Any, Dict, List, Optional
-from mcp import ClientSession, StdioServerParameters
-from mcp.client.stdio import stdio_client
 from pydantic import BaseModel
 
+logger = logging.getLogger(__name__)
+
 class ToolDefinition(BaseModel):
     name: str
     description: str
@@ -16,18 +17,23 @@ class MCPClientWrapper:
     Allows the AI agent to connect to external tools standardized by MCP.
     """
     def __init__(self, command: str, args: List[str], env: Optional[Dict[str, str]] = None):
+        from mcp import StdioServerParameters # deferred with the rest of the SDK
+
         self.server_params = StdioServerParameters(
             command=command,
             args=args,
             env=env
         )
-        self.session: Optional[ClientSession] = None
+        self.session = None # mcp.ClientSession once connected
         self._exit_stack = None
 
     async def connect(self):
         """Connect to the MCP server."""
         # Note: In a real implementation, we would manage the context manager properly.
         # This is a simplified pattern for demonstration/integration.
+        from mcp import ClientSession
+        from mcp.client.stdio import stdio_client
+
         self.ctx = stdio_client(self.server_params)
         self.read, self.write = await self.ctx.__aenter__()
         self.session = ClientSession(self.read, self.write)
@@ -75,7 +81,7 @@ class MCPManager:
         client = MCPClientWrapper(command, args, env)
         await client.connect()
         self.clients[name] = client
-        print(f"✅ Registered MCP Server: {name}")
+        logger.info("Registered MCP server %s", name)
 
     async def get_all_tools(self) -> List[ToolDefinition]:
         all_tools = []
@@ -84,7 +90,7 @@ class MCPManager:
                 tools = await client.list_tools()
                 all_tools.extend(tools)
             except Exception as e:
-                print(f"Error fetching tools from client: {e}")
+                logger.warning("Fetching tools from an MCP server failed: %s", e)
         return all_tools
 
     async def cleanup(self):
@@ -11,6 +11,7 @@ from passlib.context import CryptContext
 from pydantic import BaseModel, EmailStr
 from sqlalchemy.orm import Session
 from app.core.database import get_db, User as DBUser
+from app.core.logs import bind
 import os
 
 # Security configuration
@@ -106,4 +107,10 @@ async def get_current_user(
     user = get_user_by_email(db, email=token_data.email)
     if user is None:
         raise credentials_exception
+    bind(user=user.id)
     return user
+
+async def get_current_superuser(current_user: DBUser = Depends(get_current_user)) -> DBUser:
+    if not current_user.is_superuser:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin privileges required")
+    return current_user
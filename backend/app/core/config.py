@@ -1,5 +1,5 @@
 
-from typing import List, Union
+from typing import Any, Dict, List, Union
 from pydantic import AnyHttpUrl, field_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -27,6 +27,78 @@ class Settings(BaseSettings):
     OPENAI_API_KEY: str | None = None
     ANTHROPIC_API_KEY: str | None = None
     
+    # Google Maps Platform (Places); without a key the mock data is used
+    GOOGLE_MAPS_API_KEY: str | None = None
+    GOOGLE_PLACES_URL: str = "https://maps.googleapis.com/maps/api/place"
+    PLACES_CACHE_TTL: float = 900.0 # seconds a searched cell stays fresh
+    PLACES_DETAILS_RATE: float = 10.0 # Place Details requests/second
+
+    # Domains: RDAP server per extension (JSON), e.g. {".com": "https://rdap.verisign.com/com/v1"}
+    DOMAIN_RDAP_SERVERS: Dict[str, str] = {}
+    DOMAIN_RDAP_RATE: float = 5.0 # requests/second per RDAP server
+    DOMAIN_TAKEN_INDEX_PATH: str | None = None # built with `python -m app.services.domain`
+
+    # Commerce
+    COMMERCE_CACHE_TTL: float = 300.0 # seconds a store's results are reused
+    PRICE_HISTORY_DIR: str = "data/price_history"
+
+    # Social lookups: platform -> {"url", "rate", "keys", "key_rate"} (JSON); empty = mock adapters
+    SOCIAL_PLATFORMS: Dict[str, Dict[str, Any]] = {}
+
+    # Identity bulk lookups: local result store
+    IDENTITY_STORE_PATH: str = "data/identity.sqlite3"
+    IDENTITY_CACHE_TTL: float = 7 * 86400 # seconds a stored lookup is reused
+    IDENTITY_DEFAULT_COUNTRY_CODE: str = "91" # for numbers uploaded without one
+
+    # Workflow execution: warm, sandboxed worker processes
+    WORKFLOW_POOL_SIZE: int = 2 # pre-started spare workers
+    WORKFLOW_MAX_CONCURRENCY: int = 4
+    WORKFLOW_TIMEOUT: float = 30.0 # wall-time seconds per script
+    WORKFLOW_CPU_SECONDS: int = 20
+    WORKFLOW_MEMORY_MB: int = 512
+    WORKFLOW_ISOLATE_NETWORK: bool = True # private network namespace where the kernel allows it
+    WORKFLOW_MEMO_TTL: float = 3600 # seconds a pure workflow's result is reused
+    WORKFLOW_MEMO_SIZE: int = 256
+
+    # App store catalog file (defaults to the bundled app/data/app_catalog.json)
+    APP_CATALOG_PATH: str | None = None
+    APP_TRAEFIK_NETWORK: str = "traefik" # docker network shared by Traefik and routed containers
+    APP_SECRETS_DIR: str = "/var/lib/ksfoundation/secrets" # per-deployment passwords on each node
+    # Image prefetch: pull popular app images onto nodes ahead of deploys
+    PREFETCH_IDLE_HOURS: str = "1-6" # UTC hours, e.g. "1-6,22-24"
+    PREFETCH_BUDGET_MB: int = 20_000 # pulled per node fleet per UTC day
+    PREFETCH_TOP_N: int = 10
+    PREFETCH_REGISTRY_URL: str | None = None # registry mirror for digest lookups
+
+    # Firewall: local GeoIP CIDR dataset (`network,country_code` per line)
+    GEOIP_CIDR_PATH: str | None = None
+
+    # Tracing: recent request traces kept in memory; optional OTLP/HTTP collector
+    TRACE_BUFFER_SIZE: int = 1000
+    TRACE_OTLP_ENDPOINT: str | None = None # e.g. http://localhost:4318/v1/traces
+
+    # Logging: JSON lines written by a background thread; DEBUG lines sampled at this rate
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "json" # or "text"
+    LOG_DEBUG_SAMPLE_RATE: float = 1.0 # 0.01 keeps 1 in 100 per call site
+    LOG_QUEUE_SIZE: int = 10_000 # records beyond this are dropped, not waited on
+
+    # Diagnostics: log the event loop's stack when it is blocked for longer than this (0 = off)
+    LOOP_LAG_THRESHOLD_MS: float = 100
+
+    # Request quotas: token buckets per user (JWT subject, else client IP), shared through Redis with "redis"
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_BACKEND: str = "memory" # or "redis" (REDIS_URL) to share limits between workers and nodes
+    RATE_LIMIT_USER_RATE: float = 20.0 # requests/second per user across all routes
+    RATE_LIMIT_USER_BURST: float = 100.0
+    # "METHOD /path" -> {"rate", "burst", "concurrency"} per user (JSON); concurrency = requests in flight
+    RATE_LIMIT_ROUTES: Dict[str, Dict[str, float]] = {
+        "POST /api/v1/agent/chat": {"rate": 0.5, "burst": 10, "concurrency": 2},
+        "POST /api/v1/hosting/provision": {"rate": 0.1, "burst": 5, "concurrency": 1},
+        "POST /api/v1/apps/{app_id}/deploy": {"rate": 0.1, "burst": 5, "concurrency": 1},
+    }
+    RATE_LIMIT_LEASE_TTL: float = 900 # seconds a concurrency slot outlives a crashed node (redis)
+
     # Redis
     REDIS_URL: str = "redis://localhost:6379/0"
 
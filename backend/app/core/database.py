@@ -2,6 +2,7 @@
 Database configuration and models
 SQLite database with SQLAlchemy ORM
 """
+import logging
 from sqlalchemy import create_engine, Column, String, DateTime, Boolean
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
@@ -9,6 +10,8 @@ from datetime import datetime
 import uuid
 import os
 
+logger = logging.getLogger(__name__)
+
 # Database URL
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./ksf_ai.db")
 
@@ -24,6 +27,10 @@ engine = create_engine(
     connect_args=connect_args
 )
 
+# Time every statement for /metrics
+from app.core.metrics import instrument_engine
+instrument_engine(engine)
+
 # Session
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -54,7 +61,10 @@ def get_db():
 # Create all tables
 def init_db():
     Base.metadata.create_all(bind=engine)
-    print("✅ Database tables created successfully")
+    logger.info("Database tables created")
 
 if __name__ == "__main__":
+    from app.core.logs import configure_logging, shutdown_logging
+    configure_logging(fmt="text")
     init_db()
+    shutdown_logging()
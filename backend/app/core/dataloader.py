@@ -0,0 +1,73 @@
+"""
+Dataloader-style request batching.
+"""
+import asyncio
+from typing import Awaitable, Callable, Dict, Generic, Hashable, List, Optional, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+class DataLoader(Generic[K, V]):
+    """
+    Collects `load(key)` calls made within `window` seconds, deduplicates the
+    keys and resolves them with one `batch_fn(keys)` call per `max_batch` keys.
+    Every caller awaits its own future; keys missing from the batch result
+    resolve to None, and a key mapped to an exception raises it for that key's
+    callers only. If `batch_fn` itself fails, every key in the batch fails.
+    """
+
+    def __init__(self, batch_fn: Callable[[List[K]], Awaitable[Dict[K, V]]], window: float = 0.005, max_batch: int = 100):
+        self.batch_fn = batch_fn
+        self.window = window
+        self.max_batch = max_batch
+        self._pending: Dict[K, asyncio.Future] = {}
+        self._scheduled: Optional[asyncio.TimerHandle] = None
+        self.batches = 0
+        self.loads = 0
+
+    def load(self, key: K) -> "asyncio.Future[Optional[V]]":
+        self.loads += 1
+        future = self._pending.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._pending[key] = future
+            if len(self._pending) >= self.max_batch:
+                self._dispatch()
+            elif self._scheduled is None:
+                self._scheduled = loop.call_later(self.window, self._dispatch)
+        return asyncio.shield(future)
+
+    async def load_many(self, keys: List[K]) -> List[Optional[V]]:
+        return list(await asyncio.gather(*(self.load(key) for key in keys)))
+
+    def _dispatch(self) -> None:
+        if self._scheduled is not None:
+            self._scheduled.cancel()
+            self._scheduled = None
+        pending, self._pending = self._pending, {}
+        if pending:
+            self.batches += 1
+            asyncio.get_running_loop().create_task(self._run(pending))
+
+    async def _run(self, pending: Dict[K, asyncio.Future]) -> None:
+        try:
+            results = await self.batch_fn(list(pending))
+        except BaseException as e:
+            for future in pending.values():
+                if not future.done():
+                    if isinstance(e, asyncio.CancelledError):
+                        future.cancel()
+                    else:
+                        future.set_exception(e)
+            if not isinstance(e, Exception):
+                raise
+            return
+        for key, future in pending.items():
+            if future.done():
+                continue
+            result = results.get(key)
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
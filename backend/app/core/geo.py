@@ -0,0 +1,98 @@
+"""
+Geohash cells and distance helpers for location caches.
+"""
+import math
+from typing import List, Tuple
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+_DECODE = {c: i for i, c in enumerate(_BASE32)}
+EARTH_RADIUS_M = 6_371_008.8
+
+def encode(lat: float, lng: float, precision: int = 6) -> str:
+    lat_lo, lat_hi, lng_lo, lng_hi = -90.0, 90.0, -180.0, 180.0
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        if even:
+            mid = (lng_lo + lng_hi) / 2
+            value = value * 2 + (lng >= mid)
+            lng_lo, lng_hi = (mid, lng_hi) if lng >= mid else (lng_lo, mid)
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            value = value * 2 + (lat >= mid)
+            lat_lo, lat_hi = (mid, lat_hi) if lat >= mid else (lat_lo, mid)
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits, value = 0, 0
+    return "".join(chars)
+
+def bbox(cell: str) -> Tuple[float, float, float, float]:
+    """(lat_min, lat_max, lng_min, lng_max) of a geohash cell."""
+    lat_lo, lat_hi, lng_lo, lng_hi = -90.0, 90.0, -180.0, 180.0
+    even = True
+    for char in cell:
+        value = _DECODE[char]
+        for shift in range(4, -1, -1):
+            bit = (value >> shift) & 1
+            if even:
+                mid = (lng_lo + lng_hi) / 2
+                lng_lo, lng_hi = (mid, lng_hi) if bit else (lng_lo, mid)
+            else:
+                mid = (lat_lo + lat_hi) / 2
+                lat_lo, lat_hi = (mid, lat_hi) if bit else (lat_lo, mid)
+            even = not even
+    return lat_lo, lat_hi, lng_lo, lng_hi
+
+def center(cell: str) -> Tuple[float, float]:
+    lat_lo, lat_hi, lng_lo, lng_hi = bbox(cell)
+    return (lat_lo + lat_hi) / 2, (lng_lo + lng_hi) / 2
+
+def cell_size(precision: int) -> Tuple[float, float]:
+    """(lat_degrees, lng_degrees) spanned by a cell of this precision."""
+    bits = 5 * precision
+    return 180.0 / (1 << (bits // 2)), 360.0 / (1 << (bits - bits // 2))
+
+def distance_m(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Haversine distance in meters."""
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lng2 - lng1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+def cells_in_radius(lat: float, lng: float, radius_m: float, precision: int) -> List[str]:
+    """Geohash cells of `precision` intersecting the circle around (lat, lng)."""
+    lat_step, lng_step = cell_size(precision)
+    dlat = math.degrees(radius_m / EARTH_RADIUS_M)
+    dlng = dlat / max(math.cos(math.radians(lat)), 1e-6)
+    lat_min, lat_max = max(-90.0, lat - dlat), min(90.0, lat + dlat)
+    lng_min, lng_max = max(-180.0, lng - dlng), min(180.0, lng + dlng)
+
+    cells = []
+    row = math.floor((lat_min + 90.0) / lat_step)
+    while row * lat_step - 90.0 <= lat_max:
+        cell_lat = min(89.999999, row * lat_step - 90.0 + lat_step / 2)
+        col = math.floor((lng_min + 180.0) / lng_step)
+        while col * lng_step - 180.0 <= lng_max:
+            cell_lng = min(179.999999, col * lng_step - 180.0 + lng_step / 2)
+            cell = encode(cell_lat, cell_lng, precision)
+            lat_lo, lat_hi, lng_lo, lng_hi = bbox(cell)
+            # Closest point of the cell to the centre
+            near_lat = min(max(lat, lat_lo), lat_hi)
+            near_lng = min(max(lng, lng_lo), lng_hi)
+            if distance_m(lat, lng, near_lat, near_lng) <= radius_m and cell not in cells:
+                cells.append(cell)
+            col += 1
+        row += 1
+    return cells
+
+def parse_location(location: str) -> Tuple[float, float]:
+    """Parses a "lat,lng" string."""
+    try:
+        lat_text, lng_text = location.split(",")
+        lat, lng = float(lat_text), float(lng_text)
+    except ValueError:
+        raise ValueError(f"Invalid location '{location}', expected 'lat,lng'")
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        raise ValueError(f"Location out of range: '{location}'")
+    return lat, lng
@@ -0,0 +1,80 @@
+"""
+Conditional responses for read-mostly endpoints.
+
+Each cached response is the rendered body plus the data version it was
+rendered from. While the endpoint's data is unchanged (same version),
+requests reuse the bytes, and `If-None-Match` / `If-Modified-Since` get a
+304 without serializing anything. The ETag is a hash of the body, so it
+is stable across workers and restarts. Re-rendering identical content
+keeps the old ETag and Last-Modified.
+"""
+import hashlib
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Any, Callable, Hashable, Optional
+from starlette.requests import Request
+from starlette.responses import Response
+from app.core.cache import TTLCache
+
+class _Rendered:
+    __slots__ = ("version", "body", "etag", "last_modified")
+
+    def __init__(self, version: Any, body: bytes, etag: str, last_modified: float):
+        self.version = version
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+
+class HTTPCache:
+    """Rendered bodies keyed by endpoint and parameters; LRU-bounded, idle entries expire after `ttl`."""
+
+    def __init__(self, maxsize: int = 1_024, ttl: float = 3600.0):
+        self._entries = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def respond(self, request: Request, key: Hashable, version: Any, render: Callable[[], bytes],
+                max_age: int = 0, last_modified: Optional[float] = None) -> Response:
+        """
+        `version` is anything that compares equal while the data is unchanged
+        (a catalog object, the result list itself); `render` is only called
+        when it differs from the cached one. `max_age=0` makes clients
+        revalidate on every use.
+        """
+        entry = self._entries.get(key)
+        if entry is None or entry.version != version:
+            body = render()
+            etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+            if entry is not None and entry.etag == etag:
+                modified = entry.last_modified
+            else:
+                modified = last_modified if last_modified is not None else time.time()
+            entry = _Rendered(version, body, etag, modified)
+        self._entries.set(key, entry)
+
+        headers = {
+            "ETag": entry.etag,
+            "Last-Modified": formatdate(entry.last_modified, usegmt=True),
+            "Cache-Control": f"public, max-age={max_age}" if max_age else "no-cache",
+        }
+        if _not_modified(request, entry):
+            return Response(status_code=304, headers=headers)
+        return Response(entry.body, media_type="application/json", headers=headers)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+def _not_modified(request: Request, entry: _Rendered) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # Weak comparison (RFC 9110 13.1.2); If-Modified-Since is ignored when this is present
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or entry.etag in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since).timestamp()
+    except (TypeError, ValueError):
+        return False
+    return int(entry.last_modified) <= since
+
+http_cache = HTTPCache()
@@ -0,0 +1,70 @@
+"""
+Lazily constructed service singletons.
+"""
+import asyncio
+import logging
+import threading
+from typing import Any, Callable, Generic, List, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+class Provider(Generic[T]):
+    """
+    Builds a service on first use instead of at import time, so importing
+    the app does not create Docker clients, SDK sessions or directories.
+    Attribute access is forwarded to the service, so a module-level
+    provider is used exactly like the singleton it replaces.
+    `close_all()` (from the app lifespan) shuts down the services that
+    were built, using each one's `close_method`.
+    """
+
+    _providers: List["Provider"] = []
+
+    def __init__(self, factory: Callable[[], T], close_method: Optional[str] = None):
+        object.__setattr__(self, "_factory", factory)
+        object.__setattr__(self, "_close_method", close_method)
+        object.__setattr__(self, "_instance", None)
+        object.__setattr__(self, "_lock", threading.Lock())
+        Provider._providers.append(self)
+
+    @property
+    def initialized(self) -> bool:
+        return self._instance is not None
+
+    def get(self) -> T:
+        if self._instance is None:
+            with self._lock:
+                if self._instance is None:
+                    object.__setattr__(self, "_instance", self._factory())
+        return self._instance
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.get(), name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        setattr(self.get(), name, value)
+
+    def __delattr__(self, name: str) -> None:
+        delattr(self.get(), name)
+
+    async def close(self) -> None:
+        """Closes the service if it was built; the next use builds a fresh one."""
+        with self._lock:
+            instance = self._instance
+            object.__setattr__(self, "_instance", None)
+        if instance is None or self._close_method is None:
+            return
+        result = getattr(instance, self._close_method)()
+        if asyncio.iscoroutine(result):
+            await result
+
+    @classmethod
+    async def close_all(cls) -> None:
+        for provider in cls._providers:
+            name = type(provider._instance).__name__
+            try:
+                await provider.close()
+            except Exception as e:
+                logger.warning("Shutdown: closing %s failed: %s", name, e)
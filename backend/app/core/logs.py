@@ -0,0 +1,187 @@
+"""
+Structured, non-blocking logging.
+
+Log calls only build a record and put it on a bounded queue; a
+QueueListener thread formats it as one JSON line and writes it, so a slow
+stdout or log collector never blocks the event loop. When the queue is
+full, records are dropped (and counted) rather than waited on. Records
+made while serving a request carry its request id, route and user, and
+high-volume DEBUG lines can be sampled.
+"""
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, Optional, TextIO
+from app.core.metrics import Counter, route_template
+from app.core.tracing import current_request_id
+
+LOGS_DROPPED = Counter("log_records_dropped_total", "Log records dropped because the log queue was full.")
+
+# Per-request fields; the dict is shared with child tasks, so `bind()` from a dependency shows up everywhere
+_request_context: ContextVar[Optional[Dict[str, Any]]] = ContextVar("log_request_context", default=None)
+
+# Attributes every LogRecord has; anything else was passed through `extra=`
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+_CONTEXT_FIELDS = ("request_id", "route", "user", "sampled")
+# Libraries that log every outgoing request at INFO
+QUIET_LOGGERS = ("httpx", "httpcore")
+
+def bind(**fields: Any) -> None:
+    """Adds fields (e.g. `user`) to every log record of the current request."""
+    context = _request_context.get()
+    if context is not None:
+        context.update(fields)
+
+class RequestContextFilter(logging.Filter):
+    """
+    Stamps records with the request id, route and user. Handler filters run
+    where the record is made, so the request's contextvars are visible.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = current_request_id()
+        context = _request_context.get()
+        if context is not None:
+            scope = context.get("scope")
+            record.route = route_template(scope) if scope is not None and "route" in scope else None
+            record.user = context.get("user")
+        return True
+
+class DebugSampler(logging.Filter):
+    """
+    Keeps the first and then every n-th DEBUG record per call site
+    (logger + message template); kept records carry `sampled=n` so counts
+    can be scaled back up. Higher levels always pass.
+    """
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.every = max(1, round(1 / rate)) if rate > 0 else 0
+        self._counts: Dict[tuple, int] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or self.every == 1:
+            return True
+        if self.every == 0:
+            return False
+        key = (record.name, record.msg)
+        count = self._counts.get(key, 0)
+        self._counts[key] = count + 1
+        if count % self.every:
+            return False
+        record.sampled = self.every
+        return True
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS and value is not None:
+                entry[key] = value
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+class TextFormatter(logging.Formatter):
+    """Human-readable lines for local development."""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)-7s %(name)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        context = " ".join(f"{k}={getattr(record, k)}" for k in _CONTEXT_FIELDS if getattr(record, k, None))
+        return f"{line} [{context}]" if context else line
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops (and counts) records instead of blocking when the queue is full."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Merge args and render tracebacks now (they may change or vanish), but leave
+        # the JSON formatting to the listener thread. The record is not copied: the
+        # merged message reads the same to any other handler.
+        record.msg, record.args = record.getMessage(), None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        record.stack_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOGS_DROPPED.inc()
+
+class LogContextMiddleware:
+    """Opens the per-request log context that `bind()` and RequestContextFilter use."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = _request_context.set({"scope": scope})
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _request_context.reset(token)
+
+class _Listener(logging.handlers.QueueListener):
+    def enqueue_sentinel(self) -> None:
+        # Wait for room: the stop sentinel must not be dropped like a record
+        self.queue.put(self._sentinel)
+
+_listener: Optional[_Listener] = None
+_lock = threading.Lock()
+
+def configure_logging(level: str = "INFO", fmt: str = "json", debug_sample_rate: float = 1.0,
+                      queue_size: int = 10_000, stream: Optional[TextIO] = None) -> _Listener:
+    """
+    Routes the root logger through the queue pipeline (replacing an earlier
+    configuration). Call `shutdown_logging()` to flush on exit.
+    """
+    global _listener
+    with _lock:
+        _stop_listener()
+        records: queue.Queue = queue.Queue(maxsize=queue_size)
+        output = logging.StreamHandler(stream or sys.stdout)
+        output.setFormatter(JSONFormatter() if fmt == "json" else TextFormatter())
+        handler = NonBlockingQueueHandler(records)
+        handler.addFilter(DebugSampler(debug_sample_rate))
+        handler.addFilter(RequestContextFilter())
+        root = logging.getLogger()
+        root.addHandler(handler)
+        root.setLevel(level.upper())
+        for name in QUIET_LOGGERS:
+            logging.getLogger(name).setLevel(max(logging.WARNING, root.level))
+        _listener = _Listener(records, output)
+        _listener.start()
+        return _listener
+
+def shutdown_logging() -> None:
+    """Writes out everything still queued, stops the listener thread and detaches the handler."""
+    with _lock:
+        _stop_listener()
+
+def _stop_listener() -> None:
+    global _listener
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        if isinstance(handler, NonBlockingQueueHandler):
+            root.removeHandler(handler)
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,288 @@
+"""
+Prometheus-compatible metrics with sharded, lock-free hot paths.
+
+Every thread updates its own shard of a metric, so recording never takes
+a lock or contends with other threads; `/metrics` sums the shards when
+scraped. Locks are only taken to create a shard or a label child.
+"""
+import bisect
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+class _Sharded:
+    """Per-thread list of floats; only the owning thread writes its shard."""
+
+    def __init__(self, size: int):
+        self._size = size
+        self._shards: Dict[int, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def shard(self) -> List[float]:
+        shard = self._shards.get(threading.get_ident())
+        if shard is None:
+            with self._lock:
+                shard = self._shards.setdefault(threading.get_ident(), [0.0] * self._size)
+        return shard
+
+    def totals(self) -> List[float]:
+        with self._lock:
+            shards = list(self._shards.values())
+        totals = [0.0] * self._size
+        for shard in shards:
+            for i, value in enumerate(shard):
+                totals[i] += value
+        return totals
+
+class _CounterChild:
+    def __init__(self):
+        self._values = _Sharded(1)
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._values.shard()[0] += amount
+
+    @property
+    def value(self) -> float:
+        return self._values.totals()[0]
+
+class _GaugeChild(_CounterChild):
+    """Gauge built from increments, so it shards like a counter."""
+
+    def dec(self, amount: float = 1.0) -> None:
+        self._values.shard()[0] -= amount
+
+    def set(self, value: float) -> None:
+        # Fold every shard into this thread's so the sum equals `value`
+        shard = self._values.shard()
+        shard[0] += value - self.value
+
+class _HistogramChild:
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        # [bucket counts..., +Inf count, sum]
+        self._values = _Sharded(len(self.buckets) + 2)
+
+    def observe(self, value: float) -> None:
+        shard = self._values.shard()
+        shard[bisect.bisect_left(self.buckets, value)] += 1
+        shard[-1] += value
+
+    def snapshot(self) -> Tuple[List[float], float, float]:
+        """(cumulative bucket counts incl. +Inf, count, sum)."""
+        totals = self._values.totals()
+        cumulative, running = [], 0.0
+        for count in totals[:-1]:
+            running += count
+            cumulative.append(running)
+        return cumulative, running, totals[-1]
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), registry: Optional["Registry"] = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        (registry or REGISTRY).register(self)
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str, **kwargs: str):
+        key = tuple(str(v) for v in values) if values else tuple(str(kwargs[name]) for name in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+    def _label_text(self, key: Tuple[str, ...], extra: str = "") -> str:
+        pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, key)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def _samples(self) -> List[str]:
+        return [f"{self.name}{self._label_text(key)} {_number(child.value)}" for key, child in list(self._children.items())]
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS, registry: Optional["Registry"] = None):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def time(self, *values: str, **kwargs: str) -> "_Timer":
+        return _Timer(self.labels(*values, **kwargs))
+
+    def _samples(self) -> List[str]:
+        lines = []
+        for key, child in list(self._children.items()):
+            cumulative, count, total = child.snapshot()
+            for bound, value in zip(self.buckets + (float("inf"),), cumulative):
+                le = "+Inf" if bound == float("inf") else _number(bound)
+                le_label = f'le="{le}"'
+                lines.append(f"{self.name}_bucket{self._label_text(key, le_label)} {_number(value)}")
+            lines.append(f"{self.name}_count{self._label_text(key)} {_number(count)}")
+            lines.append(f"{self.name}_sum{self._label_text(key)} {_number(total)}")
+        return lines
+
+class _Timer:
+    """`with histogram.time(...)`: observes the block's duration in seconds."""
+
+    def __init__(self, child: _HistogramChild):
+        self.child = child
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.child.observe(time.perf_counter() - self.started)
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> None:
+        if metric.name in self._metrics:
+            raise ValueError(f"metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        """Prometheus text exposition format (0.0.4)."""
+        return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+REGISTRY = Registry()
+
+# Shared instruments
+HTTP_REQUESTS = Counter("http_requests_total", "HTTP requests by route template, method and status.",
+                        ["route", "method", "status"])
+HTTP_LATENCY = Histogram("http_request_duration_seconds", "HTTP request latency by route template.",
+                         ["route", "method"])
+HTTP_IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests being served.")
+DB_QUERY_LATENCY = Histogram("db_query_duration_seconds", "SQL statement latency by statement type.",
+                             ["operation"])
+LLM_LATENCY = Histogram("llm_request_duration_seconds", "LLM call latency by model.", ["model", "provider"],
+                        buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0))
+LLM_TOKENS = Counter("llm_tokens_total", "LLM tokens by model and direction (prompt/completion).", ["model", "type"])
+TOOL_LATENCY = Histogram("tool_execution_duration_seconds", "Agent tool execution time by tool and outcome.",
+                         ["tool", "status"])
+EVENT_LOOP_LAG = Histogram("event_loop_lag_seconds", "How late the event loop heartbeat woke up.")
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording per-route latency, status and in-flight
+    requests. Routes are labelled by their template (`/apps/{app_id}`),
+    read from `scope["route"]` after routing, so label cardinality stays
+    bounded; unmatched paths share one label.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = 500
+        in_flight = HTTP_IN_FLIGHT.labels()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            in_flight.dec()
+            template = route_template(scope)
+            HTTP_LATENCY.labels(template, scope["method"]).observe(elapsed)
+            HTTP_REQUESTS.labels(template, scope["method"], str(status)).inc()
+
+def route_template(scope) -> str:
+    """
+    The matched route's path template with its router prefix, e.g.
+    `/api/v1/apps/{app_id}`. Newer FastAPI versions put the un-prefixed
+    route of an included router in `scope["route"]`, so the prefix is
+    taken from the request path (segments before the route's own).
+    """
+    route = scope.get("route")
+    path = getattr(route, "path", None)
+    if not path:
+        return "<unmatched>"
+    if ":path}" in path:
+        return path
+    request_segments = scope["path"].rstrip("/").split("/")
+    route_segments = path.rstrip("/").split("/")
+    prefix = request_segments[:len(request_segments) - len(route_segments) + 1]
+    if len(prefix) <= 1:
+        return path
+    return "/".join(prefix) + path
+
+def instrument_engine(engine) -> None:
+    """Times every SQL statement run through a SQLAlchemy engine."""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+        DB_QUERY_LATENCY.labels(operation).observe(time.perf_counter() - started)
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        stack = context.connection.info.get("query_started") if context.connection is not None else None
+        if stack:
+            stack.pop()
@@ -0,0 +1,185 @@
+"""
+In-process diagnostics for live workers: a sampling profiler that produces
+collapsed stacks (the input format of flamegraph.pl / speedscope) and an
+event-loop lag monitor that reports what blocked the loop.
+"""
+import asyncio
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter, deque
+from typing import Deque, Dict, List, Optional
+from pydantic import BaseModel
+from app.core.config import settings
+from app.core.metrics import EVENT_LOOP_LAG
+
+logger = logging.getLogger(__name__)
+
+# Leaf frames of a thread that is waiting rather than working
+IDLE_FRAMES = {("selectors.py", "select"), ("threading.py", "wait"), ("queue.py", "get")}
+_DEFAULT_TASK_NAME = re.compile(r"^Task-\d+$")
+
+def _frame_label(code) -> str:
+    module = os.path.splitext(os.path.basename(code.co_filename))[0]
+    return f"{module}:{getattr(code, 'co_qualname', code.co_name)}"
+
+def _stack(frame) -> List[str]:
+    """Frame labels from the outermost call down to `frame`."""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    labels.reverse()
+    return labels
+
+def _task_label(loop: asyncio.AbstractEventLoop) -> Optional[str]:
+    """The task the loop is running right now (default `Task-N` names fall back to the coroutine)."""
+    try:
+        task = asyncio.current_task(loop)
+    except RuntimeError:
+        return None
+    if task is None:
+        return None
+    name = task.get_name()
+    if _DEFAULT_TASK_NAME.match(name):
+        name = getattr(task.get_coro(), "__qualname__", name)
+    return f"task:{name}"
+
+class SamplingProfiler:
+    """
+    Samples every thread's stack with `sys._current_frames()` from a helper
+    thread, so the profiled code runs unmodified; overhead is one stack walk
+    per thread per interval. Stacks on the event loop thread are prefixed
+    with the asyncio task being run.
+    """
+
+    def __init__(self, interval: float = 0.01, include_idle: bool = False):
+        self.interval = interval
+        self.include_idle = include_idle
+        self.samples = 0
+        self.stacks: Counter = Counter()
+        self._loops: Dict[int, asyncio.AbstractEventLoop] = {}
+
+    def watch_loop(self, loop: asyncio.AbstractEventLoop, thread_id: int) -> None:
+        """Labels samples from `thread_id` with the task `loop` is running."""
+        self._loops[thread_id] = loop
+
+    def sample(self) -> None:
+        own = threading.get_ident()
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own:
+                continue
+            code = frame.f_code
+            if not self.include_idle and (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES:
+                continue
+            prefix = [names.get(thread_id, f"thread-{thread_id}")]
+            loop = self._loops.get(thread_id)
+            task = _task_label(loop) if loop is not None else None
+            if task:
+                prefix.append(task)
+            self.stacks[";".join(prefix + _stack(frame))] += 1
+        self.samples += 1
+
+    def run(self, seconds: float) -> "SamplingProfiler":
+        """Samples for `seconds` on the calling thread; call it off the event loop."""
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            self.sample()
+            time.sleep(max(0.0, self.interval - (time.perf_counter() - started)))
+        return self
+
+    def collapsed(self) -> str:
+        """One `frame;frame;frame count` line per distinct stack, hottest first."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+_profile_lock = threading.Lock()
+
+async def profile(seconds: float, interval: float = 0.01, include_idle: bool = False) -> Optional[SamplingProfiler]:
+    """
+    Profiles this worker for `seconds` without blocking its event loop.
+    Returns None if another profile is already running.
+    """
+    if not _profile_lock.acquire(blocking=False):
+        return None
+    try:
+        profiler = SamplingProfiler(interval, include_idle)
+        profiler.watch_loop(asyncio.get_running_loop(), threading.get_ident())
+        return await asyncio.to_thread(profiler.run, seconds)
+    finally:
+        _profile_lock.release()
+
+class LoopStall(BaseModel):
+    started_at: float # unix time the loop stopped responding
+    lag_ms: float # how long it had been blocked when the stack was taken
+    stack: List[str]
+
+class LoopLagMonitor:
+    """
+    Watchdog for the event loop. A heartbeat coroutine stamps the time every
+    `interval`; a helper thread checks the stamp and, when the loop has not
+    run for longer than `threshold`, logs the loop thread's stack -
+    whatever is blocking it at that moment. One report per stall.
+    """
+
+    def __init__(self, threshold: float = 0.1, interval: float = 0.05, history: int = 50):
+        self.threshold = threshold
+        self.interval = interval
+        self.stalls: Deque[LoopStall] = deque(maxlen=history)
+        self._beat = time.monotonic()
+        self._reported = False
+        self._loop_thread: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def start(self) -> None:
+        """Starts monitoring the running loop."""
+        if self._task is not None:
+            return
+        self._loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.get_running_loop().create_task(self._heartbeat(), name="loop-lag-heartbeat")
+        self._thread = threading.Thread(target=self._watch, name="loop-lag-watchdog", daemon=True)
+        self._thread.start()
+
+    async def _heartbeat(self) -> None:
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            EVENT_LOOP_LAG.observe(max(0.0, now - expected))
+            self._beat = now
+            self._reported = False
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.interval):
+            lag = time.monotonic() - self._beat
+            # The heartbeat sleeps `interval` between stamps; anything beyond that is the loop being busy
+            if lag <= self.interval + self.threshold or self._reported:
+                continue
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is None:
+                continue
+            self._reported = True
+            stall = LoopStall(started_at=time.time() - lag, lag_ms=round(lag * 1000, 1), stack=_stack(frame))
+            self.stalls.append(stall)
+            logger.warning("Event loop blocked for %s ms in %s", stall.lag_ms, " <- ".join(reversed(stall.stack[-8:])),
+                           extra={"stack": stall.stack})
+
+    async def stop(self) -> None:
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._thread is not None:
+            await asyncio.to_thread(self._thread.join)
+            self._thread = None
+
+loop_monitor = LoopLagMonitor(settings.LOOP_LAG_THRESHOLD_MS / 1000)
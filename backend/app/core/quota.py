@@ -0,0 +1,297 @@
+"""
+Per-user request quotas.
+
+Every request spends a token from its user's bucket. Users are keyed by
+the JWT subject `get_current_user` would resolve, or the client IP when
+there is no valid token. Requests to configured routes also spend from a
+per-user bucket for that route, and can be capped at a number of
+concurrent in-flight requests per user. Over-quota requests get a 429
+with `Retry-After` before they reach the (expensive) handler.
+
+The in-memory backend keeps limits per process. The Redis backend shares
+them across workers and nodes with one atomic Lua script per check.
+"""
+import logging
+import math
+import re
+import secrets
+import time
+from typing import Dict, List, Optional, Tuple
+from starlette.responses import JSONResponse
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.metrics import Counter
+from app.core.ratelimit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMITED = Counter("rate_limited_requests_total", "Requests rejected by the request quotas, by reason.", ["reason"])
+
+CONCURRENCY_RETRY_AFTER = 1 # seconds; when a slot frees up is unknown
+_PARAM = re.compile(r"\{[^}]+\}")
+
+class RouteQuota:
+    """Limits for one `METHOD /path/{template}`: a per-user token bucket and/or concurrency cap."""
+
+    __slots__ = ("name", "rate", "burst", "concurrency")
+
+    def __init__(self, name: str, rate: float = 0.0, burst: Optional[float] = None, concurrency: int = 0):
+        self.name = name
+        self.rate = rate
+        self.burst = burst if burst is not None else max(rate, 1.0)
+        self.concurrency = int(concurrency)
+
+class RouteTable:
+    """Matches a request to its RouteQuota: a dict lookup for static paths, regexes for templated ones."""
+
+    def __init__(self, routes: Dict[str, Dict[str, float]]):
+        self._static: Dict[Tuple[str, str], RouteQuota] = {}
+        self._templated: List[Tuple[str, re.Pattern, RouteQuota]] = []
+        for name, limits in routes.items():
+            method, path = name.split(" ", 1)
+            quota = RouteQuota(name, **limits)
+            if _PARAM.search(path):
+                pattern = re.compile("^" + "[^/]+".join(map(re.escape, _PARAM.split(path))) + "/?$")
+                self._templated.append((method.upper(), pattern, quota))
+            else:
+                self._static[(method.upper(), path.rstrip("/") or "/")] = quota
+
+    def match(self, method: str, path: str) -> Optional[RouteQuota]:
+        quota = self._static.get((method, path.rstrip("/") or "/"))
+        if quota is not None or not self._templated:
+            return quota
+        for route_method, pattern, quota in self._templated:
+            if route_method == method and pattern.match(path):
+                return quota
+        return None
+
+class MemoryQuotaBackend:
+    """Buckets and concurrency counts in this process; not shared between workers."""
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._in_flight: Dict[str, int] = {}
+
+    async def hit(self, key: str, rate: float, burst: float) -> float:
+        """Spends one token; returns 0, or the seconds until one is available."""
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self.max_keys:
+                self._prune()
+            bucket = self._buckets[key] = TokenBucket(rate, burst)
+        return bucket.try_acquire()
+
+    def _prune(self) -> None:
+        # Buckets that have refilled are indistinguishable from new ones
+        now = time.monotonic()
+        for key, bucket in list(self._buckets.items()):
+            if bucket.tokens + (now - bucket.updated) * bucket.rate >= bucket.capacity:
+                del self._buckets[key]
+        if len(self._buckets) >= self.max_keys:
+            self._buckets.clear()
+
+    async def acquire(self, key: str, limit: int) -> Optional[str]:
+        """Takes a concurrency slot; returns a lease to release, or None when all `limit` are taken."""
+        count = self._in_flight.get(key, 0)
+        if count >= limit:
+            return None
+        self._in_flight[key] = count + 1
+        return key
+
+    async def release(self, key: str, lease: str) -> None:
+        count = self._in_flight.get(key, 0) - 1
+        if count > 0:
+            self._in_flight[key] = count
+        else:
+            self._in_flight.pop(key, None)
+
+    async def close(self) -> None:
+        pass
+
+# Token bucket in a hash; Redis' clock keeps nodes consistent (needs effect replication, the default since 5.0)
+_BUCKET_SCRIPT = """
+local rate, capacity = tonumber(ARGV[1]), tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = math.min(capacity, (tonumber(state[1]) or capacity) + (now - (tonumber(state[2]) or now)) * rate)
+local wait = 0
+if tokens >= 1 then tokens = tokens - 1 else wait = (1 - tokens) / rate end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000) + 1000)
+return tostring(wait)
+"""
+
+# Concurrency slots as a sorted set of lease id -> expiry, so slots held by a crashed node run out
+_LEASE_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now)
+if redis.call('ZCARD', KEYS[1]) >= tonumber(ARGV[1]) then return 0 end
+redis.call('ZADD', KEYS[1], now + tonumber(ARGV[2]), ARGV[3])
+redis.call('EXPIRE', KEYS[1], math.ceil(tonumber(ARGV[2])) + 1)
+return 1
+"""
+
+class RedisQuotaBackend:
+    """
+    Limits shared through Redis. When Redis is unreachable requests are
+    let through (and a warning logged once a minute) rather than failed.
+    """
+
+    def __init__(self, url: str, lease_ttl: float = 900.0, prefix: str = "quota:"):
+        self.url = url
+        self.lease_ttl = lease_ttl
+        self.prefix = prefix
+        self._redis = None
+        self._bucket = None
+        self._lease = None
+        self._error: tuple = () # redis.RedisError once the client is loaded
+        self._warned_at = 0.0
+
+    def _client(self):
+        if self._redis is None:
+            import redis.asyncio as redis # optional: only needed with RATE_LIMIT_BACKEND=redis
+
+            self._redis = redis.from_url(self.url)
+            self._error = (redis.RedisError,)
+            self._bucket = self._redis.register_script(_BUCKET_SCRIPT)
+            self._lease = self._redis.register_script(_LEASE_SCRIPT)
+        return self._redis
+
+    def _unavailable(self, error: Exception) -> None:
+        now = time.monotonic()
+        if now - self._warned_at >= 60:
+            self._warned_at = now
+            logger.warning("Quota backend %s unavailable, not enforcing limits: %s", self.url, error)
+
+    async def hit(self, key: str, rate: float, burst: float) -> float:
+        self._client()
+        try:
+            return float(await self._bucket(keys=[self.prefix + key], args=[rate, burst]))
+        except self._error as e:
+            self._unavailable(e)
+            return 0.0
+
+    async def acquire(self, key: str, limit: int) -> Optional[str]:
+        self._client()
+        lease = secrets.token_hex(8)
+        try:
+            acquired = await self._lease(keys=[self.prefix + key], args=[limit, self.lease_ttl, lease])
+        except self._error as e:
+            self._unavailable(e)
+            return ""
+        return lease if acquired else None
+
+    async def release(self, key: str, lease: str) -> None:
+        if not lease:
+            return
+        try:
+            await self._client().zrem(self.prefix + key, lease)
+        except self._error as e:
+            self._unavailable(e)
+
+    async def close(self) -> None:
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
+
+class RequestLimiter:
+    def __init__(self, backend, user_rate: float, user_burst: float, routes: Dict[str, Dict[str, float]],
+                 exempt: Tuple[str, ...] = ("/health", "/metrics"), enabled: bool = True):
+        self.backend = backend
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.routes = RouteTable(routes)
+        self.exempt = frozenset(exempt)
+        self.enabled = enabled
+        self._subjects = TTLCache(maxsize=10_000, ttl=300.0)
+
+    def client_key(self, scope) -> str:
+        """`user:<sub>` for a valid bearer token, else `ip:<address>`."""
+        for name, value in scope["headers"]:
+            if name == b"authorization":
+                if value[:7].lower() == b"bearer ":
+                    subject = self._subject(value[7:].decode("latin-1"))
+                    if subject:
+                        return "user:" + subject
+                break
+        client = scope.get("client")
+        return "ip:" + (client[0] if client else "unknown")
+
+    def _subject(self, token: str) -> Optional[str]:
+        # Verified once per token, then cached; invalid tokens are cached too (as "")
+        subject = self._subjects.get(token)
+        if subject is None:
+            from jose import JWTError, jwt
+            from app.auth.local_auth import ALGORITHM, SECRET_KEY
+
+            try:
+                subject = str(jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]).get("sub") or "")
+            except JWTError:
+                subject = ""
+            self._subjects.set(token, subject)
+        return subject
+
+    async def close(self) -> None:
+        await self.backend.close()
+
+class QuotaMiddleware:
+    """Rejects over-quota requests with 429 and `Retry-After`; see RequestLimiter."""
+
+    def __init__(self, app, limiter: RequestLimiter):
+        self.app = app
+        self.limiter = limiter
+
+    async def __call__(self, scope, receive, send):
+        limiter = self.limiter
+        if scope["type"] != "http" or not limiter.enabled or scope["path"] in limiter.exempt:
+            await self.app(scope, receive, send)
+            return
+        backend = limiter.backend
+        client = limiter.client_key(scope)
+        retry_after = await backend.hit(client, limiter.user_rate, limiter.user_burst)
+        if retry_after:
+            await _reject(scope, receive, send, "user", retry_after)
+            return
+        route = limiter.routes.match(scope["method"], scope["path"])
+        if route is None:
+            await self.app(scope, receive, send)
+            return
+        if route.rate:
+            retry_after = await backend.hit(f"{route.name}|{client}", route.rate, route.burst)
+            if retry_after:
+                await _reject(scope, receive, send, "route", retry_after)
+                return
+        if not route.concurrency:
+            await self.app(scope, receive, send)
+            return
+        slot = f"{route.name}|{client}|in-flight"
+        lease = await backend.acquire(slot, route.concurrency)
+        if lease is None:
+            await _reject(scope, receive, send, "concurrency", CONCURRENCY_RETRY_AFTER)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            await backend.release(slot, lease)
+
+async def _reject(scope, receive, send, reason: str, retry_after: float) -> None:
+    RATE_LIMITED.labels(reason).inc()
+    response = JSONResponse({"detail": "Too many requests"}, status_code=429,
+                            headers={"Retry-After": str(max(1, math.ceil(retry_after)))})
+    await response(scope, receive, send)
+
+def _backend():
+    if settings.RATE_LIMIT_BACKEND == "redis":
+        return RedisQuotaBackend(settings.REDIS_URL, settings.RATE_LIMIT_LEASE_TTL)
+    return MemoryQuotaBackend()
+
+request_limiter = RequestLimiter(
+    _backend(),
+    settings.RATE_LIMIT_USER_RATE,
+    settings.RATE_LIMIT_USER_BURST,
+    settings.RATE_LIMIT_ROUTES,
+    enabled=settings.RATE_LIMIT_ENABLED,
+)
@@ -0,0 +1,47 @@
+"""
+Rate limiting primitives shared by the services.
+"""
+import asyncio
+import time
+from typing import Optional
+
+class TokenBucket:
+    """
+    Classic token bucket: `rate` tokens per second, bursting up to `capacity`.
+    Not thread-safe: meant for use from the event loop.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def try_acquire(self, tokens: float = 1.0) -> float:
+        """Takes `tokens` if available and returns 0, otherwise the seconds to wait."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return 0.0
+        return (tokens - self.tokens) / self.rate
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        """
+        Waits until `tokens` can be taken.
+        Tokens are reserved up front (the balance may go negative), so each
+        waiter sleeps exactly until its own turn instead of all waiters
+        waking together and racing for the next token.
+        """
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= tokens
+        if self.tokens >= 0:
+            return
+        try:
+            await asyncio.sleep(-self.tokens / self.rate)
+        except asyncio.CancelledError:
+            self.tokens += tokens # give the reservation back
+            raise
@@ -0,0 +1,54 @@
+"""
+Fast JSON rendering for API responses.
+
+Routes with a `response_model` are already serialized by Pydantic's core
+serializer straight to bytes (FastAPI's `dump_json` path, taken only while
+the route keeps the default response class). This module covers the rest:
+`FastJSONResponse` for routes that return plain dicts, and `dump_model` for
+rendering typed values (lists of models, NDJSON lines) without first
+building intermediate dicts. orjson is used when installed; the stdlib
+encoder is the fallback.
+"""
+import functools
+import json
+from typing import Any
+from pydantic import BaseModel, TypeAdapter
+from starlette.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError: # optional speedup
+    orjson = None
+
+def _default(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def dumps(content: Any) -> bytes:
+    """Compact UTF-8 JSON; Pydantic models inside `content` are dumped in JSON mode."""
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=_default, ensure_ascii=False, allow_nan=False,
+                      separators=(",", ":")).encode("utf-8")
+
+@functools.lru_cache(maxsize=None)
+def _adapter(tp: Any) -> TypeAdapter:
+    return TypeAdapter(tp)
+
+def dump_model(value: Any, tp: Any = None) -> bytes:
+    """
+    Renders `value` as type `tp` (e.g. `List[ToolDefinition]`) with
+    Pydantic's core serializer. Adapters are built once per type.
+    """
+    if tp is None:
+        if isinstance(value, BaseModel):
+            return value.__pydantic_serializer__.to_json(value)
+        tp = type(value)
+    return _adapter(tp).dump_json(value)
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with `dumps` (orjson when available)."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,67 @@
+"""
+Request coalescing ("singleflight").
+"""
+import asyncio
+import functools
+from typing import Any, Awaitable, Callable, Dict, Generic, Hashable, Optional, TypeVar
+from app.core.metrics import Counter
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+SINGLEFLIGHT_CALLS = Counter("singleflight_calls_total",
+                             "Coalesced calls by group: `leader` ran the call, `collapsed` joined one in flight.",
+                             ["group", "outcome"])
+
+class SingleFlight(Generic[K, V]):
+    """
+    Concurrent `do(key, fn)` calls with the same key share one run of `fn()`
+    and its result (or exception). The call runs in its own task, so a
+    cancelled caller never strands the others waiting on it. Callers share
+    the returned object and must not mutate it.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[K, asyncio.Task] = {}
+        self._leaders = SINGLEFLIGHT_CALLS.labels(name, "leader")
+        self._collapsed = SINGLEFLIGHT_CALLS.labels(name, "collapsed")
+
+    async def do(self, key: K, fn: Callable[[], Awaitable[V]]) -> V:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._done(key, done))
+            self._leaders.inc()
+        else:
+            self._collapsed.inc()
+        return await asyncio.shield(task)
+
+    def _done(self, key: K, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception() # mark retrieved when every caller has gone
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+def singleflight(name: str, key: Optional[Callable[..., Hashable]] = None):
+    """
+    Decorator for async methods: concurrent calls with equal arguments share
+    one call. The key is the arguments themselves (including `self`, so
+    instances never share), or `key(*args, **kwargs)` when they are not
+    hashable or need normalizing.
+    """
+    def decorate(fn):
+        flight: SingleFlight[Hashable, Any] = SingleFlight(name)
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            call_key = key(*args, **kwargs) if key is not None else (args, tuple(sorted(kwargs.items())))
+            return await flight.do(call_key, lambda: fn(*args, **kwargs))
+
+        wrapper.flight = flight
+        return wrapper
+    return decorate
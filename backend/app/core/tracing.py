@@ -0,0 +1,297 @@
+"""
+Lightweight request tracing.
+
+Spans nest through a contextvar, so a span opened anywhere below a request
+(agent → tool → SSH, provisioning → Docker) becomes a child of the request's
+root span without passing anything around. Recent traces are kept in an
+in-process ring buffer and served as a waterfall by request id; finished
+traces can also be sent to an OTLP/HTTP collector.
+"""
+import asyncio
+import functools
+import logging
+import re
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+from pydantic import BaseModel
+from app.core.config import settings
+from app.core.metrics import route_template
+
+logger = logging.getLogger(__name__)
+
+MAX_SPANS_PER_TRACE = 1_000
+_REQUEST_ID = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+class Span:
+    __slots__ = ("trace", "span_id", "parent_id", "name", "start_ns", "end_ns", "_t0", "attributes", "error")
+
+    def __init__(self, trace: "Trace", name: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.trace = trace
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes = attributes
+        self.error: Optional[str] = None
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self._t0 = time.perf_counter_ns()
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    def finish(self) -> None:
+        # Durations come from the monotonic clock; start stays wall-clock for export
+        self.end_ns = self.start_ns + time.perf_counter_ns() - self._t0
+
+class Trace:
+    def __init__(self, request_id: str):
+        self.trace_id = secrets.token_hex(16)
+        self.request_id = request_id
+        self.spans: List[Span] = []
+        self.dropped = 0
+
+    def add(self, span: Span) -> None:
+        if len(self.spans) < MAX_SPANS_PER_TRACE:
+            self.spans.append(span)
+        else:
+            self.dropped += 1
+
+class SpanTiming(BaseModel):
+    span_id: str
+    parent_id: Optional[str] = None
+    name: str
+    depth: int
+    offset_ms: float # from the start of the trace
+    duration_ms: Optional[float] = None # None while still running
+    attributes: Dict[str, Any] = {}
+    error: Optional[str] = None
+
+class TraceWaterfall(BaseModel):
+    request_id: str
+    trace_id: str
+    duration_ms: Optional[float] = None
+    dropped_spans: int = 0
+    spans: List[SpanTiming]
+
+class OTLPExporter:
+    """Posts finished traces to an OTLP/HTTP collector as JSON (`/v1/traces`)."""
+
+    def __init__(self, endpoint: str, service_name: str):
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self._client = None
+        self._tasks: set = set()
+
+    def payload(self, trace: Trace) -> Dict[str, Any]:
+        return {"resourceSpans": [{
+            "resource": {"attributes": [_otlp_attribute("service.name", self.service_name)]},
+            "scopeSpans": [{"scope": {"name": "app.core.tracing"}, "spans": [
+                {
+                    "traceId": trace.trace_id,
+                    "spanId": span.span_id,
+                    "parentSpanId": span.parent_id or "",
+                    "name": span.name,
+                    "kind": 2 if span.parent_id is None else 1, # SERVER root, INTERNAL children
+                    "startTimeUnixNano": str(span.start_ns),
+                    "endTimeUnixNano": str(span.end_ns or span.start_ns),
+                    "attributes": [_otlp_attribute(k, v) for k, v in span.attributes.items()]
+                                  + [_otlp_attribute("request.id", trace.request_id)],
+                    "status": {"code": 2, "message": span.error} if span.error else {"code": 1},
+                }
+                for span in trace.spans
+            ]}],
+        }]}
+
+    def export(self, trace: Trace) -> None:
+        """Sends in the background; traces finished outside an event loop are skipped."""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        task = loop.create_task(self.send(trace))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def send(self, trace: Trace) -> bool:
+        import httpx # deferred with the rest of the exporter
+
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=5.0)
+        try:
+            response = await self._client.post(self.endpoint, json=self.payload(trace))
+            response.raise_for_status()
+            return True
+        except httpx.HTTPError as e:
+            logger.warning("Trace export to %s failed: %s", self.endpoint, e)
+            return False
+
+    async def close(self) -> None:
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+class Tracer:
+    """Creates spans and keeps the last `capacity` traces, indexed by request id."""
+
+    def __init__(self, capacity: int = 1_000, exporter: Optional[OTLPExporter] = None):
+        self.capacity = capacity
+        self.exporter = exporter
+        self._traces: "OrderedDict[str, Trace]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str, request_id: Optional[str] = None, **attributes: Any) -> Iterator[Span]:
+        """
+        Times the block as a child of the current span, or as the root of a
+        new trace when there is none (requests, background jobs).
+        """
+        parent = _current_span.get()
+        if parent is None:
+            trace = Trace(request_id or secrets.token_hex(16))
+            self._store(trace)
+        else:
+            trace = parent.trace
+        span = Span(trace, name, parent.span_id if parent else None, attributes)
+        trace.add(span)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span.finish()
+            _current_span.reset(token)
+            if parent is None and self.exporter is not None:
+                self.exporter.export(trace)
+
+    def _store(self, trace: Trace) -> None:
+        with self._lock:
+            self._traces[trace.request_id] = trace
+            self._traces.move_to_end(trace.request_id)
+            while len(self._traces) > self.capacity:
+                self._traces.popitem(last=False)
+
+    def get(self, request_id: str) -> Optional[Trace]:
+        with self._lock:
+            return self._traces.get(request_id)
+
+    def waterfall(self, request_id: str) -> Optional[TraceWaterfall]:
+        trace = self.get(request_id)
+        if trace is None or not trace.spans:
+            return None
+        # Spans are appended as they start, so parents precede their children
+        spans = list(trace.spans)
+        origin = spans[0]._t0
+        depths: Dict[str, int] = {}
+        timings = []
+        for span in spans:
+            depth = depths[span.span_id] = depths.get(span.parent_id, -1) + 1
+            timings.append(SpanTiming(
+                span_id=span.span_id,
+                parent_id=span.parent_id,
+                name=span.name,
+                depth=depth,
+                offset_ms=(span._t0 - origin) / 1e6,
+                duration_ms=(span.end_ns - span.start_ns) / 1e6 if span.end_ns is not None else None,
+                attributes=dict(span.attributes),
+                error=span.error,
+            ))
+        return TraceWaterfall(
+            request_id=trace.request_id,
+            trace_id=trace.trace_id,
+            duration_ms=timings[0].duration_ms,
+            dropped_spans=trace.dropped,
+            spans=timings,
+        )
+
+    async def close(self) -> None:
+        if self.exporter is not None:
+            await self.exporter.close()
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+def current_request_id() -> Optional[str]:
+    span = _current_span.get()
+    return span.trace.request_id if span is not None else None
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+tracer = Tracer(
+    settings.TRACE_BUFFER_SIZE,
+    OTLPExporter(settings.TRACE_OTLP_ENDPOINT, settings.PROJECT_NAME) if settings.TRACE_OTLP_ENDPOINT else None,
+)
+span = tracer.span
+
+def traced(name: str):
+    """Decorator: runs an async function inside a span named `name`."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            with tracer.span(name):
+                return await fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def annotate(**attributes: Any) -> None:
+    """Adds attributes to the current span, if any."""
+    active = _current_span.get()
+    if active is not None:
+        active.set(**attributes)
+
+class TracingMiddleware:
+    """
+    Opens the root span of every HTTP request. The request id is always
+    generated here and returned in the `X-Request-ID` response header, so a
+    slow request can be looked up at `/admin/traces/{request_id}`; a
+    well-formed incoming `X-Request-ID` is only kept as the root span's
+    `client_request_id` attribute, so clients cannot pick or overwrite
+    stored traces.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        attributes = {}
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                candidate = value.decode("latin-1")
+                if _REQUEST_ID.match(candidate):
+                    attributes["client_request_id"] = candidate
+                break
+        request_id = secrets.token_hex(16)
+
+        with tracer.span(f"{scope['method']} {scope['path']}", request_id=request_id, **attributes) as root:
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start":
+                    root.set(status=message["status"])
+                    if message["status"] >= 500:
+                        root.error = f"HTTP {message['status']}"
+                    message["headers"] = list(message.get("headers", [])) + [(b"x-request-id", request_id.encode())]
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                root.name = f"{scope['method']} {route_template(scope)}"
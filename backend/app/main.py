@@ -1,20 +1,45 @@
-from fastapi import FastAPI
+import logging
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
 from app.core.database import init_db
+from app.core.lazy import Provider
+from app.core.logs import LogContextMiddleware, configure_logging, shutdown_logging
+from app.core.metrics import REGISTRY, MetricsMiddleware
+from app.core.profiler import loop_monitor
+from app.core.quota import QuotaMiddleware, request_limiter
+from app.core.tracing import TracingMiddleware, tracer
+
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Initializes the database on startup; services are built on first use and closed on shutdown."""
+    configure_logging(settings.LOG_LEVEL, settings.LOG_FORMAT, settings.LOG_DEBUG_SAMPLE_RATE, settings.LOG_QUEUE_SIZE)
+    init_db()
+    logger.info("Database initialized")
+    if settings.LOOP_LAG_THRESHOLD_MS > 0:
+        loop_monitor.start()
+    yield
+    await loop_monitor.stop()
+    from app.ai.mcp_client import mcp_manager
+    await mcp_manager.cleanup()
+    await Provider.close_all()
+    await request_limiter.close()
+    await tracer.close()
+    shutdown_logging()
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
     openapi_url=f"{settings.API_V1_STR}/openapi.json",
     description="High-performance AI Backend with Local Authentication",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
-# Initialize database on startup
-@app.on_event("startup")
-async def startup_event():
-    init_db()
-    print("✅ Database initialized")
+# Inside CORS, so 429 responses still carry the CORS headers
+app.add_middleware(QuotaMiddleware, limiter=request_limiter)
 
 # Set all CORS enabled origins
 if settings.BACKEND_CORS_ORIGINS:
@@ -26,6 +51,16 @@ if settings.BACKEND_CORS_ORIGINS:
         allow_headers=["*"],
     )
 
+# Outermost, so they also time CORS and error handling
+app.add_middleware(LogContextMiddleware)
+app.add_middleware(TracingMiddleware)
+app.add_middleware(MetricsMiddleware)
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint."""
+    return Response(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @app.get("/health")
 async def health_check():
     return {
@@ -46,8 +81,10 @@ from app.routers.api import router as api_router
 from app.routers.hosting import router as hosting_router
 from app.routers.intelligence import router as intel_router
 from app.routers.auth import router as auth_router
+from app.routers.admin import router as admin_router
 
 app.include_router(auth_router, prefix=settings.API_V1_STR, tags=["Authentication"])
 app.include_router(api_router, prefix=settings.API_V1_STR)
 app.include_router(hosting_router, prefix=settings.API_V1_STR)
 app.include_router(intel_router, prefix=settings.API_V1_STR)
+app.include_router(admin_router, prefix=settings.API_V1_STR)
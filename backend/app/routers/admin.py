@@ -0,0 +1,40 @@
+"""
+Admin-only diagnostics for the running worker.
+"""
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from typing import List
+from app.auth.local_auth import get_current_superuser
+from app.core.profiler import LoopStall, loop_monitor, profile
+from app.core.tracing import TraceWaterfall, tracer
+
+router = APIRouter(prefix="/admin", tags=["Admin"], dependencies=[Depends(get_current_superuser)])
+
+@router.get("/profile")
+async def profile_worker(
+    seconds: float = Query(10.0, gt=0, le=60),
+    interval_ms: float = Query(10.0, ge=1, le=1000),
+    include_idle: bool = False,
+):
+    """
+    Samples this worker's stacks for `seconds` and returns them as collapsed
+    stacks (`flamegraph.pl`, speedscope). Only the worker serving the request
+    is profiled.
+    """
+    profiler = await profile(seconds, interval_ms / 1000, include_idle)
+    if profiler is None:
+        raise HTTPException(status_code=409, detail="A profile is already running in this worker")
+    return Response(profiler.collapsed(), media_type="text/plain",
+                    headers={"X-Profile-Samples": str(profiler.samples)})
+
+@router.get("/loop-stalls", response_model=List[LoopStall])
+async def loop_stalls():
+    """Recent event loop stalls, with the stack that was blocking."""
+    return list(loop_monitor.stalls)
+
+@router.get("/traces/{request_id}", response_model=TraceWaterfall)
+async def get_trace(request_id: str):
+    """Span waterfall of a recent request (see the `X-Request-ID` response header)."""
+    waterfall = tracer.waterfall(request_id)
+    if waterfall is None:
+        raise HTTPException(status_code=404, detail="Trace not found (expired or unknown request id)")
+    return waterfall
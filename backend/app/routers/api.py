@@ -1,8 +1,12 @@
 
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request
 from pydantic import BaseModel
 from typing import List, Dict, Any
 from app.ai.core import get_agent, AgentResponse
+from app.ai.mcp_client import ToolDefinition
+from app.ai.models import AIModel, model_gateway
+from app.core.httpcache import http_cache
+from app.core.responses import dump_model
 
 router = APIRouter()
 
@@ -14,6 +18,9 @@ class ChatResponse(BaseModel):
     response: str
     tools_used: List[Dict[str, Any]] = []
 
+class ToolCatalog(BaseModel):
+    tools: List[ToolDefinition]
+
 @router.post("/agent/chat", response_model=ChatResponse)
 async def chat_with_agent(request: ChatRequest):
     """
@@ -35,12 +42,19 @@ async def chat_with_agent(request: ChatRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/mcp/tools")
-async def list_mcp_tools():
+@router.get("/mcp/tools", response_model=ToolCatalog)
+async def list_mcp_tools(request: Request):
     """List all currently available MCP tools connected to this backend."""
     from app.ai.mcp_client import mcp_manager
     try:
         tools = await mcp_manager.get_all_tools()
-        return {"tools": [tool.dict() for tool in tools]}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    # Servers can connect at any time, so clients revalidate on every poll
+    return http_cache.respond(request, "mcp/tools", tools, lambda: dump_model(ToolCatalog(tools=tools)))
+
+@router.get("/models", response_model=List[AIModel])
+async def list_models(request: Request):
+    """AI models available through the model gateway."""
+    models = model_gateway.list_models()
+    return http_cache.respond(request, "models", models, lambda: dump_model(models, List[AIModel]), max_age=300)
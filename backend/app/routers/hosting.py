@@ -1,8 +1,13 @@
 
-from fastapi import APIRouter, HTTPException
-from typing import List
-from app.services.domain import domain_service, DomainSearchResult
+from fastapi import APIRouter, HTTPException, Query, Request
+from typing import List, Dict, Optional
+from app.services.app_store import app_store_service, AppPreset, DeployResult
+from app.services.image_prefetch import image_prefetcher, NodeCoverage
+from app.services.node_manager import ServerNode
+from app.services.domain import domain_service, DomainSearchResult, DomainSuggestion
 from app.services.provisioning import provisioning_service, ContainerInfo
+from app.core.httpcache import http_cache
+from app.core.responses import dump_model
 from pydantic import BaseModel
 
 router = APIRouter()
@@ -12,10 +17,38 @@ class ProvisionRequest(BaseModel):
     project_name: str
     tech_stack: str = "python-fastapi"
 
+class AppDeployRequest(BaseModel):
+    subdomain: str
+    node: ServerNode
+    password: Optional[str] = None
+
+class BulkDomainRequest(BaseModel):
+    keywords: List[str]
+
 @router.get("/domains/check", response_model=List[DomainSearchResult])
-async def check_domain(q: str):
+async def check_domain(q: str, request: Request):
     """Check availability of a domain name."""
-    return await domain_service.check_availability(q)
+    results = await domain_service.check_availability(q)
+    # Same lifetime as a cached "available" answer
+    return http_cache.respond(request, ("domains/check", q.lower()), results,
+                              lambda: dump_model(results, List[DomainSearchResult]),
+                              max_age=domain_service.AVAILABLE_TTL)
+
+@router.get("/domains/suggest", response_model=List[DomainSuggestion])
+async def suggest_domains(q: str, limit: int = Query(50, ge=1, le=200), verify: bool = False):
+    """
+    Ranked alternatives for a domain name, filtered through the taken-name index.
+    `verify=true` also confirms each one live (slow: bounded by registrar rate limits).
+    """
+    return await domain_service.suggest(q, limit=limit, verify=verify)
+
+@router.post("/domains/check/bulk", response_model=Dict[str, List[DomainSearchResult]])
+async def check_domains_bulk(request: BulkDomainRequest):
+    """Check availability of many domain names in one request."""
+    try:
+        return await domain_service.check_availability_bulk(request.keywords)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @router.post("/hosting/provision", response_model=ContainerInfo)
 async def provision_hosting(request: ProvisionRequest):
@@ -25,3 +58,42 @@ async def provision_hosting(request: ProvisionRequest):
         request.project_name,
         request.tech_stack
     )
+
+@router.get("/apps", response_model=List[AppPreset])
+async def list_apps(request: Request, category: Optional[str] = None, port: Optional[int] = None, q: Optional[str] = None):
+    """One-click app catalog, optionally filtered by category, port or a text search."""
+    catalog = app_store_service.catalog
+    return http_cache.respond(
+        request, ("apps", category, port, q), catalog,
+        lambda: dump_model(app_store_service.get_catalog(category=category, port=port, q=q), List[AppPreset]),
+        max_age=60, last_modified=catalog.modified_at,
+    )
+
+@router.post("/apps/prefetch/nodes", response_model=List[NodeCoverage])
+async def register_prefetch_node(node: ServerNode):
+    """Adds a node to image prefetching; returns the coverage report."""
+    image_prefetcher.register_node(node)
+    image_prefetcher.start()
+    return image_prefetcher.coverage()
+
+@router.get("/apps/prefetch/coverage", response_model=List[NodeCoverage])
+async def prefetch_coverage():
+    """Per-node share of the app catalog's images already cached at their pinned digest."""
+    return image_prefetcher.coverage()
+
+@router.get("/apps/{app_id}", response_model=AppPreset)
+async def get_app(app_id: str):
+    app = app_store_service.get_app(app_id)
+    if app is None:
+        raise HTTPException(status_code=404, detail="App not found")
+    return app
+
+@router.post("/apps/{app_id}/deploy", response_model=DeployResult)
+async def deploy_app(app_id: str, request: AppDeployRequest):
+    """Deploys an app, or a whole multi-service stack, on a node in one operation."""
+    if app_store_service.get_app(app_id) is None:
+        raise HTTPException(status_code=404, detail="App not found")
+    try:
+        return await app_store_service.deploy(app_id, request.subdomain, request.node, password=request.password)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -1,16 +1,46 @@
 
-from fastapi import APIRouter, HTTPException
-from typing import List, Any
-from app.services.data.google import google_service, PlaceResult
+import time
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from starlette.requests import ClientDisconnect
+from typing import List, Any, Optional
+from pydantic import BaseModel
+from app.services.data.google import google_service, PlaceResult, PlaceDetails
 from app.services.data.social import social_service, SocialProfile
-from app.services.data.identity import identity_service
+from app.services.data.identity import identity_service, iter_upload_values, VoterRecord
+from app.services.data.commerce import commerce_service, ProductPage
+from app.services.data.price_history import PriceDrop
+from app.core.responses import FastJSONResponse, dumps
 
 router = APIRouter()
 
+class PlaceDetailsRequest(BaseModel):
+    place_ids: List[str]
+    fields: Optional[List[str]] = None
+
 @router.get("/intel/places", response_model=List[PlaceResult])
-async def search_places(keyword: str, location: str = "37.7749,-122.4194"):
+async def search_places(keyword: str, location: str = "37.7749,-122.4194", radius: float = Query(5000, gt=0, le=50000)):
     """Google Intelligence: Search for businesses/places."""
-    return await google_service.search_nearby_business(keyword, location)
+    try:
+        return await google_service.search_nearby_business(keyword, location, radius)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/intel/places/{place_id}", response_model=PlaceDetails)
+async def place_details(place_id: str):
+    """Google Intelligence: Details of one place."""
+    details = await google_service.get_business_details(place_id)
+    if details is None:
+        raise HTTPException(status_code=404, detail="Place not found")
+    return details
+
+@router.post("/intel/places/details", response_model=List[Optional[PlaceDetails]])
+async def places_details(request: PlaceDetailsRequest):
+    """Google Intelligence: Details of many places in one batched round."""
+    unknown = set(request.fields or []) - set(google_service.DETAIL_FIELD_TTLS)
+    if unknown or len(request.place_ids) > 100:
+        raise HTTPException(status_code=400, detail=f"Up to 100 place_ids; unknown fields: {sorted(unknown)}")
+    return await google_service.get_business_details_many(request.place_ids, request.fields)
 
 @router.get("/intel/social", response_model=List[SocialProfile])
 async def search_social(query: str):
@@ -20,4 +50,88 @@ async def search_social(query: str):
 @router.get("/intel/identity")
 async def lookup_identity(phone: str):
     """Identity: Phone lookup."""
-    return await identity_service.lookup_phone(phone)
+    return FastJSONResponse(await identity_service.lookup_phone(phone))
+
+@router.get("/intel/voter", response_model=Optional[VoterRecord])
+async def lookup_voter(epic: str):
+    """Identity: Voter record by EPIC number."""
+    return await identity_service.search_voter_record(epic)
+
+class _UploadStreamingResponse(StreamingResponse):
+    """
+    Streams a response while the request body is still being read.
+    StreamingResponse normally listens for a disconnect on `receive` in
+    parallel, which would swallow the upload; here the body generator is the
+    only reader and sees a disconnect as ClientDisconnect.
+    """
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await self.stream_response(send)
+        except OSError:
+            raise ClientDisconnect()
+
+def _bulk_lookup_response(kind: str, request: Request, columns: tuple) -> StreamingResponse:
+    values = iter_upload_values(request.stream(), request.headers.get("content-type", ""), columns)
+
+    async def lines():
+        try:
+            async for result in identity_service.lookup_bulk(kind, values):
+                yield dumps(result) + b"\n"
+        except ClientDisconnect:
+            return
+
+    return _UploadStreamingResponse(lines(), media_type="application/x-ndjson")
+
+@router.post("/intel/identity/bulk")
+async def bulk_lookup_identity(request: Request):
+    """
+    Identity: Phone lookups for a CSV (`phone` column) or NDJSON upload,
+    streamed back as NDJSON lines as they complete.
+    """
+    return _bulk_lookup_response("phone", request, ("phone", "phone_number", "mobile", "number"))
+
+@router.post("/intel/voter/bulk")
+async def bulk_lookup_voter(request: Request):
+    """
+    Identity: Voter records for a CSV (`epic` column) or NDJSON upload of
+    EPIC numbers, streamed back as NDJSON lines as they complete.
+    """
+    return _bulk_lookup_response("voter", request, ("epic", "epic_number", "voter_id"))
+
+@router.get("/intel/products", response_model=ProductPage)
+async def search_products(keyword: str, limit: int = Query(20, ge=1, le=100), cursor: Optional[str] = None):
+    """Commerce: Price-ordered products across stores, paginated with a cursor."""
+    try:
+        return await commerce_service.search_products_page(keyword, limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/intel/products/stream")
+async def stream_products(keyword: str):
+    """Commerce: NDJSON stream with one line per store, as each store responds."""
+    async def lines():
+        async for store, items in commerce_service.stream_products(keyword):
+            yield dumps({"store": store, "items": items}) + b"\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@router.get("/intel/products/history")
+async def product_price_history(store: str, url: str, days: float = Query(7, gt=0, le=3650)):
+    """Commerce: Recorded prices of one product and the cheapest one in the window."""
+    history = commerce_service.history
+    product_id = history.product_id(store, url)
+    product = history.product(product_id)
+    if product is None:
+        raise HTTPException(status_code=404, detail="No price history for this product")
+    since = time.time() - days * 86400
+    return FastJSONResponse({
+        "product": product,
+        "points": history.history(product_id, since=since),
+        "cheapest": history.cheapest(product_id, since=since),
+    })
+
+@router.get("/intel/products/price-drops", response_model=List[PriceDrop])
+async def price_drops(since: int = 0, limit: int = Query(100, ge=1, le=1000)):
+    """Commerce: Change feed of price drops after sequence number `since`."""
+    return commerce_service.history.drops(since_seq=since, limit=limit)
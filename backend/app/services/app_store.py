@@ -1,101 +1,366 @@
+import bisect
+import json
+import logging
+import os
+import re
+import shlex
+import threading
+import time
+from typing import Awaitable, Callable, List, Dict, Optional, Set
+from pydantic import BaseModel, ValidationError
+from app.core.config import settings
+from app.core.tracing import annotate, traced
+from app.services.node_manager import ServerNode, node_manager
 
-from typing import List, Dict
-from pydantic import BaseModel
+logger = logging.getLogger(__name__)
+
+DEFAULT_CATALOG_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "app_catalog.json")
+
+SUBDOMAIN = re.compile(r"[a-z0-9]([a-z0-9-]{0,61}[a-z0-9])?")
+
+class HealthCheck(BaseModel):
+    test: str # shell command run inside the container
+    interval: int = 2 # seconds
+    retries: int = 30
+
+class StackService(BaseModel):
+    """One container of a multi-service preset."""
+    name: str
+    image: str
+    env: Dict[str, str] = {} # "{secret}" is replaced by a per-deployment password kept on the node
+    volumes: List[str] = [] # "name:/path" named volumes, scoped to the deployment
+    depends_on: List[str] = []
+    healthcheck: Optional[HealthCheck] = None
+    routed: bool = False # receives the Traefik route on the app's first port
 
 class AppPreset(BaseModel):
     id: str
     name: str
     description: str
-    docker_image: str
+    docker_image: str # the routed image of a stack
     default_ports: List[int]
     category: str
+    resource_profile: Optional[str] = None # key into the catalog's resource_profiles
+    services: List[StackService] = [] # set for multi-container stacks
+
+    @property
+    def images(self) -> List[str]:
+        return list(dict.fromkeys([self.docker_image] + [service.image for service in self.services]))
+
+class DeployResult(BaseModel):
+    app_id: str
+    node: str
+    subdomain: str
+    success: bool
+    output: List[str]
+
+class DeployPlan(BaseModel):
+    """Everything about deploying an app that does not depend on the subdomain."""
+    app_id: str
+    image: str
+    port: int # the port Traefik routes to
+    ports: List[int]
+    resources: Dict[str, str] = {} # docker run limits of the app container, e.g. {"memory": "2g", "cpus": "1"}
+    levels: List[List[str]] = [] # stack services in start order; a level starts in parallel
+    command_template: str # str.format() with `subdomain`
+
+    def render(self, subdomain: str) -> str:
+        if not SUBDOMAIN.fullmatch(subdomain):
+            raise ValueError(f"Invalid subdomain '{subdomain}'")
+        return self.command_template.format(subdomain=subdomain)
+
+class AppCatalog:
+    """
+    One loaded version of the catalog file, indexed by id, category, port
+    and the words of each app's name and description. Deploy plans are
+    built once per app at load time.
+    """
+
+    def __init__(self, version: int, apps: List[AppPreset], resource_profiles: Dict[str, Dict[str, str]]):
+        self.version = version
+        self.apps = apps
+        self.modified_at: Optional[float] = None # mtime of the file it was loaded from
+        self.by_id: Dict[str, AppPreset] = {}
+        self.by_category: Dict[str, List[AppPreset]] = {}
+        self.by_port: Dict[int, List[AppPreset]] = {}
+        self.plans: Dict[str, DeployPlan] = {}
+        postings: Dict[str, Set[str]] = {}
+        self._order = {}
+        for position, app in enumerate(apps):
+            if app.id in self.by_id:
+                raise ValueError(f"duplicate app id '{app.id}'")
+            if app.resource_profile and app.resource_profile not in resource_profiles:
+                raise ValueError(f"app '{app.id}' uses unknown resource profile '{app.resource_profile}'")
+            if not app.default_ports:
+                raise ValueError(f"app '{app.id}' has no default_ports")
+            self.by_id[app.id] = app
+            self._order[app.id] = position
+            self.by_category.setdefault(app.category.lower(), []).append(app)
+            for port in app.default_ports:
+                self.by_port.setdefault(port, []).append(app)
+            for token in _tokens(f"{app.id} {app.name} {app.description}"):
+                postings.setdefault(token, set()).add(app.id)
+            self.plans[app.id] = _compile_plan(app, resource_profiles.get(app.resource_profile or "", {}))
+        # Sorted vocabulary for prefix lookups ("next" -> "nextcloud")
+        self._vocabulary = sorted(postings)
+        self._postings = postings
+
+    def search(self, query: str) -> List[AppPreset]:
+        """Apps matching every word of `query` (as a word prefix), in catalog order."""
+        matches: Optional[Set[str]] = None
+        for word in _tokens(query):
+            ids: Set[str] = set()
+            i = bisect.bisect_left(self._vocabulary, word)
+            while i < len(self._vocabulary) and self._vocabulary[i].startswith(word):
+                ids |= self._postings[self._vocabulary[i]]
+                i += 1
+            matches = ids if matches is None else matches & ids
+            if not matches:
+                return []
+        if matches is None:
+            return list(self.apps)
+        return [self.by_id[app_id] for app_id in sorted(matches, key=self._order.__getitem__)]
 
 class AppStoreService:
     """
     Manages One-Click Applications ("Own Cloud").
+    The catalog lives in a versioned JSON file (APP_CATALOG_PATH) and is
+    reloaded when the file changes; a file that fails to load keeps the
+    previous catalog in service.
     """
-    
-    CATALOG = [
-        AppPreset(
-            id="nextcloud",
-            name="Nextcloud",
-            description="Your private file storage and cloud suite.",
-            docker_image="nextcloud:latest",
-            default_ports=[8080],
-            category="Productivity"
-        ),
-        AppPreset(
-            id="filebrowser",
-            name="File Browser",
-            description="Simple web-based file manager.",
-            docker_image="filebrowser/filebrowser",
-            default_ports=[80],
-            category="Utilities"
-        ),
-        AppPreset(
-            id="wordpress",
-            name="WordPress",
-            description="The world's most popular website builder.",
-            docker_image="wordpress:latest",
-            default_ports=[80],
-            category="CMS"
-        ),
-        AppPreset(
-            id="uptime-kuma",
-            name="Uptime Kuma",
-            description="Self-hosted monitoring tool.",
-            docker_image="louislam/uptime-kuma:1",
-            default_ports=[3001],
-            category="Monitoring"
-        ),
-        # --- Polyglot Stacks for 'Single Prompt' Deployment ---
-        AppPreset(
-            id="java-tomcat",
-            name="Java (Tomcat)",
-            description="Apache Tomcat 10 for Java Web Apps.",
-            docker_image="tomcat:10-jdk17",
-            default_ports=[8080],
-            category="Development"
-        ),
-        AppPreset(
-            id="php-lamp",
-            name="PHP (LAMP)",
-            description="Apache + PHP 8.2 environment.",
-            docker_image="php:8.2-apache",
-            default_ports=[80],
-            category="Development"
-        ),
-        AppPreset(
-            id="sap-dev",
-            name="SAP NetWeaver (Dev)",
-            description="SAP ABAP AS NetWeaver 7.5x (Requires 16GB+ RAM).",
-            docker_image="sapse/abap-platform-trial:1909",
-            default_ports=[3200, 3300, 8000, 44300],
-            category="Enterprise"
-        )
-    ]
-
-    def get_catalog(self) -> List[AppPreset]:
-        return self.CATALOG
+
+    RELOAD_CHECK_INTERVAL = 1.0 # seconds between mtime checks
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or settings.APP_CATALOG_PATH or DEFAULT_CATALOG_PATH
+        self._catalog: Optional[AppCatalog] = None
+        self._stamp = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.deploys: Dict[str, int] = {} # deploy commands generated per app (prefetch popularity)
+
+    @property
+    def catalog(self) -> AppCatalog:
+        now = time.monotonic()
+        if self._catalog is None or now - self._checked_at >= self.RELOAD_CHECK_INTERVAL:
+            self.reload_if_changed()
+        return self._catalog
+
+    def reload_if_changed(self) -> bool:
+        """Reloads the catalog file if it changed since the last load."""
+        with self._lock:
+            self._checked_at = time.monotonic()
+            try:
+                stat = os.stat(self.path)
+            except OSError as e:
+                if self._catalog is None:
+                    raise
+                logger.warning("App store: catalog file unavailable, keeping version %s: %s", self._catalog.version, e)
+                return False
+            stamp = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+            if stamp == self._stamp:
+                return False
+            try:
+                catalog = _load_catalog(self.path)
+            except (OSError, ValueError, ValidationError) as e:
+                if self._catalog is None:
+                    raise
+                logger.warning("App store: invalid catalog file, keeping version %s: %s", self._catalog.version, e)
+                self._stamp = stamp
+                return False
+            catalog.modified_at = stat.st_mtime
+            self._catalog, self._stamp = catalog, stamp
+            return True
+
+    def get_catalog(self, category: Optional[str] = None, port: Optional[int] = None,
+                    q: Optional[str] = None) -> List[AppPreset]:
+        catalog = self.catalog
+        if q:
+            apps = catalog.search(q)
+        elif category:
+            apps = catalog.by_category.get(category.lower(), [])
+        elif port is not None:
+            apps = catalog.by_port.get(port, [])
+        else:
+            return catalog.apps
+        if category:
+            apps = [app for app in apps if app.category.lower() == category.lower()]
+        if port is not None:
+            apps = [app for app in apps if port in app.default_ports]
+        return apps
+
+    def get_app(self, app_id: str) -> Optional[AppPreset]:
+        return self.catalog.by_id.get(app_id)
+
+    def get_plan(self, app_id: str) -> DeployPlan:
+        plan = self.catalog.plans.get(app_id)
+        if plan is None:
+            raise ValueError("App not found")
+        return plan
 
     def generate_deploy_command(self, app_id: str, subdomain: str) -> str:
         """
         Generates the Docker command to deploy an app with Traefik labels.
         """
-        app = next((a for a in self.CATALOG if a.id == app_id), None)
-        if not app:
-            raise ValueError("App not found")
-            
-        port = app.default_ports[0]
-        
-        # Generates a clean docker run command
-        # In production this might use docker-compose
-        return (
-            f"docker run -d --name {app_id}-{subdomain} --restart always "
-            f"--label 'traefik.enable=true' "
-            f"--label 'traefik.http.routers.{app_id}-{subdomain}.rule=Host(`{subdomain}.ksfoundation.space`)' "
-            f"--label 'traefik.http.services.{app_id}-{subdomain}.loadbalancer.server.port={port}' "
-            f"{app.docker_image}"
-        )
+        command = self.get_plan(app_id).render(subdomain)
+        self.deploys[app_id] = self.deploys.get(app_id, 0) + 1
+        return command
+
+    @traced("app_store.deploy")
+    async def deploy(self, app_id: str, subdomain: str, node: ServerNode, password: Optional[str] = None,
+                     executor: Optional[Callable[..., Awaitable[List[str]]]] = None) -> DeployResult:
+        """
+        Deploys the app (or the whole stack) on `node` in one SSH command.
+        """
+        annotate(app=app_id, node=node.ip)
+        command = self.generate_deploy_command(app_id, subdomain)
+        execute = executor or node_manager.connect_and_execute
+        output = await execute(node, [command], password=password)
+        success = len(output) == 1 and not output[0].startswith("Error")
+        return DeployResult(app_id=app_id, node=node.name, subdomain=subdomain, success=success, output=output)
+
+def _tokens(text: str) -> List[str]:
+    return re.findall(r"[a-z0-9]+", text.lower())
+
+def _compile_plan(app: AppPreset, resources: Dict[str, str]) -> DeployPlan:
+    if app.services:
+        return _compile_stack(app, resources)
+    port = app.default_ports[0]
+    app_id = _escape(app.id)
+    name = f"{app_id}-{{subdomain}}"
+    limits = "".join(f"--{flag} {_escape(str(value))} " for flag, value in resources.items())
+    # Generates a clean docker run command
+    # In production this might use docker-compose
+    template = (
+        f"docker run -d --name {name} --restart always "
+        f"{limits}"
+        f"--label 'traefik.enable=true' "
+        f"--label 'traefik.http.routers.{name}.rule=Host(`{{subdomain}}.ksfoundation.space`)' "
+        f"--label 'traefik.http.services.{name}.loadbalancer.server.port={port}' "
+        f"{_escape(app.docker_image)}"
+    )
+    return DeployPlan(app_id=app.id, image=app.docker_image, port=port, ports=app.default_ports,
+                      resources={k: str(v) for k, v in resources.items()}, command_template=template)
+
+def _stack_levels(app: AppPreset) -> List[List[StackService]]:
+    """Groups services into dependency levels (Kahn's algorithm)."""
+    services = {service.name: service for service in app.services}
+    if len(services) != len(app.services):
+        raise ValueError(f"stack '{app.id}' has duplicate service names")
+    if sum(service.routed for service in app.services) > 1:
+        raise ValueError(f"stack '{app.id}' routes more than one service")
+    remaining = {}
+    for service in app.services:
+        unknown = set(service.depends_on) - set(services)
+        if unknown:
+            raise ValueError(f"stack '{app.id}': {service.name} depends on unknown {sorted(unknown)}")
+        remaining[service.name] = set(service.depends_on)
+    levels = []
+    while remaining:
+        ready = [name for name, deps in remaining.items() if not deps]
+        if not ready:
+            raise ValueError(f"stack '{app.id}' has a dependency cycle among {sorted(remaining)}")
+        levels.append([services[name] for name in ready])
+        for name in ready:
+            del remaining[name]
+        for deps in remaining.values():
+            deps.difference_update(ready)
+    return levels
+
+# Polls a container's health status once a second, for at most $2 polls
+AWAIT_HEALTHY = """await_healthy() {
+  n=0
+  until [ "$(docker inspect -f '{{.State.Health.Status}}' "$1" 2>/dev/null)" = healthy ]; do
+    n=$((n + 1))
+    if [ "$n" -ge "$2" ]; then echo "$1 did not become healthy" >&2; exit 1; fi
+    sleep 1
+  done
+}"""
+
+# The stack's password is made on the node the first time and reused on redeploys, because the
+# named volumes (and the database initialised in them) outlive the containers. It never appears
+# in the command text, so it stays out of logs and command output.
+LOAD_SECRET = """secret_file={secrets_dir}/{prefix}
+if [ ! -s "$secret_file" ]; then
+  (umask 077; mkdir -p "$(dirname "$secret_file")"; head -c 18 /dev/urandom | base64 | tr '+/' '_-' > "$secret_file")
+fi
+KSF_SECRET=$(cat "$secret_file")"""
+
+def _env_arg(key: str, value: str) -> str:
+    """`-e KEY=value` with each "{secret}" expanded from $KSF_SECRET by the shell."""
+    parts = f"{key}={value}".split("{secret}")
+    return "-e " + '"$KSF_SECRET"'.join(shlex.quote(part) if part else "" for part in parts) + " "
+
+def _compile_stack(app: AppPreset, resources: Dict[str, str]) -> DeployPlan:
+    """
+    Builds one shell script that creates a private network and starts the
+    stack level by level: the services of a level start in parallel, and
+    the next level starts once they are running and reported healthy. The
+    routed service also joins the Traefik network, and it alone gets the
+    resource profile's limits.
+    """
+    levels = _stack_levels(app)
+    prefix = f"{_escape(app.id)}-{{subdomain}}"
+    traefik = _escape(settings.APP_TRAEFIK_NETWORK)
+    limits = "".join(f"--{flag} {_escape(str(value))} " for flag, value in resources.items())
+    main = next((s for s in app.services if s.routed), None) or next(
+        (s for s in app.services if s.image == app.docker_image), None)
+    lines = ["set -e", _escape(AWAIT_HEALTHY)]
+    if any("{secret}" in value for service in app.services for value in service.env.values()):
+        lines.append(LOAD_SECRET.format(secrets_dir=_escape(shlex.quote(settings.APP_SECRETS_DIR)), prefix=prefix))
+    lines.append(f"docker network create {traefik} >/dev/null 2>&1 || true")
+    lines.append(f"docker network create {prefix} >/dev/null 2>&1 || true")
+
+    for level in levels:
+        lines.append('pids=""')
+        for service in level:
+            name = f"{prefix}-{_escape(service.name)}"
+            args = [f"docker run -d --name {name} --network {prefix} --network-alias {_escape(service.name)} "
+                    f"--restart always {limits if service is main else ''}"]
+            for key, value in service.env.items():
+                args.append(_escape(_env_arg(key, value)))
+            for volume in service.volumes:
+                args.append(f"-v {prefix}-{_escape(volume)} ")
+            if service.healthcheck:
+                check = service.healthcheck
+                args.append(f"--health-cmd {_escape(shlex.quote(check.test))} "
+                            f"--health-interval {check.interval}s --health-retries {check.retries} ")
+            if service.routed:
+                args.append(
+                    f"--label 'traefik.enable=true' --label 'traefik.docker.network={traefik}' "
+                    f"--label 'traefik.http.routers.{prefix}.rule=Host(`{{subdomain}}.ksfoundation.space`)' "
+                    f"--label 'traefik.http.services.{prefix}.loadbalancer.server.port={app.default_ports[0]}' "
+                )
+            args.append(f"{_escape(service.image)} >/dev/null & pids=\"$pids $!\"")
+            lines.append("".join(args))
+        lines.append('for pid in $pids; do wait "$pid"; done')
+        for service in level:
+            if service.routed:
+                lines.append(f"docker network connect {traefik} {prefix}-{_escape(service.name)}")
+        checked = [service for service in level if service.healthcheck]
+        if checked:
+            lines.append('pids=""')
+            for service in checked:
+                polls = service.healthcheck.interval * service.healthcheck.retries + 10
+                lines.append(f'await_healthy {prefix}-{_escape(service.name)} {polls} & pids="$pids $!"')
+            lines.append('for pid in $pids; do wait "$pid"; done')
+    lines.append(f"echo {prefix} started")
+
+    return DeployPlan(app_id=app.id, image=app.docker_image, port=app.default_ports[0], ports=app.default_ports,
+                      resources={k: str(v) for k, v in resources.items()},
+                      levels=[[service.name for service in level] for level in levels],
+                      command_template="\n".join(lines))
+
+def _escape(value: str) -> str:
+    """Catalog values are literal text inside the format template."""
+    return value.replace("{", "{{").replace("}", "}}")
+
+def _load_catalog(path: str) -> AppCatalog:
+    with open(path, "rb") as f:
+        document = json.load(f)
+    if not isinstance(document, dict) or not isinstance(document.get("version"), int):
+        raise ValueError("catalog file needs an integer 'version'")
+    apps = [AppPreset.model_validate(entry) for entry in document.get("apps", [])]
+    return AppCatalog(document["version"], apps, document.get("resource_profiles", {}))
 
 app_store_service = AppStoreService()
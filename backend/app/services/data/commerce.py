@@ -1,7 +1,18 @@
 
-from typing import List, Dict, Optional
+import logging
+from typing import List, Dict, Optional, AsyncIterator, Callable, Awaitable, Tuple
 from pydantic import BaseModel
 import asyncio
+import base64
+import heapq
+import json
+from bisect import bisect_left
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.singleflight import singleflight
+from app.services.data.price_history import PriceHistoryStore
+
+logger = logging.getLogger(__name__)
 
 class ProductResult(BaseModel):
     title: str
@@ -11,28 +22,121 @@ class ProductResult(BaseModel):
     url: str
     rating: float = 0.0
 
+class ProductPage(BaseModel):
+    items: List[ProductResult]
+    next_cursor: Optional[str] = None
+    missing_stores: List[str] = [] # stores that failed or missed the deadline
+
+StoreSearch = Callable[[str], Awaitable[List[ProductResult]]]
+
 class CommerceService:
     """
     Aggregates product data from Amazon, Flipkart, and Shopify.
     """
-    
-    async def search_products(self, keyword: str) -> List[ProductResult]:
+
+    # Seconds each store gets before it is left out of the response
+    STORE_DEADLINE = 3.0
+
+    def __init__(self, history: Optional[PriceHistoryStore] = None):
+        self.history = history or PriceHistoryStore(settings.PRICE_HISTORY_DIR)
+        # Recent per-store results, served without hitting the store again
+        self.result_cache = TTLCache(maxsize=5_000, ttl=settings.COMMERCE_CACHE_TTL)
+        self.stores: Dict[str, StoreSearch] = {
+            "Amazon": self._search_amazon,
+            "Flipkart": self._search_flipkart,
+            "Shopify (Various)": self._search_shopify_aggregator,
+        }
+
+    async def _search_store(self, store: str, keyword: str, deadline: float) -> Tuple[str, Optional[List[ProductResult]]]:
+        cache_key = (store, keyword.strip().lower())
+        cached = self.result_cache.get(cache_key)
+        if cached is not None:
+            return store, cached
+        try:
+            items = await asyncio.wait_for(self.stores[store](keyword), timeout=deadline)
+        except asyncio.TimeoutError:
+            logger.warning("Commerce: %s missed the %ss deadline for %r", store, deadline, keyword)
+            return store, None
+        except Exception as e:
+            logger.error("Commerce: %s search failed: %s", store, e)
+            return store, None
+        # Stores normally return price-ordered lists; this is O(n) when they do.
+        items = sorted(items, key=lambda x: x.price)
+        self.result_cache.set(cache_key, items)
+        try:
+            # File appends run in a worker thread, off the event loop
+            await asyncio.to_thread(self.history.record, items)
+        except OSError as e:
+            logger.warning("Commerce: could not record price history: %s", e)
+        return store, items
+
+    async def stream_products(self, keyword: str, deadline: Optional[float] = None) -> AsyncIterator[Tuple[str, Optional[List[ProductResult]]]]:
+        """
+        Yields (store, price-sorted results) as each store responds.
+        Stores that fail or exceed the deadline yield (store, None).
+        """
+        deadline = self.STORE_DEADLINE if deadline is None else deadline
+        tasks = [asyncio.ensure_future(self._search_store(store, keyword, deadline)) for store in self.stores]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # The consumer went away (e.g. the client disconnected)
+            for task in tasks:
+                task.cancel()
+
+    @singleflight("commerce.search")
+    async def _collect(self, keyword: str, deadline: Optional[float]) -> Tuple[Dict[str, List[ProductResult]], List[str]]:
+        per_store: Dict[str, List[ProductResult]] = {}
+        missing = []
+        async for store, items in self.stream_products(keyword, deadline):
+            if items is None:
+                missing.append(store)
+            else:
+                per_store[store] = items
+        return per_store, missing
+
+    async def search_products(self, keyword: str, deadline: Optional[float] = None) -> List[ProductResult]:
         """
         Unified search across e-commerce giants.
         """
-        print(f"🛒 Commerce: Searching for '{keyword}' on Amazon, Flipkart, Shopify...")
-        
-        # Parallel Execution (Mock)
-        results = await asyncio.gather(
-            self._search_amazon(keyword),
-            self._search_flipkart(keyword),
-            self._search_shopify_aggregator(keyword)
-        )
-        
-        # Flatten list
-        flat_results = [item for sublist in results for item in sublist]
-        # Sort by price ascending
-        return sorted(flat_results, key=lambda x: x.price)
+        logger.debug("Commerce: searching for %r", keyword)
+
+        per_store, _ = await self._collect(keyword, deadline)
+        # k-way merge of the per-store price-sorted lists
+        return list(heapq.merge(*per_store.values(), key=lambda x: x.price))
+
+    async def search_products_page(self, keyword: str, limit: int = 20, cursor: Optional[str] = None, deadline: Optional[float] = None) -> ProductPage:
+        """
+        One page of the merged, price-ordered results.
+        The cursor records how far into each store's list the previous pages got
+        and the last price shown. A store first seen on a later page (e.g. it
+        missed an earlier deadline) joins at that price, keeping the order.
+        """
+        offsets, floor = _decode_cursor(cursor, keyword) if cursor else ({}, None)
+        per_store, missing = await self._collect(keyword, deadline)
+
+        heap = []
+        for order, (store, items) in enumerate(per_store.items()):
+            position = offsets.get(store)
+            if position is None:
+                position = 0 if floor is None else bisect_left([item.price for item in items], floor)
+            if position < len(items):
+                heap.append((items[position].price, order, store, position))
+        heapq.heapify(heap)
+
+        page = []
+        while heap and len(page) < limit:
+            _, order, store, position = heapq.heappop(heap)
+            items = per_store[store]
+            page.append(items[position])
+            offsets[store] = position + 1
+            floor = items[position].price
+            if position + 1 < len(items):
+                heapq.heappush(heap, (items[position + 1].price, order, store, position + 1))
+
+        next_cursor = _encode_cursor(keyword, offsets, floor) if heap else None
+        return ProductPage(items=page, next_cursor=next_cursor, missing_stores=missing)
 
     async def _search_amazon(self, keyword: str) -> List[ProductResult]:
         # Mocking Amazon search
@@ -64,6 +168,7 @@ class CommerceService:
 
     async def _search_shopify_aggregator(self, keyword: str) -> List[ProductResult]:
         # Mocking generic Shopify store search
+        base_price = 1000.0 if "laptop" in keyword.lower() else 50.0
         return [
              ProductResult(
                 title=f"Premium {keyword} (Indie Store)",
@@ -75,4 +180,19 @@ class CommerceService:
             )
         ]
 
+def _encode_cursor(keyword: str, offsets: Dict[str, int], floor: Optional[float]) -> str:
+    raw = json.dumps({"q": keyword, "o": offsets, "p": floor}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def _decode_cursor(cursor: str, keyword: str) -> Tuple[Dict[str, int], Optional[float]]:
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        offsets = {str(store): int(position) for store, position in data["o"].items()}
+        floor = None if data.get("p") is None else float(data["p"])
+    except (ValueError, KeyError, TypeError, AttributeError):
+        raise ValueError("Invalid cursor")
+    if data.get("q") != keyword:
+        raise ValueError("Cursor does not belong to this search")
+    return offsets, floor
+
 commerce_service = CommerceService()
@@ -1,8 +1,20 @@
 
-import googlemaps
-from typing import List, Dict, Any, Optional
+import asyncio
+import hashlib
+import httpx
+import logging
+from typing import List, Dict, Any, Optional, Tuple
 from pydantic import BaseModel
+from app.core import geo
+from app.core.cache import TTLCache
 from app.core.config import settings
+from app.core.dataloader import DataLoader
+from app.core.ratelimit import TokenBucket
+from app.core.singleflight import SingleFlight, singleflight
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
 
 class PlaceResult(BaseModel):
     name: str
@@ -12,49 +24,251 @@ class PlaceResult(BaseModel):
     rating: Optional[float] = None
     place_id: str
 
+class PlaceDetails(BaseModel):
+    place_id: str
+    name: Optional[str] = None
+    address: Optional[str] = None
+    location: Optional[Dict[str, float]] = None
+    phone: Optional[str] = None
+    website: Optional[str] = None
+    rating: Optional[float] = None
+    user_ratings_total: Optional[int] = None
+    open_now: Optional[bool] = None
+    opening_hours: Optional[List[str]] = None
+
 class GoogleDataService:
     """
     Connects to Google Maps Platform (Places, Maps, Business).
+    Nearby searches are answered from a geohash cell cache; only cells that
+    are missing or stale are fetched upstream.
     """
+
+    # Cell precisions, finest first; the finest one covering the
+    # radius with at most MAX_CELLS cells is used.
+    CELL_PRECISIONS = (6, 5, 4, 3)
+    MAX_CELLS = 12
+
+    # Seconds each detail field stays fresh: identity rarely changes,
+    # ratings drift slowly, opening status changes through the day.
+    DETAIL_FIELD_TTLS = {
+        "name": 86400, "address": 86400, "location": 86400, "phone": 86400, "website": 86400,
+        "rating": 3600, "user_ratings_total": 3600,
+        "open_now": 900, "opening_hours": 900,
+    }
+    # PlaceDetails field -> Places API `fields` entry
+    DETAIL_API_FIELDS = {
+        "name": "name", "address": "formatted_address", "location": "geometry/location",
+        "phone": "formatted_phone_number", "website": "website", "rating": "rating",
+        "user_ratings_total": "user_ratings_total", "open_now": "opening_hours", "opening_hours": "opening_hours",
+    }
+    DETAILS_CONCURRENCY = 8
+
     def __init__(self):
-        # We handle the case where the key might be missing gracefully for the demo/mock
-        if settings.OPENAI_API_KEY: # Using a placeholder config check
-             # self.gmaps = googlemaps.Client(key=settings.GOOGLE_MAPS_API_KEY)
-             self.gmaps = None
-        else:
-             self.gmaps = None
-
-    async def search_nearby_business(self, keyword: str, location: str = "37.7749,-122.4194") -> List[PlaceResult]:
+        self.api_key = settings.GOOGLE_MAPS_API_KEY
+        self.base_url = settings.GOOGLE_PLACES_URL.rstrip("/")
+        self._client: Optional[httpx.AsyncClient] = None
+        # (keyword, cell) -> places found in that cell
+        self.cells = TTLCache(maxsize=50_000, ttl=settings.PLACES_CACHE_TTL)
+        self.cell_fetches: SingleFlight[Tuple[str, str], List[PlaceResult]] = SingleFlight("places.cell")
+        self.upstream_calls = 0
+        # (place_id, field) -> value, each with its own TTL
+        self.details_cache = TTLCache(maxsize=200_000)
+        self.details_loader: DataLoader[str, Dict[str, Any]] = DataLoader(self._fetch_details_batch, window=0.005)
+        self.details_limiter = TokenBucket(settings.PLACES_DETAILS_RATE)
+
+    @singleflight("places.search")
+    async def search_nearby_business(self, keyword: str, location: str = "37.7749,-122.4194", radius: float = 5000) -> List[PlaceResult]:
         """
         Search for businesses (e.g., 'NGOs', 'Schools') near a location.
         """
-        print(f"📍 Google Intelligence: Searching for '{keyword}' near {location}...")
-        
-        # Real implementation would be:
-        # results = self.gmaps.places_nearby(location=location, keyword=keyword, radius=5000)
-        
-        # Mocking logic for "Universal Data" demo
-        return [
-            PlaceResult(
-                name=f"{keyword} Center One",
-                address="123 Market St",
-                types=["establishment", "point_of_interest"],
-                location={"lat": 37.775, "lng": -122.418},
-                rating=4.5,
-                place_id="place_123"
-            ),
-             PlaceResult(
-                name=f"{keyword} Global Hub",
-                address="456 Mission St",
-                types=["establishment", "non_profit"],
-                location={"lat": 37.779, "lng": -122.420},
-                rating=4.8,
-                place_id="place_456"
-            )
-        ]
-
-    async def get_business_details(self, place_id: str):
-        # self.gmaps.place(place_id=place_id)
-        pass
+        logger.debug("Places: searching for %r near %s", keyword, location)
+        lat, lng = geo.parse_location(location)
+        query = keyword.strip().lower()
+        cells = self._covering_cells(lat, lng, radius)
+
+        per_cell = await asyncio.gather(*(self._cell_places(query, keyword, cell) for cell in cells))
+
+        places: Dict[str, Tuple[float, PlaceResult]] = {}
+        for cell_places in per_cell:
+            for place in cell_places:
+                distance = geo.distance_m(lat, lng, place.location["lat"], place.location["lng"])
+                if distance <= radius and place.place_id not in places:
+                    places[place.place_id] = (distance, place)
+        return [place for _, place in sorted(places.values(), key=lambda item: item[0])]
+
+    def _covering_cells(self, lat: float, lng: float, radius: float) -> List[str]:
+        for precision in self.CELL_PRECISIONS:
+            cells = geo.cells_in_radius(lat, lng, radius, precision)
+            if len(cells) <= self.MAX_CELLS:
+                return cells
+        return cells
+
+    async def _cell_places(self, query: str, keyword: str, cell: str) -> List[PlaceResult]:
+        key = (query, cell)
+        cached = self.cells.get(key)
+        if cached is not None:
+            return cached
+
+        # A fresh parent cell (geohash prefix) already covers this one
+        for length in range(len(cell) - 1, min(self.CELL_PRECISIONS) - 1, -1):
+            parent = self.cells.get((query, cell[:length]))
+            if parent is not None:
+                lat_lo, lat_hi, lng_lo, lng_hi = geo.bbox(cell)
+                return [p for p in parent if lat_lo <= p.location["lat"] < lat_hi and lng_lo <= p.location["lng"] < lng_hi]
+
+        # Searches over overlapping areas share the fetch of each cell
+        return await self.cell_fetches.do(key, lambda: self._fetch_and_cache_cell(key, keyword, cell))
+
+    async def _fetch_and_cache_cell(self, key: Tuple[str, str], keyword: str, cell: str) -> List[PlaceResult]:
+        places = await self._fetch_cell(keyword, cell)
+        self.cells.set(key, places)
+        return places
+
+    async def _fetch_cell(self, keyword: str, cell: str) -> List[PlaceResult]:
+        lat_lo, lat_hi, lng_lo, lng_hi = geo.bbox(cell)
+        lat, lng = geo.center(cell)
+        # Circle circumscribing the cell
+        radius = geo.distance_m(lat, lng, lat_hi, lng_hi)
+        self.upstream_calls += 1
+
+        if not self.api_key:
+            return self._mock_places(keyword, cell)
+
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=10.0)
+        response = await self._client.get(f"{self.base_url}/nearbysearch/json", params={
+            "location": f"{lat},{lng}",
+            "radius": int(radius) + 1,
+            "keyword": keyword,
+            "key": self.api_key,
+        })
+        response.raise_for_status()
+        data = response.json()
+        if data.get("status") not in ("OK", "ZERO_RESULTS"):
+            raise RuntimeError(f"Places API error: {data.get('status')}")
+
+        places = []
+        for item in data.get("results", []):
+            location = item.get("geometry", {}).get("location", {})
+            if not (lat_lo <= location.get("lat", 999) < lat_hi and lng_lo <= location.get("lng", 999) < lng_hi):
+                continue # belongs to a neighbouring cell
+            places.append(PlaceResult(
+                name=item.get("name", ""),
+                address=item.get("vicinity") or item.get("formatted_address", ""),
+                types=item.get("types", []),
+                location={"lat": location["lat"], "lng": location["lng"]},
+                rating=item.get("rating"),
+                place_id=item["place_id"]
+            ))
+        return places
+
+    def _mock_places(self, keyword: str, cell: str) -> List[PlaceResult]:
+        # Mocking logic for "Universal Data" demo: two stable places per cell
+        lat_lo, lat_hi, lng_lo, lng_hi = geo.bbox(cell)
+        places = []
+        for i, (label, address, types, rating) in enumerate([
+            ("Center One", "123 Market St", ["establishment", "point_of_interest"], 4.5),
+            ("Global Hub", "456 Mission St", ["establishment", "non_profit"], 4.8),
+        ]):
+            seed = hashlib.blake2b(f"{keyword}:{cell}:{i}".encode(), digest_size=4).digest()
+            places.append(PlaceResult(
+                name=f"{keyword} {label}",
+                address=address,
+                types=types,
+                location={
+                    "lat": lat_lo + (lat_hi - lat_lo) * seed[0] / 256,
+                    "lng": lng_lo + (lng_hi - lng_lo) * seed[1] / 256,
+                },
+                rating=rating,
+                place_id=f"place_{cell}_{i}"
+            ))
+        return places
+
+    @singleflight("places.details", key=lambda self, place_id, fields=None: (self, place_id, tuple(fields or ())))
+    async def get_business_details(self, place_id: str, fields: Optional[List[str]] = None) -> Optional[PlaceDetails]:
+        """
+        Details of one place. Fresh cached fields are used as-is; otherwise the
+        lookup joins the current batch, shared with concurrent callers.
+        """
+        fields = [field for field in fields or self.DETAIL_FIELD_TTLS if field in self.DETAIL_FIELD_TTLS]
+        cached = {field: self.details_cache.get((place_id, field), _MISSING) for field in fields}
+        if _MISSING not in cached.values():
+            return PlaceDetails(place_id=place_id, **cached)
+
+        details = await self.details_loader.load(place_id)
+        if details is None:
+            return None
+        return PlaceDetails(place_id=place_id, **{field: details.get(field) for field in fields})
+
+    async def get_business_details_many(self, place_ids: List[str], fields: Optional[List[str]] = None) -> List[Optional[PlaceDetails]]:
+        """Details for many places in one batched round."""
+        return list(await asyncio.gather(*(self.get_business_details(place_id, fields) for place_id in place_ids)))
+
+    async def _fetch_details_batch(self, place_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        semaphore = asyncio.Semaphore(self.DETAILS_CONCURRENCY)
+
+        async def fetch(place_id: str):
+            async with semaphore:
+                await self.details_limiter.acquire()
+                try:
+                    return place_id, await self._fetch_details(place_id)
+                except Exception as e:
+                    return place_id, e
+
+        results: Dict[str, Any] = {}
+        for place_id, details in await asyncio.gather(*(fetch(place_id) for place_id in place_ids)):
+            if isinstance(details, Exception):
+                # Fails this place's callers only, never the rest of the batch
+                results[place_id] = details
+                continue
+            if details is None:
+                continue
+            for field, ttl in self.DETAIL_FIELD_TTLS.items():
+                self.details_cache.set((place_id, field), details.get(field), ttl)
+            results[place_id] = details
+        return results
+
+    async def _fetch_details(self, place_id: str) -> Optional[Dict[str, Any]]:
+        self.upstream_calls += 1
+        if not self.api_key:
+            # Mocking the Place Details response
+            return {
+                "name": f"Place {place_id}", "address": "123 Market St", "location": None,
+                "phone": "+1 415-555-0100", "website": None, "rating": 4.5,
+                "user_ratings_total": 120, "open_now": True, "opening_hours": None,
+            }
+
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=10.0)
+        response = await self._client.get(f"{self.base_url}/details/json", params={
+            "place_id": place_id,
+            "fields": ",".join(sorted(set(self.DETAIL_API_FIELDS.values()))),
+            "key": self.api_key,
+        })
+        response.raise_for_status()
+        data = response.json()
+        if data.get("status") in ("NOT_FOUND", "INVALID_REQUEST"):
+            return None
+        if data.get("status") != "OK":
+            raise RuntimeError(f"Places API error: {data.get('status')}")
+
+        result = data.get("result", {})
+        hours = result.get("opening_hours") or {}
+        return {
+            "name": result.get("name"),
+            "address": result.get("formatted_address"),
+            "location": result.get("geometry", {}).get("location"),
+            "phone": result.get("formatted_phone_number"),
+            "website": result.get("website"),
+            "rating": result.get("rating"),
+            "user_ratings_total": result.get("user_ratings_total"),
+            "open_now": hours.get("open_now"),
+            "opening_hours": hours.get("weekday_text"),
+        }
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
 
 google_service = GoogleDataService()
@@ -1,6 +1,16 @@
 
-from typing import Dict, Any, Optional
+import asyncio
+import csv
+import json
+import logging
+import re
+from typing import Dict, Any, Optional, List, AsyncIterator, Awaitable, Callable, Sequence, Tuple
 from pydantic import BaseModel
+from app.core.config import settings
+from app.core.singleflight import singleflight
+from app.services.data.identity_store import IdentityStore
+
+logger = logging.getLogger(__name__)
 
 class VoterRecord(BaseModel):
     name: str
@@ -8,17 +18,107 @@ class VoterRecord(BaseModel):
     part_no: str
     status: str
 
+_PHONE_JUNK = re.compile(r"[^\d+\n]")
+_EPIC = re.compile(r"[A-Z]{3}[0-9]{7}")
+_EPIC_SEPARATORS = str.maketrans("", "", " -/")
+
+def normalize_phones(values: Sequence[str], country_code: str = "91") -> List[Optional[str]]:
+    """
+    E.164 form of each number; None where the input cannot be a phone number.
+    National numbers get `country_code`. Formatting characters are stripped
+    from the whole batch in a single regex pass.
+    """
+    national_length = 10
+    tokens = _PHONE_JUNK.sub("", "\n".join(values)).split("\n")
+    if len(tokens) != len(values): # a value contained a newline
+        tokens = [_PHONE_JUNK.sub("", value.replace("\n", "")) for value in values]
+
+    normalized: List[Optional[str]] = []
+    append = normalized.append
+    for token in tokens:
+        if token.startswith("+"):
+            digits = token.replace("+", "")
+        elif token.startswith("00"):
+            digits = token[2:].replace("+", "")
+        else:
+            digits = token.replace("+", "").lstrip("0") # national trunk prefix
+            if len(digits) <= national_length:
+                digits = country_code + digits
+        append(f"+{digits}" if 8 <= len(digits) <= 15 and digits[0] != "0" else None)
+    return normalized
+
+def normalize_epics(values: Sequence[str]) -> List[Optional[str]]:
+    """EPIC (voter id) numbers uppercased without separators; None when malformed."""
+    normalized: List[Optional[str]] = []
+    for value in values:
+        epic = value.strip().upper().translate(_EPIC_SEPARATORS)
+        normalized.append(epic if _EPIC.fullmatch(epic) else None)
+    return normalized
+
+async def iter_upload_values(chunks: AsyncIterator[bytes], content_type: str, columns: Tuple[str, ...]) -> AsyncIterator[str]:
+    """
+    Values of a streamed CSV or NDJSON upload, line by line as the body arrives.
+    CSV: the first of `columns` found in the header row, else the first column.
+    NDJSON: a bare string/number per line, or an object with one of `columns`.
+    """
+    ndjson = "json" in (content_type or "")
+    column: Optional[int] = None
+
+    def values_of(line: bytes) -> List[str]:
+        nonlocal column
+        text = line.decode("utf-8", errors="replace").strip()
+        if not text:
+            return []
+        if ndjson:
+            try:
+                item = json.loads(text)
+            except ValueError:
+                return [text]
+            if isinstance(item, dict):
+                item = next((item[c] for c in columns if c in item), None)
+            return [] if item is None or isinstance(item, (dict, list)) else [str(item)]
+
+        row = next(csv.reader([text]), [])
+        if column is None:
+            header = [cell.strip().lower() for cell in row]
+            column = next((header.index(c) for c in columns if c in header), 0)
+            if any(c in header for c in columns):
+                return []
+        return [row[column]] if column < len(row) else []
+
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            for value in values_of(line):
+                yield value
+    for value in values_of(buffer):
+        yield value
+
+_DONE = object()
+
 class IdentityDataService:
     """
     Connects to Identity providers (Truecaller) and Public Records (Voter/Civic).
     """
 
+    BULK_CONCURRENCY = 16 # provider lookups in flight per bulk request
+    BULK_BATCH = 500 # uploaded values normalized and checked against the store together
+    STORE_FLUSH = 100 # fresh results written to the store per transaction
+
+    def __init__(self, store: Optional[IdentityStore] = None):
+        self.store = store if store is not None else IdentityStore(settings.IDENTITY_STORE_PATH, ttl=settings.IDENTITY_CACHE_TTL)
+
+    @singleflight("identity.phone")
     async def lookup_phone(self, phone_number: str) -> Dict[str, Any]:
         """
         Truecaller-style lookup (requires their SDK/API key in prod).
         """
-        print(f"📞 Identity: Looking up {phone_number}...")
-        
+        logger.debug("Identity: looking up a phone number")
+        return await self._fetch_phone(phone_number)
+
+    async def _fetch_phone(self, phone_number: str) -> Dict[str, Any]:
         # Mocking Truecaller response
         return {
             "name": "John Doe (Mock)",
@@ -27,12 +127,15 @@ class IdentityDataService:
             "spam_type": None
         }
 
+    @singleflight("identity.voter")
     async def search_voter_record(self, epic_number: str) -> Optional[VoterRecord]:
         """
         Searches Voter ID (EPIC) database.
         """
-        print(f"🗳️  Voter Search: Searching for EPIC {epic_number}...")
-        
+        logger.debug("Identity: searching voter record %s", epic_number)
+        return await self._fetch_voter(epic_number)
+
+    async def _fetch_voter(self, epic_number: str) -> Optional[VoterRecord]:
         # Mocking National Voter Service Portal response
         return VoterRecord(
             name="John Doe",
@@ -41,4 +144,107 @@ class IdentityDataService:
             status="Active"
         )
 
+    async def _voter_result(self, epic_number: str) -> Optional[Dict[str, Any]]:
+        record = await self._fetch_voter(epic_number)
+        return record.model_dump() if record is not None else None
+
+    def _bulk_kind(self, kind: str) -> Tuple[Callable[[Sequence[str]], List[Optional[str]]], Callable[[str], Awaitable[Optional[Dict[str, Any]]]]]:
+        if kind == "phone":
+            return (lambda values: normalize_phones(values, settings.IDENTITY_DEFAULT_COUNTRY_CODE)), self._fetch_phone
+        if kind == "voter":
+            return normalize_epics, self._voter_result
+        raise ValueError(f"Unknown lookup kind: {kind}")
+
+    async def lookup_bulk(self, kind: str, values: AsyncIterator[str]) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Looks up every distinct value of an upload ("phone" or "voter"), yielding
+        one result line per value as it completes. Stored results are answered
+        first; the rest go to the provider BULK_CONCURRENCY at a time. Queues
+        are bounded, so a slow provider or reader slows down the upload itself.
+        """
+        normalize, fetch = self._bulk_kind(kind)
+        work: asyncio.Queue = asyncio.Queue(maxsize=self.BULK_CONCURRENCY * 2)
+        out: asyncio.Queue = asyncio.Queue(maxsize=self.BULK_BATCH)
+        seen = set()
+        fresh: Dict[str, Any] = {}
+
+        def line(raw: str, key: Optional[str], status: str, result: Any = None, cached: bool = False) -> Dict[str, Any]:
+            return {"input": raw, "key": key, "status": status, "cached": cached, "result": result}
+
+        async def read_batch(batch: List[str]):
+            pending: Dict[str, str] = {}
+            for raw, key in zip(batch, normalize(batch)):
+                if key is None:
+                    await out.put(line(raw, None, "invalid"))
+                elif key not in seen:
+                    seen.add(key)
+                    pending[key] = raw
+            stored = await asyncio.to_thread(self.store.get_many, kind, pending)
+            for key, raw in pending.items():
+                if key in stored:
+                    status = "ok" if stored[key] is not None else "not_found"
+                    await out.put(line(raw, key, status, stored[key], cached=True))
+                else:
+                    await work.put((raw, key))
+
+        async def read_upload():
+            batch: List[str] = []
+            async for value in values:
+                batch.append(value)
+                if len(batch) >= self.BULK_BATCH:
+                    await read_batch(batch)
+                    batch = []
+            if batch:
+                await read_batch(batch)
+
+        async def worker():
+            while True:
+                item = await work.get()
+                if item is None:
+                    return
+                raw, key = item
+                try:
+                    result = await fetch(key)
+                except Exception as e:
+                    # Failures are reported but never stored
+                    await out.put(line(raw, key, "error", str(e)))
+                    continue
+                fresh[key] = result
+                if len(fresh) >= self.STORE_FLUSH:
+                    await flush_store()
+                await out.put(line(raw, key, "ok" if result is not None else "not_found", result))
+
+        async def flush_store():
+            batch = dict(fresh)
+            fresh.clear()
+            # SQLite calls run off the event loop
+            await asyncio.to_thread(self.store.put_many, kind, batch)
+
+        async def run():
+            workers = [asyncio.ensure_future(worker()) for _ in range(self.BULK_CONCURRENCY)]
+            try:
+                await read_upload()
+                for _ in workers:
+                    await work.put(None)
+                await asyncio.gather(*workers)
+            finally:
+                for task in workers:
+                    task.cancel()
+                await flush_store()
+                await out.put(_DONE)
+
+        logger.info("Identity: bulk %s lookup started", kind)
+        runner = asyncio.ensure_future(run())
+        try:
+            while True:
+                item = await out.get()
+                if item is _DONE:
+                    break
+                yield item
+            await runner
+        finally:
+            if not runner.done():
+                runner.cancel()
+            logger.info("Identity: bulk %s lookup finished (%d distinct values)", kind, len(seen))
+
 identity_service = IdentityDataService()
@@ -0,0 +1,78 @@
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional
+
+class IdentityStore:
+    """
+    Local keyed store of identity lookup results (`kind`, `key`) -> JSON,
+    kept in a SQLite file so bulk re-uploads don't hit the providers again.
+    """
+
+    CHUNK = 500 # keys per SELECT, below SQLite's bound-parameter limit
+
+    def __init__(self, path: str, ttl: float = 7 * 86400):
+        self.path = path
+        self.ttl = ttl
+        self._db: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "kind TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, fetched_at REAL NOT NULL, "
+                "PRIMARY KEY (kind, key)) WITHOUT ROWID"
+            )
+            self._db = db
+        return self._db
+
+    def get_many(self, kind: str, keys: Iterable[str]) -> Dict[str, Any]:
+        """Fresh stored results for `keys`; missing or expired keys are left out."""
+        keys = list(keys)
+        found: Dict[str, Any] = {}
+        oldest = time.time() - self.ttl
+        with self._lock:
+            db = self._conn()
+            for i in range(0, len(keys), self.CHUNK):
+                chunk = keys[i:i + self.CHUNK]
+                rows = db.execute(
+                    f"SELECT key, value FROM results WHERE kind = ? AND fetched_at >= ? "
+                    f"AND key IN ({','.join('?' * len(chunk))})",
+                    [kind, oldest, *chunk],
+                )
+                for key, value in rows:
+                    found[key] = json.loads(value)
+        return found
+
+    def put_many(self, kind: str, results: Dict[str, Any]) -> None:
+        if not results:
+            return
+        now = time.time()
+        with self._lock:
+            db = self._conn()
+            db.execute("BEGIN")
+            db.executemany(
+                "INSERT OR REPLACE INTO results (kind, key, value, fetched_at) VALUES (?, ?, ?, ?)",
+                [(kind, key, json.dumps(value), now) for key, value in results.items()],
+            )
+            db.execute("COMMIT")
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn().execute("SELECT COUNT(*) FROM results").fetchone()[0]
@@ -0,0 +1,265 @@
+
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict, deque
+from hashlib import blake2b
+from typing import Deque, Dict, Iterable, List, Optional
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+class PricePoint(BaseModel):
+    at: float # unix timestamp
+    price: float
+
+class PriceDrop(BaseModel):
+    seq: int
+    product_id: str
+    store: str
+    title: str
+    url: str
+    currency: str
+    old_price: float
+    new_price: float
+    at: float
+
+class _Series:
+    """
+    One product's history as parallel, append-only float64 columns on disk
+    (`<id>.ts`, `<id>.px`), plus per-block minima for fast range-min queries.
+    """
+    BLOCK = 1024
+
+    def __init__(self, base_path: str):
+        self.base_path = base_path
+        self.stamp = _stamp(base_path + ".px") # taken first: an append during the read shows as a change
+        self.ts = _read_column(base_path + ".ts")
+        self.px = _read_column(base_path + ".px")
+        # A crash between the two appends leaves one column longer
+        size = min(len(self.ts), len(self.px))
+        del self.ts[size:], self.px[size:]
+        self.block_mins = array("d", (min(self.px[i:i + self.BLOCK]) for i in range(0, size, self.BLOCK)))
+
+    def append(self, at: float, price: float) -> None:
+        at = max(at, self.ts[-1]) if self.ts else at # keep timestamps sorted
+        for suffix, value in ((".ts", at), (".px", price)):
+            with open(self.base_path + suffix, "ab") as f:
+                array("d", [value]).tofile(f)
+        self.ts.append(at)
+        self.px.append(price)
+        if (len(self.px) - 1) % self.BLOCK == 0:
+            self.block_mins.append(price)
+        elif price < self.block_mins[-1]:
+            self.block_mins[-1] = price
+
+    def bounds(self, since: Optional[float], until: Optional[float]):
+        lo = 0 if since is None else bisect_left(self.ts, since)
+        hi = len(self.ts) if until is None else bisect_right(self.ts, until)
+        return lo, hi
+
+    def range_min_index(self, lo: int, hi: int) -> Optional[int]:
+        """Index of the cheapest price in [lo, hi), scanning whole blocks via their minima."""
+        if lo >= hi:
+            return None
+        px, block = self.px, self.BLOCK
+        first_block, last_block = -(-lo // block), hi // block
+        if first_block >= last_block:
+            return min(range(lo, hi), key=px.__getitem__)
+
+        candidates = []
+        if lo < first_block * block:
+            candidates.append(min(range(lo, first_block * block), key=px.__getitem__))
+        best_block = min(range(first_block, last_block), key=self.block_mins.__getitem__)
+        start = best_block * block
+        candidates.append(start + px[start:start + block].index(self.block_mins[best_block]))
+        if last_block * block < hi:
+            candidates.append(min(range(last_block * block, hi), key=px.__getitem__))
+        return min(candidates, key=px.__getitem__)
+
+def _stamp(path: str):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+def _read_column(path: str) -> array:
+    column = array("d")
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            column.fromfile(f, os.path.getsize(path) // column.itemsize)
+    return column
+
+class PriceHistoryStore:
+    """
+    Local, append-only price history for products seen in commerce searches.
+    Unchanged prices are not stored again; price drops are published to a
+    change feed with increasing sequence numbers, persisted in `drops.jsonl`
+    so sequence numbers survive restarts.
+
+    One process writes a given root: the first to record takes an exclusive
+    lock on `<root>/.writer.lock`, and other processes (e.g. extra uvicorn
+    workers) skip recording rather than interleave appends. Those readers
+    reload the catalog and feed when the writer's files change, and a
+    series when its file grew. Methods are thread-safe, so writes can run
+    in a worker thread.
+    """
+
+    RELOAD_CHECK_INTERVAL = 1.0 # seconds between a reader's stat checks
+
+    def __init__(self, root: str, max_open_series: int = 1024, feed_size: int = 10_000):
+        self.root = root
+        self.max_open_series = max_open_series
+        self._series: "OrderedDict[str, _Series]" = OrderedDict()
+        self._products: Optional[Dict[str, dict]] = None
+        self._feed: Deque[PriceDrop] = deque(maxlen=feed_size)
+        self._seq = 0
+        self._lock = threading.RLock()
+        self._writer_lock = None # open lock file while this process is the writer
+        self._is_writer: Optional[bool] = None
+        self._stamp = None
+        self._checked_at = 0.0
+
+    @staticmethod
+    def product_id(store: str, url: str) -> str:
+        return blake2b(f"{store}\0{url}".encode(), digest_size=10).hexdigest()
+
+    def _catalog(self) -> Dict[str, dict]:
+        if not self._is_writer:
+            self._reload_if_changed()
+        if self._products is None:
+            os.makedirs(self.root, exist_ok=True)
+            self._products = {}
+            path = os.path.join(self.root, "products.jsonl")
+            if os.path.exists(path):
+                with open(path) as f:
+                    for line in f:
+                        product = json.loads(line)
+                        self._products[product["id"]] = product
+            path = os.path.join(self.root, "drops.jsonl")
+            if os.path.exists(path):
+                lines = 0
+                with open(path) as f:
+                    for line in f:
+                        self._feed.append(PriceDrop.model_validate_json(line))
+                        lines += 1
+                if self._feed:
+                    self._seq = self._feed[-1].seq
+                if lines > 2 * (self._feed.maxlen or lines):
+                    # Keep only the retained tail of the feed on disk
+                    with open(path + ".tmp", "w") as f:
+                        f.writelines(drop.model_dump_json() + "\n" for drop in self._feed)
+                    os.replace(path + ".tmp", path)
+        return self._products
+
+    def _reload_if_changed(self) -> None:
+        """Drops the loaded catalog and feed when another process appended to them."""
+        now = time.monotonic()
+        if self._products is not None and now - self._checked_at < self.RELOAD_CHECK_INTERVAL:
+            return
+        self._checked_at = now
+        stamp = tuple(_stamp(os.path.join(self.root, name)) for name in ("products.jsonl", "drops.jsonl"))
+        if stamp != self._stamp:
+            self._products, self._stamp = None, stamp
+            self._feed.clear()
+            self._seq = 0
+
+    def _acquire_writer(self) -> bool:
+        if self._is_writer is None:
+            lock = open(os.path.join(self.root, ".writer.lock"), "a")
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                self._writer_lock, self._is_writer = lock, True
+            except OSError:
+                lock.close()
+                self._is_writer = False
+                logger.warning("Price history: %s is written by another process; not recording here", self.root)
+        return self._is_writer
+
+    def _get_series(self, product_id: str) -> _Series:
+        series = self._series.get(product_id)
+        if series is not None and not self._is_writer and _stamp(series.base_path + ".px") != series.stamp:
+            series = None # appended by the writer since it was read
+        if series is None:
+            series = _Series(os.path.join(self.root, product_id))
+            self._series[product_id] = series
+            if len(self._series) > self.max_open_series:
+                self._series.popitem(last=False)
+        else:
+            self._series.move_to_end(product_id)
+        return series
+
+    def record(self, results: Iterable, at: Optional[float] = None) -> List[PriceDrop]:
+        """Appends the prices of `results` (ProductResult-like) that changed."""
+        with self._lock:
+            return self._record(results, at)
+
+    def _record(self, results: Iterable, at: Optional[float]) -> List[PriceDrop]:
+        at = time.time() if at is None else at
+        catalog = self._catalog()
+        if not self._acquire_writer():
+            return []
+        drops = []
+        for result in results:
+            product_id = self.product_id(result.store, result.url)
+            if product_id not in catalog:
+                product = {"id": product_id, "store": result.store, "title": result.title,
+                           "url": result.url, "currency": result.currency}
+                with open(os.path.join(self.root, "products.jsonl"), "a") as f:
+                    f.write(json.dumps(product) + "\n")
+                catalog[product_id] = product
+
+            series = self._get_series(product_id)
+            last_price = series.px[-1] if series.px else None
+            if last_price == result.price:
+                continue
+            series.append(at, result.price)
+            if last_price is not None and result.price < last_price:
+                self._seq += 1
+                drop = PriceDrop(seq=self._seq, product_id=product_id, store=result.store, title=result.title,
+                                 url=result.url, currency=result.currency, old_price=last_price,
+                                 new_price=result.price, at=at)
+                self._feed.append(drop)
+                drops.append(drop)
+        if drops:
+            with open(os.path.join(self.root, "drops.jsonl"), "a") as f:
+                f.writelines(drop.model_dump_json() + "\n" for drop in drops)
+        return drops
+
+    def product(self, product_id: str) -> Optional[dict]:
+        with self._lock:
+            return self._catalog().get(product_id)
+
+    def history(self, product_id: str, since: Optional[float] = None, until: Optional[float] = None) -> List[PricePoint]:
+        with self._lock:
+            if product_id not in self._catalog():
+                return []
+            series = self._get_series(product_id)
+            lo, hi = series.bounds(since, until)
+            return [PricePoint(at=at, price=price) for at, price in zip(series.ts[lo:hi], series.px[lo:hi])]
+
+    def cheapest(self, product_id: str, since: Optional[float] = None, until: Optional[float] = None) -> Optional[PricePoint]:
+        """Lowest recorded price in the window (e.g. "cheapest in the last week")."""
+        with self._lock:
+            if product_id not in self._catalog():
+                return None
+            series = self._get_series(product_id)
+            index = series.range_min_index(*series.bounds(since, until))
+            if index is None:
+                return None
+            return PricePoint(at=series.ts[index], price=series.px[index])
+
+    def drops(self, since_seq: int = 0, limit: int = 100) -> List[PriceDrop]:
+        """Price drops with a sequence number above `since_seq`, oldest first."""
+        with self._lock:
+            self._catalog()
+            if not self._feed or since_seq >= self._feed[-1].seq:
+                return []
+            start = max(0, len(self._feed) - (self._feed[-1].seq - since_seq))
+            return [self._feed[i] for i in range(start, min(len(self._feed), start + limit))]
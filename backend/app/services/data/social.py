@@ -1,6 +1,17 @@
 
-from typing import List, Dict, Any
+import asyncio
+import httpx
+import logging
+from abc import ABC, abstractmethod
+from typing import List, Dict, Any, Optional, Callable
+from urllib.parse import urlsplit
 from pydantic import BaseModel
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.ratelimit import TokenBucket
+from app.core.singleflight import singleflight
+
+logger = logging.getLogger(__name__)
 
 class SocialProfile(BaseModel):
     platform: str
@@ -8,37 +19,188 @@ class SocialProfile(BaseModel):
     url: str
     followers: int = 0
 
+class PlatformAdapter(ABC):
+    """
+    One social platform (or search engine) lookup.
+    Calls are limited per platform and, when API keys are configured, per key:
+    each call uses the first key with a token available.
+    """
+    platform = "base"
+
+    def __init__(self, rate: float = 5.0, api_keys: Optional[List[str]] = None, key_rate: Optional[float] = None):
+        self.limiter = TokenBucket(rate)
+        self.api_keys = list(api_keys or [])
+        self.key_limiters = {key: TokenBucket(key_rate or rate) for key in self.api_keys}
+        self._next_key = 0
+
+    async def _acquire_key(self) -> Optional[str]:
+        await self.limiter.acquire()
+        if not self.api_keys:
+            return None
+        while True:
+            waits = []
+            for i in range(len(self.api_keys)):
+                key = self.api_keys[(self._next_key + i) % len(self.api_keys)]
+                wait = self.key_limiters[key].try_acquire()
+                if not wait:
+                    self._next_key = (self._next_key + i + 1) % len(self.api_keys)
+                    return key
+                waits.append(wait)
+            await asyncio.sleep(min(waits))
+
+    async def search(self, query: str) -> List[SocialProfile]:
+        api_key = await self._acquire_key()
+        return await self._search(query, api_key)
+
+    @abstractmethod
+    async def _search(self, query: str, api_key: Optional[str]) -> List[SocialProfile]:
+        ...
+
+    async def close(self):
+        pass
+
+class MockPlatformAdapter(PlatformAdapter):
+    """Offline adapter returning one synthetic profile."""
+
+    def __init__(self, platform: str, profile: Callable[[str], SocialProfile]):
+        super().__init__(rate=1000.0)
+        self.platform = platform
+        self.profile = profile
+
+    async def _search(self, query: str, api_key: Optional[str]) -> List[SocialProfile]:
+        return [self.profile(query)]
+
+class HTTPPlatformAdapter(PlatformAdapter):
+    """
+    Platform reached through a JSON search endpoint:
+    `GET {url}?q=<query>` (with `key=<api key>` when configured) returning
+    {"profiles": [{"username": ..., "url": ..., "followers": ...}]}.
+    """
+
+    def __init__(self, platform: str, url: str, rate: float = 5.0, api_keys: Optional[List[str]] = None,
+                 key_rate: Optional[float] = None, timeout: float = 10.0):
+        super().__init__(rate=rate, api_keys=api_keys, key_rate=key_rate)
+        self.platform = platform
+        self.url = url
+        self.timeout = timeout
+        self._client: Optional[httpx.AsyncClient] = None
+
+    async def _search(self, query: str, api_key: Optional[str]) -> List[SocialProfile]:
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=self.timeout)
+        params = {"q": query}
+        if api_key:
+            params["key"] = api_key
+        response = await self._client.get(self.url, params=params)
+        response.raise_for_status()
+        return [
+            SocialProfile(platform=self.platform, username=p.get("username", ""), url=p["url"],
+                          followers=p.get("followers") or 0)
+            for p in response.json().get("profiles", [])
+            if p.get("url")
+        ]
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
 class SocialDataService:
     """
     Connects to Social Media APIs (Meta/Yahoo/Bing).
+    All platform adapters are queried concurrently; whatever has arrived by
+    the deadline is returned.
     """
-    
-    async def search_social_identity(self, query: str) -> List[SocialProfile]:
+
+    DEADLINE = 3.0
+    NEGATIVE_TTL = 600 # seconds a "no profile on this platform" answer is reused
+
+    def __init__(self, adapters: Optional[List[PlatformAdapter]] = None):
+        self.adapters = adapters if adapters is not None else self._adapters_from_settings()
+        self.negative_cache = TTLCache(maxsize=50_000, ttl=self.NEGATIVE_TTL)
+
+    @staticmethod
+    def _adapters_from_settings() -> List[PlatformAdapter]:
         """
-        Searches Meta (FB/Insta) and Web (Yahoo/Bing) for a user/business.
+        SOCIAL_PLATFORMS maps platform names to search endpoints, e.g.
+        {"instagram": {"url": "...", "rate": 5, "keys": ["k1", "k2"], "key_rate": 1}}.
+        Without configuration the mock adapters are used.
         """
-        print(f"👥 Social Graph: Hunting for '{query}' across Meta & Yahoo...")
-        
+        if settings.SOCIAL_PLATFORMS:
+            return [
+                HTTPPlatformAdapter(platform, config["url"], rate=config.get("rate", 5.0),
+                                    api_keys=config.get("keys"), key_rate=config.get("key_rate"))
+                for platform, config in settings.SOCIAL_PLATFORMS.items()
+            ]
         # Mocking OSINT logic
         return [
-            SocialProfile(
+            MockPlatformAdapter("instagram", lambda query: SocialProfile(
                 platform="instagram",
                 username=query.replace(" ", "").lower(),
                 url=f"https://instagram.com/{query.replace(' ', '').lower()}",
                 followers=1250
-            ),
-            SocialProfile(
+            )),
+            MockPlatformAdapter("facebook", lambda query: SocialProfile(
                 platform="facebook",
                 username=query,
                 url=f"https://facebook.com/{query.replace(' ', '.')}",
                 followers=300
-            ),
-            SocialProfile(
+            )),
+            MockPlatformAdapter("yahoo_search", lambda query: SocialProfile(
                 platform="yahoo_search",
                 username="N/A",
                 url=f"https://yahoo.com/search?p={query}",
                 followers=0
-            )
+            )),
         ]
 
+    @singleflight("social.search")
+    async def search_social_identity(self, query: str, deadline: Optional[float] = None) -> List[SocialProfile]:
+        """
+        Searches Meta (FB/Insta) and Web (Yahoo/Bing) for a user/business.
+        """
+        logger.debug("Social graph: searching for %r", query)
+        normalized = " ".join(query.lower().split())
+
+        tasks = {
+            asyncio.ensure_future(adapter.search(query)): adapter
+            for adapter in self.adapters
+            if (adapter.platform, normalized) not in self.negative_cache
+        }
+        if not tasks:
+            return []
+        done, pending = await asyncio.wait(tasks, timeout=self.DEADLINE if deadline is None else deadline)
+        for task in pending:
+            logger.warning("Social graph: %s missed the deadline", tasks[task].platform)
+            task.cancel()
+
+        profiles: Dict[str, SocialProfile] = {}
+        for task in done:
+            adapter = tasks[task]
+            if task.exception() is not None:
+                logger.error("Social graph: %s failed: %s", adapter.platform, task.exception())
+                continue
+            found = task.result()
+            if not found:
+                self.negative_cache.set((adapter.platform, normalized), True)
+            for profile in found:
+                key = _profile_key(profile.url)
+                if key not in profiles or profile.followers > profiles[key].followers:
+                    profiles[key] = profile
+
+        # Keep the adapters' order for a stable response
+        order = {adapter.platform: i for i, adapter in enumerate(self.adapters)}
+        return sorted(profiles.values(), key=lambda p: order.get(p.platform, len(order)))
+
+    async def close(self):
+        for adapter in self.adapters:
+            await adapter.close()
+
+def _profile_key(url: str) -> str:
+    """Normalizes profile URLs so the same profile found twice is merged."""
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower().removeprefix("www.").removeprefix("m.")
+    path = parts.path.rstrip("/").lower()
+    return f"{host}{path}?{parts.query}" if parts.query else f"{host}{path}"
+
 social_service = SocialDataService()
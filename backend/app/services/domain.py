@@ -1,7 +1,19 @@
 
 import asyncio
-from typing import List, Dict, Optional
+import logging
+import os
+import re
+import httpx
+from abc import ABC, abstractmethod
+from typing import List, Dict, Optional, Iterator, Tuple
 from pydantic import BaseModel
+from app.core.bloom import BloomFilter
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.ratelimit import TokenBucket
+from app.core.singleflight import singleflight
+
+logger = logging.getLogger(__name__)
 
 class DomainSearchResult(BaseModel):
     domain: str
@@ -10,47 +22,266 @@ class DomainSearchResult(BaseModel):
     currency: str = "USD"
     extension: str
 
+class DomainSuggestion(DomainSearchResult):
+    available: Optional[bool] = None # None when not checked (and not in the availability cache)
+    score: float
+    verified: bool = False # True once confirmed by a live availability check
+
+class AvailabilityBackend(ABC):
+    """
+    A registrar/RDAP source answering "is this domain registered?".
+    Each backend owns its own rate limit and concurrency cap, shared by all
+    TLDs it serves.
+    """
+    name = "base"
+
+    def __init__(self, rate: float = 10.0, burst: Optional[float] = None, concurrency: int = 16):
+        self.limiter = TokenBucket(rate, burst)
+        self.semaphore = asyncio.Semaphore(concurrency)
+
+    async def is_registered(self, domain: str) -> bool:
+        async with self.semaphore:
+            await self.limiter.acquire()
+            return await self._lookup(domain)
+
+    @abstractmethod
+    async def _lookup(self, domain: str) -> bool:
+        ...
+
+    async def close(self):
+        pass
+
+class MockAvailabilityBackend(AvailabilityBackend):
+    """Offline backend used when no registrar is configured."""
+    name = "mock"
+
+    # Mock Logic: "ksfoundation" is taken, others available
+    TAKEN = {"ksfoundation.com", "google.com", "facebook.com"}
+
+    def __init__(self):
+        super().__init__(rate=1000.0)
+
+    async def _lookup(self, domain: str) -> bool:
+        return domain in self.TAKEN
+
+class RDAPAvailabilityBackend(AvailabilityBackend):
+    """
+    Queries an RDAP server: `GET {base_url}/domain/{name}`.
+    200 means registered, 404 means available.
+    """
+    name = "rdap"
+
+    def __init__(self, base_url: str, rate: float = 5.0, timeout: float = 5.0):
+        super().__init__(rate=rate)
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self._client: Optional[httpx.AsyncClient] = None
+
+    async def _lookup(self, domain: str) -> bool:
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=self.timeout, headers={"Accept": "application/rdap+json"})
+        response = await self._client.get(f"{self.base_url}/domain/{domain}")
+        if response.status_code == 404:
+            return False
+        response.raise_for_status()
+        return True
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
 class DomainService:
     """
     Manages domain availability checks and registration.
     Integrates with standard registrars (Namecheap/GoDaddy/AWS Route53).
     """
-    
+
     SUPPORTED_EXTENSIONS = [".com", ".org", ".edu", ".net", ".io", ".ai", ".biz", ".in"]
 
-    async def check_availability(self, keyword: str) -> List[DomainSearchResult]:
+    # Registered names rarely free up; available ones can be taken at any time.
+    TAKEN_TTL = 6 * 60 * 60
+    AVAILABLE_TTL = 60
+
+    MAX_BULK_KEYWORDS = 100
+    # Seconds a check may take; names not verified by then are reported unavailable
+    CHECK_DEADLINE = 5.0
+    BULK_DEADLINE = 15.0
+
+    # Suggestion ranking: lower scores rank first
+    EXTENSION_WEIGHTS = {".com": 0.0, ".org": 1.0, ".in": 1.5, ".io": 2.0, ".net": 2.5, ".ai": 3.0, ".biz": 4.0, ".edu": 5.0}
+    SUGGESTION_PREFIXES = ["get", "my", "the", "go", "try", "join"]
+    SUGGESTION_SUFFIXES = ["hq", "app", "hub", "online", "labs", "now", "org", "team"]
+
+    def __init__(self, backends: Optional[Dict[str, AvailabilityBackend]] = None, taken_index: Optional[BloomFilter] = None):
+        self.default_backend: AvailabilityBackend = MockAvailabilityBackend()
+        self.backends = backends if backends is not None else self._backends_from_settings()
+        self.cache = TTLCache(maxsize=100_000)
+        self.taken_index = taken_index
+        if taken_index is None and settings.DOMAIN_TAKEN_INDEX_PATH and os.path.exists(settings.DOMAIN_TAKEN_INDEX_PATH):
+            self.taken_index = BloomFilter.load(settings.DOMAIN_TAKEN_INDEX_PATH)
+
+    @staticmethod
+    def _backends_from_settings() -> Dict[str, AvailabilityBackend]:
+        """
+        DOMAIN_RDAP_SERVERS maps extensions to RDAP base URLs, e.g.
+        {".com": "https://rdap.verisign.com/com/v1"}. TLDs sharing a server
+        share one backend (and so one rate limit).
+        """
+        servers = settings.DOMAIN_RDAP_SERVERS
+        by_url: Dict[str, AvailabilityBackend] = {}
+        backends = {}
+        for ext, url in servers.items():
+            if url not in by_url:
+                by_url[url] = RDAPAvailabilityBackend(url, rate=settings.DOMAIN_RDAP_RATE)
+            backends[ext] = by_url[url]
+        return backends
+
+    def backend_for(self, ext: str) -> AvailabilityBackend:
+        return self.backends.get(ext, self.default_backend)
+
+    def price_for(self, ext: str) -> float:
+        # Pricing logic for students (subsidized view) vs standard
+        if ext == ".edu":
+            return 0.00 # Free for education
+        elif ext == ".ai":
+            return 60.00
+        elif ext == ".org":
+            return 8.00
+        return 10.00
+
+    async def is_available(self, domain_name: str) -> bool:
+        """Cached availability of a single fully-qualified name."""
+        cached = self.cache.get(domain_name)
+        if cached is not None:
+            return cached
+
+        ext = domain_name[domain_name.index("."):]
+        try:
+            registered = await self.backend_for(ext).is_registered(domain_name)
+        except (httpx.HTTPError, OSError) as e:
+            # Never offer a name we could not verify; don't cache the failure.
+            logger.warning("Domain lookup failed for %s: %s", domain_name, e)
+            return False
+
+        self.cache.set(domain_name, not registered, self.TAKEN_TTL if registered else self.AVAILABLE_TTL)
+        return not registered
+
+    async def _availability_many(self, domains: List[str], deadline: float) -> Dict[str, bool]:
+        """Availability of each domain; lookups still running at the deadline count as unavailable."""
+        tasks = {asyncio.ensure_future(self.is_available(domain)): domain for domain in dict.fromkeys(domains)}
+        if not tasks:
+            return {}
+        done, pending = await asyncio.wait(tasks, timeout=deadline)
+        for task in pending:
+            task.cancel()
+        if pending:
+            logger.warning("Domain: %d lookups missed the %ss deadline", len(pending), deadline)
+        return {domain: task in done and task.result() for task, domain in tasks.items()}
+
+    def _results(self, base_name: str, available: Dict[str, bool]) -> List[DomainSearchResult]:
+        return [
+            DomainSearchResult(
+                domain=f"{base_name}{ext}",
+                available=available[f"{base_name}{ext}"],
+                price=self.price_for(ext),
+                extension=ext
+            )
+            for ext in self.SUPPORTED_EXTENSIONS
+        ]
+
+    @singleflight("domain.check", key=lambda self, keyword, deadline=None: (self, keyword.split('.')[0].lower(), deadline))
+    async def check_availability(self, keyword: str, deadline: Optional[float] = None) -> List[DomainSearchResult]:
         """
         Check availability for a keyword across multiple extensions.
+        All extensions are queried concurrently.
         """
-        results = []
         base_name = keyword.split('.')[0].lower() # Simple sanitation
-        
-        # In a real app, this would call an external API (e.g., Namecheap API)
-        # For this "Business for Students/NGOs" platform, we mock the logic.
-        
-        for ext in self.SUPPORTED_EXTENSIONS:
-            domain_name = f"{base_name}{ext}"
-            
-            # Mock Logic: "ksfoundation" is taken, others randomized lightly or available
-            is_taken = domain_name in ["ksfoundation.com", "google.com", "facebook.com"]
-            
-            # Pricing logic for students (subsidized view) vs standard
-            price = 10.00
-            if ext == ".edu":
-                price = 0.00 # Free for education
-            elif ext == ".ai":
-                price = 60.00
-            elif ext == ".org":
-                price = 8.00
-            
-            results.append(DomainSearchResult(
-                domain=domain_name,
-                available=not is_taken,
-                price=price,
-                extension=ext
-            ))
-            
-        return results
+        domains = [f"{base_name}{ext}" for ext in self.SUPPORTED_EXTENSIONS]
+        available = await self._availability_many(domains, self.CHECK_DEADLINE if deadline is None else deadline)
+        return self._results(base_name, available)
+
+    @singleflight("domain.check_bulk", key=lambda self, keywords, deadline=None: (self, tuple(keywords), deadline))
+    async def check_availability_bulk(self, keywords: List[str], deadline: Optional[float] = None) -> Dict[str, List[DomainSearchResult]]:
+        """
+        Check many keywords in one call. Lookups for every keyword/TLD pair run
+        concurrently, bounded by each backend's rate limit and concurrency cap,
+        and the whole request by BULK_DEADLINE.
+        """
+        unique = list(dict.fromkeys(k.strip() for k in keywords if k.strip()))
+        if len(unique) > self.MAX_BULK_KEYWORDS:
+            raise ValueError(f"At most {self.MAX_BULK_KEYWORDS} keywords per request")
+        base_names = {keyword: keyword.split('.')[0].lower() for keyword in unique}
+        domains = [f"{base}{ext}" for base in base_names.values() for ext in self.SUPPORTED_EXTENSIONS]
+        available = await self._availability_many(domains, self.BULK_DEADLINE if deadline is None else deadline)
+        return {keyword: self._results(base, available) for keyword, base in base_names.items()}
+
+    def suggestion_candidates(self, keyword: str) -> List[Tuple[float, str, str]]:
+        """
+        Ranked (score, domain, extension) alternatives to a keyword:
+        hyphenated, prefixed and suffixed names across every extension.
+        The keyword's own names are what `check_availability` answers.
+        """
+        words = [w for w in re.split(r"[^a-z0-9]+", keyword.split(".")[0].lower()) if w]
+        if not words:
+            return []
+        base = "".join(words)
+
+        names: Dict[str, float] = {}
+        if len(words) > 1:
+            names["-".join(words)] = 1.0
+        for rank, prefix in enumerate(self.SUGGESTION_PREFIXES):
+            names.setdefault(f"{prefix}{base}", 2.0 + rank * 0.1)
+        for rank, suffix in enumerate(self.SUGGESTION_SUFFIXES):
+            names.setdefault(f"{base}{suffix}", 2.0 + rank * 0.1)
+            names.setdefault(f"{base}-{suffix}", 3.0 + rank * 0.1)
+
+        candidates = []
+        for name, variant_weight in names.items():
+            if len(name) > 63:
+                continue
+            length_weight = (len(name) - len(base)) * 0.05
+            for ext in self.SUPPORTED_EXTENSIONS:
+                score = variant_weight + self.EXTENSION_WEIGHTS.get(ext, 5.0) + length_weight
+                candidates.append((round(score, 3), f"{name}{ext}", ext))
+        candidates.sort()
+        return candidates
+
+    @singleflight("domain.suggest")
+    async def suggest(self, keyword: str, limit: int = 50, verify: bool = False) -> List[DomainSuggestion]:
+        """
+        Alternatives for a (possibly taken) keyword.
+        Candidates found in the local taken-name index, or cached as taken,
+        are dropped in memory. By default the others are returned without a
+        live check (`available` is None unless cached); with `verify` they
+        also go through the live availability check (rate-limited, so much
+        slower). Check the chosen name before buying it.
+        """
+        survivors = [
+            candidate for candidate in self.suggestion_candidates(keyword)
+            if self.taken_index is None or candidate[1] not in self.taken_index
+        ]
+
+        suggestions: List[DomainSuggestion] = []
+        # Verify in windows so a few live "taken" answers don't shorten the list
+        window = limit + max(limit // 4, 5)
+        while survivors and len(suggestions) < limit:
+            batch, survivors = survivors[:window], survivors[window:]
+            if verify:
+                available = await asyncio.gather(*(self.is_available(domain) for _, domain, _ in batch))
+            else:
+                available = [self.cache.get(domain) for _, domain, _ in batch]
+            for (score, domain, ext), is_available in zip(batch, available):
+                if is_available is not False and len(suggestions) < limit:
+                    suggestions.append(DomainSuggestion(
+                        domain=domain,
+                        available=is_available,
+                        price=self.price_for(ext),
+                        extension=ext,
+                        score=score,
+                        verified=is_available is not None
+                    ))
+        return suggestions
 
     async def register_domain(self, domain: str, owner_id: str) -> bool:
         """
@@ -59,8 +290,56 @@ class DomainService:
         # 1. Verify payment or credit
         # 2. Call Registrar API to lock domain
         # 3. Save to database
-        print(f"🌍 Registering {domain} for user {owner_id}...")
+        logger.info("Registering %s for user %s", domain, owner_id)
         await asyncio.sleep(1) # Simulate API call
+        self.cache.pop(domain)
         return True
 
+    async def close(self):
+        for backend in {id(b): b for b in self.backends.values()}.values():
+            await backend.close()
+
+def iter_zone_names(path: str) -> Iterator[str]:
+    """
+    Yields the owner names in a DNS zone-file dump (e.g. a TLD zone from CZDS),
+    lowercased and without the trailing dot. Handles $ORIGIN and relative names.
+    """
+    origin = ""
+    last = None
+    with open(path, "r", encoding="ascii", errors="ignore") as f:
+        for line in f:
+            if not line.strip() or line[0] in ";\t ":
+                continue
+            owner = line.split(None, 1)[0]
+            if owner.upper() == "$ORIGIN":
+                origin = line.split()[1].rstrip(".").lower()
+                continue
+            if owner.startswith("$") or owner == "@":
+                continue
+            if owner.endswith("."):
+                name = owner[:-1].lower()
+            else:
+                name = f"{owner.lower()}.{origin}" if origin else owner.lower()
+            if name != last and "." in name:
+                last = name
+                yield name
+
+def build_taken_index(zone_paths: List[str], output_path: str, error_rate: float = 0.001) -> BloomFilter:
+    """Precomputes the taken-domain Bloom filter from zone dumps."""
+    capacity = sum(sum(1 for _ in iter_zone_names(path)) for path in zone_paths)
+    index = BloomFilter(capacity, error_rate)
+    for path in zone_paths:
+        index.update(iter_zone_names(path))
+    index.save(output_path)
+    return index
+
 domain_service = DomainService()
+
+if __name__ == "__main__":
+    # python -m app.services.domain <output.bloom> <zone> [<zone> ...]
+    import sys
+    from app.core.logs import configure_logging, shutdown_logging
+    configure_logging(fmt="text")
+    built = build_taken_index(sys.argv[2:], sys.argv[1])
+    logger.info("Indexed %d taken domains into %s (%d KiB)", built.count, sys.argv[1], len(built.bits) // 1024)
+    shutdown_logging()
@@ -1,21 +1,216 @@
 
-from typing import List, Dict, Union
+import ipaddress
+import shlex
+from functools import lru_cache
+from typing import List, Dict, Optional, Union, Tuple, NamedTuple, Iterable
 from pydantic import BaseModel
+from app.services.geoip import geoip_database
 
 class FirewallRule(BaseModel):
     direction: str = "IN" # IN, OUT
     protocol: str = "tcp"
     port: Union[int, str]
-    action: str = "ALLOW" # ALLOW, DENY
+    action: str = "ALLOW" # ALLOW, DENY, LIMIT (ufw rate limiting)
     source_ip: str = "0.0.0.0/0"
     comment: str = ""
 
+class RuleKey(NamedTuple):
+    """
+    Canonical identity of a compiled rule.
+    `ports` is "any", a single port ("22") or an inclusive range ("8000:8010").
+    `network` is the peer CIDR (source for IN, destination for OUT).
+    """
+    direction: str
+    action: str
+    protocol: str
+    ports: str
+    network: str
+
+# A compiled ruleset maps each canonical rule to its comment.
+# Comments are labels only: they never take part in diffing.
+CompiledRuleset = Dict[RuleKey, str]
+
+# The node's live rules, unmerged: each rule maps to its ufw spec exactly
+# as the node printed it, so it can be deleted verbatim.
+LiveRuleset = Dict[RuleKey, str]
+
+class RulesetDiff(BaseModel):
+    added: List[RuleKey]
+    removed: List[RuleKey]
+    unchanged: int
+
+PortRange = Tuple[int, int]
+ANY_PORT: PortRange = (0, 65535)
+
+ACTIONS = ("ALLOW", "DENY", "LIMIT")
+
+class Network(NamedTuple):
+    version: int
+    start: int
+    end: int
+    text: str
+
+class FirewallCompiler:
+    """
+    Normalizes FirewallRule lists into a minimal canonical ruleset.
+    Overlapping/adjacent port ranges and CIDRs are merged so the node only
+    carries the rules it needs, and two rulesets can be diffed cheaply.
+    """
+
+    IPTABLES_CHAINS = {"IN": "KSF-INPUT", "OUT": "KSF-OUTPUT"}
+
+    def compile(self, rules: Iterable[FirewallRule]) -> CompiledRuleset:
+        # Pass 1: merge port ranges per (direction, action, protocol, network)
+        by_network: Dict[Tuple[str, str, str, Network], List[Tuple[int, int, str]]] = {}
+        for rule in rules:
+            if rule.action.upper() not in ACTIONS:
+                raise ValueError(f"Unsupported firewall action: {rule.action}")
+            group = (rule.direction.upper(), rule.action.upper(), rule.protocol.lower(),
+                     _parse_network(rule.source_ip.strip()))
+            ranges = by_network.setdefault(group, [])
+            for start, end in _parse_ports(rule.port):
+                ranges.append((start, end, rule.comment))
+
+        # Pass 2: collapse networks per (direction, action, protocol, port range)
+        by_ports: Dict[Tuple[str, str, str, PortRange], List[Network]] = {}
+        port_comments: Dict[Tuple[str, str, str, PortRange], str] = {}
+        for (direction, action, protocol, network), ranges in by_network.items():
+            for start, end, comment in _merge_ranges(ranges):
+                key = (direction, action, protocol, (start, end))
+                by_ports.setdefault(key, []).append(network)
+                if comment and key not in port_comments:
+                    port_comments[key] = comment
+
+        entries = []
+        for group, networks in by_ports.items():
+            direction, action, protocol, port_range = group
+            ports = _format_ports(port_range)
+            comment = port_comments.get(group, "")
+            # ufw only takes a port range with an explicit protocol
+            protocols = [protocol]
+            if protocol == "any" and port_range != ANY_PORT and port_range[0] != port_range[1]:
+                protocols = ["tcp", "udp"]
+            for version, start, text in _collapse_networks(networks):
+                for proto in protocols:
+                    # DENY first so that ordered (first-match) backends honour them.
+                    order = (action != "DENY", direction, proto, port_range, version, start, text)
+                    entries.append((order, RuleKey(direction, action, proto, ports, text), comment))
+
+        entries.sort(key=lambda entry: entry[0])
+        return {key: comment for _, key, comment in entries}
+
+    def diff(self, current: CompiledRuleset, desired: CompiledRuleset) -> RulesetDiff:
+        added = [key for key in desired if key not in current]
+        removed = [key for key in current if key not in desired]
+        return RulesetDiff(added=added, removed=removed, unchanged=len(desired) - len(added))
+
+    def ufw_rule(self, key: RuleKey, comment: str = "") -> str:
+        """Renders the ufw rule spec (without the leading `ufw`)."""
+        if key.protocol == "any" and ":" in key.ports:
+            raise ValueError(f"ufw needs a tcp or udp protocol for port range {key.ports}")
+        spec = key.action.lower()
+        if key.direction == "OUT":
+            spec += f" out to {key.network}"
+            if key.ports != "any":
+                spec += f" port {key.ports}"
+        else:
+            spec += f" from {key.network} to any"
+            if key.ports != "any":
+                spec += f" port {key.ports}"
+        if key.protocol != "any":
+            spec += f" proto {key.protocol}"
+        if comment:
+            spec += f" comment {shlex.quote(comment)}"
+        return spec
+
+    def incremental_ufw_commands(self, current: LiveRuleset, desired: CompiledRuleset) -> List[str]:
+        """
+        Minimal ufw commands turning `current` into `desired`.
+        New rules are added before stale ones are deleted so that allowed
+        traffic never sees a gap, and DENY rules are inserted at the top.
+        Stale rules are deleted with the node's own spelling of the rule.
+        """
+        delta = self.diff(current, desired)
+        commands = []
+        for key in delta.added:
+            prefix = "ufw insert 1" if key.action == "DENY" else "ufw"
+            commands.append(f"{prefix} {self.ufw_rule(key, desired[key])}")
+        for key in delta.removed:
+            commands.append(f"ufw delete {current[key]}")
+        return commands
+
+    def iptables_restore_payload(self, ruleset: CompiledRuleset, version: int = 4) -> str:
+        """
+        Renders an `iptables-restore --noflush` batch that atomically replaces
+        the contents of the KSF chains. Use version=6 for ip6tables-restore.
+        """
+        lines = ["*filter"]
+        for chain in self.IPTABLES_CHAINS.values():
+            lines.append(f":{chain} - [0:0]")
+            lines.append(f"-F {chain}")
+
+        for key, comment in ruleset.items():
+            if _parse_network(key.network).version != version:
+                continue
+            chain = self.IPTABLES_CHAINS[key.direction]
+            peer = "-d" if key.direction == "OUT" else "-s"
+            if key.action == "LIMIT":
+                raise ValueError("LIMIT rules are only supported with ufw")
+            target = "DROP" if key.action == "DENY" else "ACCEPT"
+            protocols = [key.protocol]
+            if key.protocol == "any" and key.ports != "any":
+                protocols = ["tcp", "udp"]
+            for protocol in protocols:
+                line = f"-A {chain} {peer} {key.network}"
+                if protocol != "any":
+                    line += f" -p {protocol}"
+                if key.ports != "any":
+                    line += f" --dport {key.ports}"
+                if comment:
+                    line += f" -m comment --comment {_iptables_quote(comment[:256])}"
+                lines.append(f"{line} -j {target}")
+
+        lines.append("COMMIT")
+        return "\n".join(lines) + "\n"
+
+    def iptables_apply_commands(self, ruleset: CompiledRuleset) -> List[str]:
+        """Shell commands applying the ruleset as one atomic batch per IP family."""
+        commands = []
+        for version, binary in ((4, "iptables"), (6, "ip6tables")):
+            payload = self.iptables_restore_payload(ruleset, version)
+            commands.append(f"{binary}-restore --noflush <<'KSF_EOF'\n{payload}KSF_EOF")
+            for builtin, chain in (("INPUT", "KSF-INPUT"), ("OUTPUT", "KSF-OUTPUT")):
+                commands.append(f"{binary} -C {builtin} -j {chain} 2>/dev/null || {binary} -I {builtin} -j {chain}")
+        return commands
+
+    def parse_ufw_rules(self, lines: Iterable[str]) -> LiveRuleset:
+        """
+        Parses the node's current rules as printed by `ufw show added`
+        (the same syntax emitted by `ufw_rule`). Unknown lines are skipped.
+        Rules are not merged: a rule only matches a desired one if the
+        node holds exactly that rule.
+        """
+        live: LiveRuleset = {}
+        for line in lines:
+            parsed = _parse_ufw_line(line)
+            if parsed is None:
+                continue
+            rule, spec = parsed
+            ports = ",".join(_format_ports(port_range) for port_range in _parse_ports(rule.port))
+            key = RuleKey(rule.direction, rule.action, rule.protocol.lower(), ports,
+                          _parse_network(rule.source_ip).text)
+            live.setdefault(key, spec)
+        return live
+
 class FirewallService:
     """
     Generates Firewall configurations.
     Translates intents to UFW/IPTables commands.
     """
 
+    def __init__(self):
+        self.compiler = FirewallCompiler()
+
     def generate_ufw_commands(self, rules: List[FirewallRule]) -> List[str]:
         commands = ["ufw --force reset", "ufw default deny incoming", "ufw default allow outgoing"]
         
@@ -35,16 +230,194 @@ class FirewallService:
         commands.append("ufw --force enable")
         return commands
 
+    def generate_incremental_ufw_commands(self, rules: List[FirewallRule], current_rules: Iterable[str] = ()) -> List[str]:
+        """
+        Updates a live node without `ufw --force reset`.
+        `current_rules` is the output of `ufw show added` on the node.
+        """
+        desired = self.compiler.compile(rules)
+        current = self.compiler.parse_ufw_rules(current_rules)
+        return self.compiler.incremental_ufw_commands(current, desired)
+
+    def generate_iptables_commands(self, rules: List[FirewallRule]) -> List[str]:
+        """Applies the compiled ruleset as a single atomic iptables-restore batch."""
+        return self.compiler.iptables_apply_commands(self.compiler.compile(rules))
+
     def block_country_commands(self, country_code: str) -> List[str]:
         """
         Generates commands to block IPs from a specific country using ipsets.
+        The set is filled from the local GeoIP dataset in one `ipset restore`
+        and swapped in place, so re-running it updates the block atomically.
+        """
+        if not geoip_database.available:
+            # No local dataset configured: create the (empty) set only
+            set_name = _country_set_name(country_code, 4)
+            return [
+                "apt-get install -y ipset",
+                f"ipset create {set_name} hash:net",
+                f"# Simulate adding IPs for {country_code}",
+                f"iptables -I INPUT -m set --match-set {set_name} src -j DROP"
+            ]
+
+        commands = ["command -v ipset >/dev/null || apt-get install -y ipset"]
+        for version, binary in ((4, "iptables"), (6, "ip6tables")):
+            networks = geoip_database.country_networks(country_code, version)
+            if not networks:
+                continue
+            set_name = _country_set_name(country_code, version)
+            payload = self.ipset_restore_payload(set_name, networks, version)
+            match = f"INPUT -m set --match-set {set_name} src -j DROP"
+            # A staging set left by an interrupted run may have other sizes; `restore` cannot destroy a missing set
+            commands.append(f"ipset destroy {set_name}-new 2>/dev/null || true")
+            commands.append(f"ipset list -n {set_name} >/dev/null 2>&1 || "
+                            f"ipset create {set_name} {_ipset_options(len(networks), version)}")
+            commands.append(f"ipset restore <<'KSF_EOF'\n{payload}KSF_EOF")
+            commands.append(f"{binary} -C {match} 2>/dev/null || {binary} -I {match}")
+        return commands
+
+    def ipset_restore_payload(self, set_name: str, networks: List[str], version: int = 4) -> str:
         """
-        # In a real app, this would download IP blocks from maxmind or ipdeny
-        return [
-            "apt-get install -y ipset",
-            f"ipset create country_{country_code} hash:net",
-            f"# Simulate adding IPs for {country_code}",
-            f"iptables -I INPUT -m set --match-set country_{country_code} src -j DROP"
-        ]
+        Builds an `ipset restore` payload that loads `networks` into a fresh
+        staging set, sized for them, and swaps it with the live set. Both
+        the live set and the absence of the staging set must be ensured
+        beforehand (see `block_country_commands`): a set is never recreated
+        with `-exist`, which fails when its hashsize or maxelem changed.
+        """
+        staging = f"{set_name}-new"
+        lines = [f"create {staging} {_ipset_options(len(networks), version)}"]
+        lines.extend(f"add {staging} {network}" for network in networks)
+        lines.append(f"swap {staging} {set_name}")
+        lines.append(f"destroy {staging}")
+        return "\n".join(lines) + "\n"
+
+def _ipset_options(count: int, version: int) -> str:
+    family = "inet" if version == 4 else "inet6"
+    maxelem = max(65536, 1 << (count - 1).bit_length())
+    hashsize = max(1024, maxelem // 4)
+    return f"hash:net family {family} hashsize {hashsize} maxelem {maxelem}"
+
+def _country_set_name(country_code: str, version: int) -> str:
+    name = f"country_{country_code.lower()}"
+    return name if version == 4 else f"{name}_v6"
+
+def _parse_ports(port: Union[int, str]) -> List[PortRange]:
+    value = str(port).strip().lower()
+    if value in ("any", "*", ""):
+        return [ANY_PORT]
+    ranges = []
+    for part in value.split(","):
+        low, _, high = part.replace("-", ":").partition(":")
+        start = int(low)
+        end = int(high) if high else start
+        if not 0 <= start <= end <= 65535:
+            raise ValueError(f"Invalid port range: {part}")
+        ranges.append((start, end))
+    return ranges
+
+def _merge_ranges(ranges: List[Tuple[int, int, str]]) -> List[Tuple[int, int, str]]:
+    """Merges overlapping/adjacent port ranges, keeping the first non-empty comment."""
+    merged: List[Tuple[int, int, str]] = []
+    for start, end, comment in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            last_start, last_end, last_comment = merged[-1]
+            merged[-1] = (last_start, max(end, last_end), last_comment or comment)
+        else:
+            merged.append((start, end, comment))
+    return merged
+
+def _format_ports(port_range: PortRange) -> str:
+    if port_range == ANY_PORT:
+        return "any"
+    start, end = port_range
+    return str(start) if start == end else f"{start}:{end}"
+
+@lru_cache(maxsize=65536)
+def _parse_network(text: str) -> Network:
+    network = ipaddress.ip_network(text, strict=False)
+    start = int(network.network_address)
+    return Network(network.version, start, start + network.num_addresses - 1, str(network))
+
+def _collapse_networks(networks: List[Network]) -> List[Tuple[int, int, str]]:
+    """
+    Integer interval merge of CIDRs; only merged spans are re-split into
+    CIDR blocks, untouched networks keep their parsed text.
+    """
+    collapsed = []
+    for version in (4, 6):
+        spans: List[List] = []
+        for network in sorted(n for n in networks if n.version == version):
+            if spans and network.start <= spans[-1][1] + 1:
+                span = spans[-1]
+                if network.end > span[1]:
+                    span[1] = network.end
+                    span[2] = None
+            else:
+                spans.append([network.start, network.end, network.text])
+        for start, end, text in spans:
+            if text is not None:
+                collapsed.append((version, start, text))
+                continue
+            address = ipaddress.IPv4Address if version == 4 else ipaddress.IPv6Address
+            for block in ipaddress.summarize_address_range(address(start), address(end)):
+                collapsed.append((version, int(block.network_address), str(block)))
+    return collapsed
+
+def _iptables_quote(comment: str) -> str:
+    """iptables-restore only understands double quotes and has no escaping."""
+    return '"' + " ".join(comment.replace('"', "'").replace("\\", "/").split()) + '"'
+
+def _parse_ufw_line(line: str) -> Optional[Tuple[FirewallRule, str]]:
+    """Parses one `ufw show added` line into (rule, spec without `ufw`)."""
+    spec = line.strip()
+    try:
+        tokens = shlex.split(spec)
+    except ValueError:
+        return None
+    if tokens[:1] == ["ufw"]:
+        tokens = tokens[1:]
+        spec = spec[3:].lstrip()
+    if not tokens or tokens[0] not in ("allow", "deny", "reject", "limit"):
+        return None
+
+    action = {"deny": "DENY", "reject": "DENY", "limit": "LIMIT"}.get(tokens[0], "ALLOW")
+    direction, protocol, port, network, comment = "IN", "any", "any", None, ""
+    rest = tokens[1:]
+    i = 0
+    while i < len(rest):
+        token = rest[i]
+        value = rest[i + 1] if i + 1 < len(rest) else ""
+        if token in ("in", "out"):
+            direction = token.upper()
+            i += 1
+            continue
+        if token == "from":
+            if direction == "IN" and value != "any":
+                network = value
+        elif token == "to":
+            if direction == "OUT" and value != "any":
+                network = value
+        elif token == "port":
+            port = value
+        elif token == "proto":
+            protocol = value
+        elif token == "comment":
+            comment = value
+        else:
+            # Simple form: `ufw allow 22/tcp`
+            port, _, proto = token.partition("/")
+            protocol = proto or protocol
+            i += 1
+            continue
+        i += 2
+
+    if network is None:
+        network = "0.0.0.0/0"
+    try:
+        ipaddress.ip_network(network, strict=False)
+        _parse_ports(port)
+    except ValueError:
+        return None
+    return FirewallRule(direction=direction, action=action, protocol=protocol,
+                        port=port, source_ip=network, comment=comment), spec
 
 firewall_service = FirewallService()
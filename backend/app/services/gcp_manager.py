@@ -1,7 +1,11 @@
 
 import asyncio
+import logging
 from typing import Dict, Any, Optional
 from pydantic import BaseModel
+from app.core.tracing import annotate, traced
+
+logger = logging.getLogger(__name__)
 
 # In a real scenario, we would import:
 # from google.cloud import compute_v1
@@ -24,11 +28,13 @@ class GCPManager:
     DEFAULT_ZONE = "us-central1-a"
     FREE_TIER_MACHINE = "e2-micro"
     
+    @traced("gcp.create_instance")
     async def create_free_tier_instance(self, project_id: str, instance_name: str, service_account_json: Optional[str] = None) -> GCPInstance:
         """
         Creates a new VM instance on Google Cloud.
         """
-        print(f"☁️  GCP: Provisioning {instance_name} ({self.FREE_TIER_MACHINE}) in {self.DEFAULT_ZONE}...")
+        annotate(project=project_id, instance=instance_name)
+        logger.info("GCP: provisioning %s (%s) in %s", instance_name, self.FREE_TIER_MACHINE, self.DEFAULT_ZONE)
         
         # Mocking the actual Google Cloud API call for this environment
         # In production:
@@ -48,7 +54,7 @@ class GCPManager:
             machine_type=self.FREE_TIER_MACHINE
         )
         
-        print(f"✅ GCP: Instance {instance_name} created at {mock_ip}")
+        logger.info("GCP: instance %s created at %s", instance_name, mock_ip)
         
         # Auto-connect this new node to our NodeManager
         # from app.services.node_manager import node_manager
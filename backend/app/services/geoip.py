@@ -0,0 +1,108 @@
+import mmap
+import os
+import socket
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+Range = Tuple[int, int]
+
+class GeoIPDatabase:
+    """
+    Local, file-based GeoIP CIDR dataset.
+    The file holds one `network,country_code` pair per line (ipdeny/db-ip style
+    exports, `#` comments and a header row are skipped). It is memory-mapped and
+    indexed once on first use; per-country aggregates are cached.
+    """
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self._index: Optional[Dict[str, Tuple[List[Range], List[Range]]]] = None
+        self._aggregates: Dict[Tuple[str, int], List[str]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def available(self) -> bool:
+        return bool(self.path) and os.path.isfile(self.path)
+
+    def _load(self) -> Dict[str, Tuple[List[Range], List[Range]]]:
+        if self._index is not None:
+            return self._index
+        with self._lock:
+            if self._index is None:
+                index: Dict[str, Tuple[List[Range], List[Range]]] = {}
+                if not self.available or os.path.getsize(self.path) == 0:
+                    # Missing or empty dataset: nothing to block (mmap rejects empty files)
+                    self._index = index
+                    return index
+                with open(self.path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    for line in iter(mm.readline, b""):
+                        parsed = _parse_line(line)
+                        if parsed is None:
+                            continue
+                        country, version, start, end = parsed
+                        families = index.setdefault(country, ([], []))
+                        families[0 if version == 4 else 1].append((start, end))
+                self._index = index
+        return self._index
+
+    def countries(self) -> List[str]:
+        return sorted(self._load())
+
+    def country_networks(self, country_code: str, version: int = 4) -> List[str]:
+        """Minimal list of CIDRs covering the country (adjacent prefixes aggregated)."""
+        key = (country_code.upper(), version)
+        if key not in self._aggregates:
+            families = self._load().get(key[0], ([], []))
+            ranges = aggregate_ranges(families[0 if version == 4 else 1])
+            self._aggregates[key] = [cidr for start, end in ranges for cidr in range_to_cidrs(start, end, version)]
+        return self._aggregates[key]
+
+def _parse_line(line: bytes):
+    line = line.strip()
+    if not line or line.startswith(b"#"):
+        return None
+    network, _, country = line.partition(b",")
+    try:
+        address, _, prefix = network.strip().decode("ascii").partition("/")
+        country = country.strip().decode("ascii").upper()
+        if ":" in address:
+            version, bits, family = 6, 128, socket.AF_INET6
+        else:
+            version, bits, family = 4, 32, socket.AF_INET
+        start = int.from_bytes(socket.inet_pton(family, address), "big")
+        size = 1 << (bits - int(prefix or bits))
+    except (OSError, ValueError):
+        return None  # header row or malformed (e.g. non-ASCII) entry
+    start -= start % size
+    return country, version, start, start + size - 1
+
+def aggregate_ranges(ranges: List[Range]) -> List[Range]:
+    """Merges overlapping and adjacent integer ranges."""
+    merged: List[List[int]] = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return [(start, end) for start, end in merged]
+
+def range_to_cidrs(start: int, end: int, version: int = 4) -> List[str]:
+    """Splits an inclusive integer range into the fewest aligned CIDR blocks."""
+    bits = 32 if version == 4 else 128
+    family = socket.AF_INET if version == 4 else socket.AF_INET6
+    width = bits // 8
+    cidrs = []
+    while start <= end:
+        # Largest block aligned on `start` that still fits in the range
+        size = start & -start if start else 1 << bits
+        while size > end - start + 1:
+            size >>= 1
+        address = socket.inet_ntop(family, start.to_bytes(width, "big"))
+        cidrs.append(f"{address}/{bits - size.bit_length() + 1}")
+        start += size
+    return cidrs
+
+geoip_database = GeoIPDatabase(settings.GEOIP_CIDR_PATH)
@@ -0,0 +1,346 @@
+
+import asyncio
+import logging
+import re
+from datetime import date, datetime, timezone
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+import httpx
+from pydantic import BaseModel
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.lazy import Provider
+from app.services.app_store import AppStoreService, app_store_service
+from app.services.node_manager import ServerNode, node_manager
+
+logger = logging.getLogger(__name__)
+
+DOCKER_HUB = "registry-1.docker.io"
+MANIFEST_TYPES = ", ".join([
+    "application/vnd.docker.distribution.manifest.list.v2+json",
+    "application/vnd.oci.image.index.v1+json",
+    "application/vnd.docker.distribution.manifest.v2+json",
+    "application/vnd.oci.image.manifest.v1+json",
+])
+
+# executor(node, commands) -> one output string per command, "Error: ..." on failure
+Executor = Callable[[ServerNode, List[str]], Awaitable[List[str]]]
+
+class ImageRef(BaseModel):
+    registry: str
+    repository: str
+    tag: str
+
+    @property
+    def name(self) -> str:
+        """The repository as `docker pull` spells it."""
+        if self.registry == DOCKER_HUB:
+            return self.repository.removeprefix("library/")
+        return f"{self.registry}/{self.repository}"
+
+def parse_image(image: str) -> ImageRef:
+    """`nextcloud:latest` -> registry-1.docker.io, library/nextcloud, latest."""
+    name, _, tag = image.rpartition(":") if ":" in image.rsplit("/", 1)[-1] else (image, "", "latest")
+    first, _, rest = name.partition("/")
+    if rest and ("." in first or ":" in first or first == "localhost"):
+        registry, repository = first, rest
+        if registry in ("docker.io", "index.docker.io"):
+            registry = DOCKER_HUB
+    else:
+        registry, repository = DOCKER_HUB, name if rest else f"library/{name}"
+    return ImageRef(registry=registry, repository=repository, tag=tag or "latest")
+
+class PrefetchItem(BaseModel):
+    image: str # catalog reference, e.g. nextcloud:latest
+    digest: str
+    size: int # compressed bytes, for the bandwidth budget
+
+class NodeCoverage(BaseModel):
+    node: str
+    cached: int # catalog images present at their pinned digest
+    total: int
+    weighted: float # share of recent deploys the node can serve without a pull
+    missing: List[str]
+    stale: List[str] # present, but at a digest other than the pinned one
+
+class RegistryClient:
+    """
+    Docker Registry HTTP API v2 lookups: manifest digests (HEAD, from the
+    Docker-Content-Digest header) and compressed image sizes. `base_url`
+    sends every lookup to one registry, e.g. a local mirror.
+    """
+
+    def __init__(self, base_url: Optional[str] = None, timeout: float = 10.0, platform: str = "linux/amd64"):
+        self.base_url = base_url.rstrip("/") if base_url else None
+        self.platform = platform
+        self.timeout = timeout
+        self._client: Optional[httpx.AsyncClient] = None
+        self._tokens: Dict[str, str] = {}
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=self.timeout)
+        return self._client
+
+    def _url(self, ref: ImageRef, reference: str) -> str:
+        base = self.base_url or f"https://{ref.registry}"
+        return f"{base}/v2/{ref.repository}/manifests/{reference}"
+
+    async def _request(self, method: str, ref: ImageRef, reference: str) -> httpx.Response:
+        headers = {"Accept": MANIFEST_TYPES}
+        if ref.repository in self._tokens:
+            headers["Authorization"] = f"Bearer {self._tokens[ref.repository]}"
+        response = await self.client.request(method, self._url(ref, reference), headers=headers)
+        challenge = response.headers.get("WWW-Authenticate", "")
+        if response.status_code == 401 and challenge.lower().startswith("bearer"):
+            # Anonymous pull token (Docker Hub and most public registries)
+            params = dict(re.findall(r'(\w+)="([^"]*)"', challenge))
+            realm = params.pop("realm")
+            params.setdefault("scope", f"repository:{ref.repository}:pull")
+            token = await self.client.get(realm, params=params)
+            token.raise_for_status()
+            body = token.json()
+            self._tokens[ref.repository] = body.get("token") or body["access_token"]
+            headers["Authorization"] = f"Bearer {self._tokens[ref.repository]}"
+            response = await self.client.request(method, self._url(ref, reference), headers=headers)
+        response.raise_for_status()
+        return response
+
+    async def digest(self, image: str) -> str:
+        ref = parse_image(image)
+        response = await self._request("HEAD", ref, ref.tag)
+        digest = response.headers.get("Docker-Content-Digest")
+        if not digest:
+            raise ValueError(f"registry returned no digest for {image}")
+        return digest
+
+    async def size(self, image: str, digest: str) -> int:
+        """Compressed size of the image for this platform (layers + config)."""
+        ref = parse_image(image)
+        manifest = (await self._request("GET", ref, digest)).json()
+        if "manifests" in manifest:
+            os_name, _, arch = self.platform.partition("/")
+            entry = next((m for m in manifest["manifests"]
+                          if m.get("platform", {}).get("os") == os_name
+                          and m.get("platform", {}).get("architecture") == arch), None)
+            if entry is None:
+                raise ValueError(f"{image} has no {self.platform} manifest")
+            manifest = (await self._request("GET", ref, entry["digest"])).json()
+        return sum(layer.get("size", 0) for layer in manifest.get("layers", [])) + manifest.get("config", {}).get("size", 0)
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+class ImagePrefetchScheduler:
+    """
+    Pre-pulls popular app store images onto nodes so a first deploy does
+    not wait on a multi-GB pull.
+
+    Images are ranked by deploys through the app store. Pulls only happen
+    inside the idle hours and within a daily (UTC) byte budget, one image at
+    a time per node and at most `max_parallel_nodes` nodes at once. Each
+    image is pinned to the digest it first resolved to and pulled by that
+    digest, then tagged with its catalog name; deploys use the local tag,
+    so a moving `:latest` never causes a surprise re-pull. Pins move only
+    through `refresh_pins()`.
+    """
+
+    def __init__(self, registry: Optional[RegistryClient] = None, store: Optional[AppStoreService] = None,
+                 executor: Optional[Executor] = None, idle_hours: str = "1-6", budget_mb: int = 20_000,
+                 top_n: int = 10, max_parallel_nodes: int = 4, clock: Optional[Callable[[], datetime]] = None):
+        self.registry = registry if registry is not None else RegistryClient(settings.PREFETCH_REGISTRY_URL)
+        self.store = store if store is not None else app_store_service
+        self.executor = executor if executor is not None else node_manager.connect_and_execute
+        self.idle_hours = _parse_hours(idle_hours)
+        self.budget = budget_mb * 1024 * 1024
+        self.top_n = top_n
+        self.clock = clock or (lambda: datetime.now(timezone.utc))
+        self.node_limit = asyncio.Semaphore(max_parallel_nodes)
+        self.nodes: Dict[str, ServerNode] = {}
+        self.inventory: Dict[str, Dict[str, str]] = {} # node -> image -> digest present
+        self.pins: Dict[str, str] = {}
+        self.sizes = TTLCache(maxsize=10_000, ttl=86400)
+        self._scanned: set = set() # nodes whose image list has been read
+        self._spent: Tuple[Optional[date], int] = (None, 0) # (UTC day, bytes pulled)
+        self._task: Optional[asyncio.Task] = None
+
+    def register_node(self, node: ServerNode) -> None:
+        self.nodes[node.name] = node
+        self.inventory.setdefault(node.name, {})
+
+    def is_idle(self, now: Optional[datetime] = None) -> bool:
+        hour = (now or self.clock()).hour
+        return any(start <= hour < end if start < end else hour >= start or hour < end
+                   for start, end in self.idle_hours)
+
+    def _deploys_per_image(self) -> Dict[str, int]:
+        deploys: Dict[str, int] = {}
+        for app in self.store.get_catalog():
+            for image in app.images:
+                deploys[image] = deploys.get(image, 0) + self.store.deploys.get(app.id, 0)
+        return deploys
+
+    def popular_images(self) -> List[str]:
+        """Catalog images, most deployed first (catalog order breaks ties)."""
+        deploys = self._deploys_per_image()
+        return sorted(deploys, key=lambda image: -deploys[image])
+
+    async def scan_node(self, node_name: str) -> Dict[str, str]:
+        """Reads which images (and digests) the node already has."""
+        output = await self.executor(self.nodes[node_name], [
+            "docker images --digests --format '{{.Repository}}:{{.Tag}} {{.Digest}}'"
+        ])
+        present = {}
+        for line in "\n".join(output).splitlines():
+            match = re.fullmatch(r"(\S+:\S+) (sha256:[0-9a-f]{64})", line.strip())
+            if match:
+                present[_canonical(match.group(1))] = match.group(2)
+        self.inventory[node_name] = present
+        self._scanned.add(node_name)
+        return present
+
+    async def pin(self, image: str) -> str:
+        if image not in self.pins:
+            self.pins[image] = await self.registry.digest(image)
+        return self.pins[image]
+
+    async def refresh_pins(self, images: Optional[List[str]] = None) -> Dict[str, str]:
+        """Re-resolves pins (e.g. to pick up a new `:latest`); returns the ones that moved."""
+        moved = {}
+        for image in images or list(self.pins):
+            digest = await self.registry.digest(image)
+            if self.pins.get(image) != digest:
+                moved[image] = digest
+            self.pins[image] = digest
+        return moved
+
+    def pinned_reference(self, image: str) -> str:
+        """`repo@sha256:...` for a pinned image, else the image unchanged."""
+        digest = self.pins.get(image)
+        return f"{parse_image(image).name}@{digest}" if digest else image
+
+    async def plan(self, node_name: str) -> List[PrefetchItem]:
+        """Popular images the node lacks at their pinned digest, most popular first."""
+        present = self.inventory.get(node_name, {})
+        items = []
+        for image in self.popular_images()[:self.top_n]:
+            try:
+                digest = await self.pin(image)
+                if present.get(_canonical(image)) == digest:
+                    continue
+                size = self.sizes.get(digest)
+                if size is None:
+                    size = await self.registry.size(image, digest)
+                    self.sizes.set(digest, size)
+            except (httpx.HTTPError, ValueError, KeyError) as e:
+                logger.warning("Prefetch: cannot resolve %s: %s", image, e)
+                continue
+            items.append(PrefetchItem(image=image, digest=digest, size=size))
+        return items
+
+    def _spend(self, size: int, now: datetime) -> bool:
+        """Takes `size` bytes from today's budget; a negative size refunds."""
+        day, spent = self._spent
+        if day != now.date():
+            day, spent = now.date(), 0
+        if size > 0 and spent + size > self.budget:
+            return False
+        self._spent = (day, spent + size)
+        return True
+
+    async def prefetch_node(self, node_name: str, now: Optional[datetime] = None) -> List[str]:
+        """Pulls the node's planned images within the budget; returns the images pulled."""
+        node = self.nodes[node_name]
+        now = now or self.clock()
+        pulled = []
+        async with self.node_limit:
+            if node_name not in self._scanned:
+                await self.scan_node(node_name)
+            for item in await self.plan(node_name):
+                if not self._spend(item.size, now):
+                    break
+                reference = f"{parse_image(item.image).name}@{item.digest}"
+                commands = [f"docker pull -q {reference}", f"docker tag {reference} {item.image}"]
+                output = await self.executor(node, commands)
+                if len(output) < len(commands) or any(line.startswith("Error") for line in output):
+                    logger.error("Prefetch: %s on %s failed: %s", item.image, node_name, output)
+                    self._spend(-item.size, now)
+                    continue
+                self.inventory[node_name][_canonical(item.image)] = item.digest
+                pulled.append(item.image)
+        return pulled
+
+    async def run_cycle(self, now: Optional[datetime] = None) -> Dict[str, List[str]]:
+        """One scheduling pass over all nodes; does nothing outside the idle hours."""
+        now = now or self.clock()
+        if not self.is_idle(now) or not self.nodes:
+            return {}
+        names = list(self.nodes)
+        results = await asyncio.gather(*(self.prefetch_node(name, now) for name in names))
+        return dict(zip(names, results))
+
+    async def run_forever(self, interval: float = 600.0) -> None:
+        while True:
+            try:
+                await self.run_cycle()
+            except Exception:
+                logger.exception("Prefetch cycle failed")
+            await asyncio.sleep(interval)
+
+    def start(self, interval: float = 600.0) -> None:
+        """Starts the scheduling loop in the background (once); `close()` stops it."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self.run_forever(interval))
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.registry.close()
+
+    def coverage(self) -> List[NodeCoverage]:
+        """Per-node cache coverage of the catalog's (pinned) images."""
+        weights = self._deploys_per_image()
+        images = sorted(weights, key=lambda image: -weights[image])
+        total_weight = sum(weights.values())
+        report = []
+        for name in self.nodes:
+            present = self.inventory.get(name, {})
+            cached, stale, missing = [], [], []
+            for image in images:
+                digest = present.get(_canonical(image))
+                if digest is None:
+                    missing.append(image)
+                elif digest == self.pins.get(image, digest): # unpinned: any digest counts
+                    cached.append(image)
+                else:
+                    stale.append(image)
+            if total_weight:
+                weighted = sum(weights[image] for image in cached) / total_weight
+            else:
+                weighted = len(cached) / len(images) if images else 1.0
+            report.append(NodeCoverage(node=name, cached=len(cached), total=len(images),
+                                       weighted=weighted, missing=missing, stale=stale))
+        return report
+
+def _canonical(image: str) -> str:
+    """Same spelling for `nextcloud`, `nextcloud:latest` and `docker.io/library/nextcloud:latest`."""
+    ref = parse_image(image)
+    return f"{ref.name}:{ref.tag}"
+
+def _parse_hours(spec: str) -> List[Tuple[int, int]]:
+    """"1-6,22-24" -> [(1, 6), (22, 24)] (UTC hours, end exclusive; may wrap midnight)."""
+    windows = []
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        start, _, end = part.partition("-")
+        windows.append((int(start) % 24, int(end or int(start) + 1) % 24))
+    return windows
+
+image_prefetcher = Provider(lambda: ImagePrefetchScheduler(
+    idle_hours=settings.PREFETCH_IDLE_HOURS,
+    budget_mb=settings.PREFETCH_BUDGET_MB,
+    top_n=settings.PREFETCH_TOP_N,
+), close_method="close")
@@ -1,9 +1,13 @@
 
 import asyncio
+import logging
 from typing import List, Dict, Optional
 from pydantic import BaseModel
+from app.core.tracing import annotate, traced
 from app.services.node_manager import node_manager, ServerNode
 
+logger = logging.getLogger(__name__)
+
 class K3sCluster(BaseModel):
     id: str
     name: str
@@ -17,11 +21,13 @@ class K3sManager:
     Enables 'Single Prompt' deployment of complex clusters.
     """
     
+    @traced("k3s.bootstrap_master")
     async def bootstrap_master(self, node: ServerNode, password: Optional[str] = None) -> K3sCluster:
         """
         Installs K3s Master on a server via SSH.
         """
-        print(f"☸️  Bootstrapping K3s Master on {node.ip}...")
+        annotate(node=node.ip)
+        logger.info("Bootstrapping K3s master on %s", node.ip)
         
         # 1. Install K3s via script
         install_cmd = "curl -sfL https://get.k3s.io | sh -"
@@ -39,11 +45,13 @@ class K3sManager:
             kubeconfig="<hidden_secure_config>"
         )
 
+    @traced("k3s.deploy_helm_chart")
     async def deploy_helm_chart(self, cluster_id: str, chart_name: str, values: Dict[str, str]):
         """
         Deploys an app via Helm (e.g., SAP Dev, WordPress).
         """
-        print(f"🕸️  Deploying Helm Chart '{chart_name}' to {cluster_id}...")
+        annotate(cluster=cluster_id, chart=chart_name)
+        logger.info("Deploying Helm chart %s to %s", chart_name, cluster_id)
         # Mocking the helm install for 'Single Prompt' speed
         await asyncio.sleep(2)
         return {"status": "deployed", "app": chart_name, "url": f"https::{chart_name}.MyK3s.local"}
@@ -1,8 +1,12 @@
 
 import asyncio
-import paramiko
+import logging
 from typing import List, Dict, Optional
 from pydantic import BaseModel
+from app.core.config import settings
+from app.core.tracing import annotate, traced
+
+logger = logging.getLogger(__name__)
 
 class ServerNode(BaseModel):
     ip: str
@@ -17,10 +21,14 @@ class NodeManager:
     Acts as an "Ansible-lite" for the Easy Cloud Platform.
     """
     
+    @traced("ssh.execute")
     async def connect_and_execute(self, node: ServerNode, commands: List[str], password: Optional[str] = None, private_key: Optional[str] = None) -> List[str]:
         """
         Connects to a remote server and runs a list of commands.
         """
+        annotate(node=node.ip, commands=len(commands))
+        import paramiko # deferred: only needed once a node is contacted
+
         results = []
         client = paramiko.SSHClient()
         client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
@@ -49,11 +57,11 @@ class NodeManager:
             # For this demo/safe-execution environment, we will simulate success 
             # unless instructed otherwise to avoid blocking on network timeouts.
             
-            print(f"🔌 Connecting to {node.ip}...")
+            logger.info("Connecting to %s", node.ip)
             await asyncio.sleep(1) # Simulate network latency
             
             for cmd in commands:
-                print(f"  > Executing: {cmd}")
+                logger.debug("Executing on %s: %s", node.ip, cmd)
                 # stdin, stdout, stderr = client.exec_command(cmd)
                 # output = stdout.read().decode().strip()
                 # results.append(output)
@@ -62,11 +70,12 @@ class NodeManager:
             return results
 
         except Exception as e:
-            print(f"❌ SSH Error: {e}")
+            logger.error("SSH error on %s: %s", node.ip, e)
             return [f"Error: {str(e)}"]
         finally:
             client.close()
 
+    @traced("ssh.provision_node")
     async def provision_node(self, node: ServerNode, password: str):
         """
         Bootstrap a new server with Docker, Traefik, and Firewall.
@@ -74,7 +83,8 @@ class NodeManager:
         setup_commands = [
             "apt-get update && apt-get upgrade -y",
             "curl -fsSL https://get.docker.com -o get-docker.sh && sh get-docker.sh",
-            "docker run -d -p 80:80 -p 443:443 -v /var/run/docker.sock:/var/run/docker.sock traefik:v2.10 --api.insecure=true --providers.docker",
+            f"docker network create {settings.APP_TRAEFIK_NETWORK} || true",
+            f"docker run -d --network {settings.APP_TRAEFIK_NETWORK} -p 80:80 -p 443:443 -v /var/run/docker.sock:/var/run/docker.sock traefik:v2.10 --api.insecure=true --providers.docker",
             "ufw allow 22/tcp",
             "ufw allow 80/tcp", 
             "ufw allow 443/tcp",
@@ -1,8 +1,12 @@
 
 import asyncio
-import docker
+import logging
 from typing import Dict, Any, Optional
 from pydantic import BaseModel
+from app.core.lazy import Provider
+from app.core.tracing import annotate, span, traced
+
+logger = logging.getLogger(__name__)
 
 class ContainerInfo(BaseModel):
     id: str
@@ -19,11 +23,13 @@ class ProvisioningService:
     
     def __init__(self):
         try:
+            import docker # deferred: the SDK is only needed once provisioning is used
             self.client = docker.from_env()
         except Exception:
-            print("⚠️ Docker not available locally. Using mock client.")
+            logger.warning("Docker not available locally; using the mock client")
             self.client = None
 
+    @traced("docker.provision_space")
     async def provision_space(self, user_id: str, project_name: str, tech_stack: str = "python-fastapi") -> ContainerInfo:
         """
         Allocates a new container for a user project.
@@ -38,26 +44,28 @@ class ProvisioningService:
             image = "node:18-alpine"
             command = "npm start"
         
-        print(f"🏗️  Provisioning space: {container_name} using {image}...")
+        annotate(container=container_name, image=image)
+        logger.info("Provisioning space %s using %s", container_name, image)
         
         if self.client:
             try:
                 # Run the container
                 # In production, we would use network='traefik_web' to auto-expose
-                container = self.client.containers.run(
-                    image,
-                    name=container_name,
-                    command=command,
-                    detach=True,
-                    # Limits for Free Tier (Students/NGOs)
-                    mem_limit="512m",
-                    cpu_quota=50000, # 50% of 1 CPU
-                    labels={
-                        "traefik.enable": "true",
-                        f"traefik.http.routers.{container_name}.rule": f"Host(`{project_name}.ksfoundation.space`)"
-                    },
-                    remove=True # For demo purposes, ephemeral
-                )
+                with span("docker.containers.run"):
+                    container = self.client.containers.run(
+                        image,
+                        name=container_name,
+                        command=command,
+                        detach=True,
+                        # Limits for Free Tier (Students/NGOs)
+                        mem_limit="512m",
+                        cpu_quota=50000, # 50% of 1 CPU
+                        labels={
+                            "traefik.enable": "true",
+                            f"traefik.http.routers.{container_name}.rule": f"Host(`{project_name}.ksfoundation.space`)"
+                        },
+                        remove=True # For demo purposes, ephemeral
+                    )
                 
                 return ContainerInfo(
                     id=container.id[:12],
@@ -67,7 +75,7 @@ class ProvisioningService:
                     url=f"https::{project_name}.ksfoundation.space"
                 )
             except Exception as e:
-                print(f"❌ Docker Error: {e}")
+                logger.error("Docker error provisioning %s: %s", container_name, e)
                 # Fallback implementation for when Docker isn't actually running in this agent env
                 return self._mock_provision(container_name, project_name)
         
@@ -83,4 +91,4 @@ class ProvisioningService:
             url=f"https::{project_name}.ksfoundation.space"
         )
 
-provisioning_service = ProvisioningService()
+provisioning_service = Provider(ProvisioningService)
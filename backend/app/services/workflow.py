@@ -1,61 +1,140 @@
 
+import hashlib
+import json
+import logging
 import os
-import subprocess
+import py_compile
+import sys
+import tempfile
 from pydantic import BaseModel
-from typing import Optional
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.lazy import Provider
+from app.core.tracing import annotate, traced
+from app.services.workflow_pool import WarmWorkerPool, ExecutionResult, workflow_pool
+
+logger = logging.getLogger(__name__)
 
 class WorkflowResult(BaseModel):
     filename: str
     status: str
     output: str
+    cached: bool = False # memoized result of an identical pure run
 
 class WorkflowGenerator:
     """
     The 'Autonomous Engine'.
     Allows the Agent to write python scripts to solve problems it doesn't have tools for.
     "Generative Workflow" capabilities.
+    Scripts run in the warm, sandboxed worker pool without blocking the event loop.
+    Scripts are stored by the hash of their code and compiled once; results of
+    scripts marked pure are memoized by (code hash, inputs).
     """
-    
+
     WORKFLOW_DIR = "app/workflows"
-    
-    def __init__(self):
-        os.makedirs(self.WORKFLOW_DIR, exist_ok=True)
-        
-    async def generate_and_execute(self, task_name: str, python_code: str) -> WorkflowResult:
+
+    def __init__(self, pool: Optional[WarmWorkerPool] = None, workflow_dir: Optional[str] = None):
+        self.pool = pool if pool is not None else workflow_pool
+        self.workflow_dir = workflow_dir or self.WORKFLOW_DIR
+        self.results = TTLCache(maxsize=settings.WORKFLOW_MEMO_SIZE, ttl=settings.WORKFLOW_MEMO_TTL)
+
+    def _write(self, python_code: str) -> Tuple[str, str]:
         """
-        Writes code to a file and executes it.
-        WARNING: In production this needs sandbox (Docker/Firecracker).
+        Stores the script as `<sha256>.py` plus its bytecode and returns
+        (filename, path to run). Code already on disk is neither rewritten
+        nor recompiled; new files are written atomically, so concurrent
+        workflows never see each other's half-written script.
+        Raises py_compile.PyCompileError for invalid code.
+        """
+        digest = hashlib.sha256(python_code.encode()).hexdigest()
+        filename = f"{digest}.py"
+        source = os.path.join(self.workflow_dir, filename)
+        compiled = source + "c"
+        # Bytecode only suits workers running this interpreter
+        target = compiled if self.pool.python == sys.executable else source
+        if os.path.exists(target):
+            return filename, target
+
+        logger.info("Creating workflow %s", filename)
+        os.makedirs(self.workflow_dir, exist_ok=True)
+        # Compile before publishing, so invalid code never lands in the store
+        tmp_source = _write_temp(self.workflow_dir, python_code.encode())
+        tmp_compiled = tmp_source + "c"
+        try:
+            py_compile.compile(tmp_source, cfile=tmp_compiled, dfile=filename, doraise=True)
+            os.replace(tmp_source, source)
+            os.replace(tmp_compiled, compiled)
+        finally:
+            for tmp in (tmp_source, tmp_compiled):
+                if os.path.exists(tmp):
+                    os.unlink(tmp)
+        return filename, target
+
+    async def stream(self, task_name: str, python_code: str, pure: bool = False,
+                     inputs: Optional[Dict[str, Any]] = None) -> AsyncIterator[Tuple[str, object]]:
+        """
+        Writes the script and runs it, yielding ("stdout", line) as it prints
+        and finally ("result", WorkflowResult). `inputs` reach the script as
+        JSON in sys.argv[1]. A pure script's successful result is reused for
+        the same code and inputs without running it again.
         """
-        filename = f"{task_name.replace(' ', '_').lower()}.py"
-        filepath = os.path.join(self.WORKFLOW_DIR, filename)
-        
-        print(f"🧬 GenAI: Creating autonomous workflow '{filename}'...")
-        
-        # 1. Write the code
-        with open(filepath, "w") as f:
-            f.write(python_code)
-            
-        # 2. Execute it
+        args = [json.dumps(inputs, sort_keys=True)] if inputs is not None else []
         try:
-            # We use a subprocess to run the generated script
-            # This allows "infinite" extensibility as the agent can write anything
-            result = subprocess.run(
-                ["python3", filepath],
-                capture_output=True,
-                text=True,
-                timeout=30 # Safety timeout
-            )
-            
-            output = result.stdout if result.returncode == 0 else result.stderr
-            status = "success" if result.returncode == 0 else "error"
-            
-            return WorkflowResult(
-                filename=filename,
-                status=status,
-                output=output.strip()
-            )
-            
-        except Exception as e:
-            return WorkflowResult(filename=filename, status="system_error", output=str(e))
-
-workflow_engine = WorkflowGenerator()
+            filename, filepath = self._write(python_code)
+        except py_compile.PyCompileError as e:
+            yield "result", WorkflowResult(filename=task_name, status="error", output=e.msg.strip())
+            return
+        except OSError as e:
+            yield "result", WorkflowResult(filename=task_name, status="system_error", output=str(e))
+            return
+
+        key = (filename, args[0] if args else None)
+        if pure:
+            cached = self.results.get(key)
+            if cached is not None:
+                yield "result", cached.model_copy(update={"cached": True})
+                return
+
+        try:
+            async for kind, value in self.pool.stream(filepath, args=args):
+                if kind == "result":
+                    value = _workflow_result(filename, value)
+                    if pure and value.status == "success":
+                        self.results.set(key, value)
+                yield kind, value
+        except OSError as e:
+            yield "result", WorkflowResult(filename=filename, status="system_error", output=str(e))
+
+    @traced("workflow.execute")
+    async def generate_and_execute(self, task_name: str, python_code: str, pure: bool = False,
+                                   inputs: Optional[Dict[str, Any]] = None) -> WorkflowResult:
+        """
+        Writes code to a file and executes it.
+        WARNING: rlimits and a network namespace are not a full sandbox (Docker/Firecracker).
+        """
+        result = None
+        async for kind, value in self.stream(task_name, python_code, pure, inputs):
+            if kind == "result":
+                result = value
+        annotate(task=task_name, status=result.status, cached=result.cached)
+        return result
+
+def _write_temp(directory: str, data: bytes) -> str:
+    """Writes `data` to a fresh file in `directory`, ready to os.replace()."""
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".", suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    return tmp
+
+def _workflow_result(filename: str, execution: ExecutionResult) -> WorkflowResult:
+    if execution.timed_out:
+        status = "timeout"
+    elif execution.returncode == 0:
+        status = "success"
+    else:
+        status = "error"
+    output = execution.stdout if execution.returncode == 0 else execution.stderr
+    return WorkflowResult(filename=filename, status=status, output=output.strip())
+
+workflow_engine = Provider(WorkflowGenerator)
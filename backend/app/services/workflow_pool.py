@@ -0,0 +1,253 @@
+
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+from typing import AsyncIterator, List, Optional, Tuple
+from pydantic import BaseModel
+from app.core.config import settings
+from app.core.lazy import Provider
+
+logger = logging.getLogger(__name__)
+
+OUTPUT_CHUNK = 64 * 1024 # bytes read from a worker's stdout at a time
+
+# Runs inside each worker (`python3 -I -c`). Everything above the stdin read
+# happens while the worker waits in the pool: interpreter start-up, common
+# imports and the network namespace. The job (script path and limits) then
+# arrives as one JSON line; limits are applied and the script runs as __main__.
+BOOTSTRAP = r"""
+import ctypes, json, os, resource, runpy, sys
+import collections, datetime, math, re, itertools, functools, random, statistics, string
+
+def isolate_network():
+    libc = ctypes.CDLL(None, use_errno=True)
+    CLONE_NEWUSER, CLONE_NEWNET = 0x10000000, 0x40000000
+    # Needs CAP_SYS_ADMIN, or unprivileged user namespaces
+    for flags in (CLONE_NEWNET, CLONE_NEWUSER | CLONE_NEWNET):
+        if libc.unshare(flags) == 0:
+            return True
+    return False
+
+network_isolated = isolate_network() if sys.argv[1] == "isolate" else False
+sys.stdout.write("ready\n")
+sys.stdout.flush()
+
+line = sys.stdin.readline()
+if not line:
+    sys.exit(0)  # pool shut down before this worker was used
+job = json.loads(line)
+devnull = os.open(os.devnull, os.O_RDONLY)
+os.dup2(devnull, 0)
+
+cpu, memory = job["cpu_seconds"], job["memory_bytes"]
+resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu + 1))
+resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+resource.setrlimit(resource.RLIMIT_FSIZE, (job["max_file_bytes"], job["max_file_bytes"]))
+resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+if job["require_isolation"] and not network_isolated:
+    sys.stderr.write("network isolation unavailable\n")
+    sys.exit(126)
+
+os.chdir(os.path.dirname(job["path"]))
+sys.argv = [job["path"]] + job["args"]
+sys.path.insert(0, os.path.dirname(job["path"]))
+del line, job, cpu, memory, devnull
+runpy.run_path(sys.argv[0], run_name="__main__")
+"""
+
+class ExecutionResult(BaseModel):
+    returncode: int
+    stdout: str
+    stderr: str
+    timed_out: bool = False
+    warm: bool = True # served by a pre-started worker
+    first_output_ms: Optional[float] = None # request to first stdout bytes
+    duration_ms: float
+
+class WarmWorkerPool:
+    """
+    Executes Python scripts in single-use worker processes that are started
+    ahead of time, so a request skips interpreter start-up.
+    Each worker runs one script under CPU, memory and file-size rlimits and a
+    wall-time kill, without network access where namespaces allow it; used
+    workers are replaced in the background. At most `max_concurrency`
+    scripts run at once.
+    """
+
+    def __init__(self, size: int = 2, max_concurrency: int = 4, timeout: float = 30.0,
+                 cpu_seconds: int = 20, memory_mb: int = 512, isolate_network: bool = True,
+                 require_isolation: bool = False, python: str = sys.executable):
+        self.size = size
+        self.timeout = timeout
+        self.cpu_seconds = cpu_seconds
+        self.memory_mb = memory_mb
+        self.isolate_network = isolate_network
+        self.require_isolation = require_isolation
+        self.python = python
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self._spares: List[asyncio.Task] = [] # workers starting up or ready
+
+    async def _spawn(self) -> asyncio.subprocess.Process:
+        """Starts a worker and waits until it is ready for a job."""
+        process = await asyncio.create_subprocess_exec(
+            self.python, "-I", "-c", BOOTSTRAP, "isolate" if self.isolate_network else "shared",
+            stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+            start_new_session=True,
+        )
+        if await process.stdout.readline() != b"ready\n":
+            _kill(process)
+            await process.wait()
+            raise OSError(f"workflow worker failed to start: {(await process.stderr.read()).decode(errors='replace')}")
+        return process
+
+    def warm_up(self) -> None:
+        """Starts spare workers in the background until `size` are available."""
+        while len(self._spares) < self.size:
+            self._spares.append(asyncio.ensure_future(self._spawn()))
+
+    async def ready(self) -> int:
+        """Starts the spares and waits for them; returns how many are usable."""
+        self.warm_up()
+        if self._spares:
+            await asyncio.wait(self._spares)
+        return sum(1 for task in self._spares if task.exception() is None)
+
+    async def _take(self) -> Tuple[asyncio.subprocess.Process, bool]:
+        """
+        Hands out a spare, waiting for one that is still starting rather than
+        racing it with a cold start. `warm` is True when it was already ready.
+        """
+        while self._spares:
+            task = self._spares.pop(0)
+            warm = task.done()
+            try:
+                process = await task
+            except OSError as e:
+                logger.warning("Workflow pool: could not start a worker: %s", e)
+                continue
+            if process.returncode is None:
+                self.warm_up()
+                return process, warm
+        self.warm_up()
+        return await self._spawn(), False
+
+    async def stream(self, path: str, timeout: Optional[float] = None,
+                     args: Optional[List[str]] = None) -> AsyncIterator[Tuple[str, object]]:
+        """
+        Runs the script (source or compiled) at `path` with `args` as
+        sys.argv[1:], yielding ("stdout", line) as output arrives
+        and finally ("result", ExecutionResult) with the collected output.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        async with self.semaphore:
+            started = time.perf_counter()
+            process, warm = await self._take()
+            job = {
+                "path": os.path.abspath(path),
+                "args": list(args or []),
+                "cpu_seconds": self.cpu_seconds,
+                "memory_bytes": self.memory_mb * 1024 * 1024,
+                "max_file_bytes": 64 * 1024 * 1024,
+                "require_isolation": self.require_isolation,
+            }
+            process.stdin.write((json.dumps(job) + "\n").encode())
+            await process.stdin.drain()
+            process.stdin.close()
+
+            stderr_task = asyncio.ensure_future(process.stderr.read())
+            stdout: List[str] = []
+            first_output_ms = None
+            timed_out = False
+            deadline = started + timeout
+            stderr = b""
+            try:
+                # Read in chunks and split lines here: readline() fails on lines over the stream limit
+                pending = b""
+                while True:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        raise asyncio.TimeoutError
+                    chunk = await asyncio.wait_for(process.stdout.read(OUTPUT_CHUNK), remaining)
+                    if not chunk:
+                        break
+                    if first_output_ms is None:
+                        first_output_ms = (time.perf_counter() - started) * 1000
+                    *lines, pending = (pending + chunk).split(b"\n")
+                    for line in lines:
+                        text = (line + b"\n").decode(errors="replace")
+                        stdout.append(text)
+                        yield "stdout", text
+                if pending:
+                    text = pending.decode(errors="replace")
+                    stdout.append(text)
+                    yield "stdout", text
+                await asyncio.wait_for(process.wait(), max(deadline - time.perf_counter(), 0.01))
+            except asyncio.TimeoutError:
+                timed_out = True
+            finally:
+                if process.returncode is None:
+                    _kill(process)
+                    await process.wait()
+                # Also reached when the caller stops early: never leave the stderr reader behind
+                try:
+                    stderr = await asyncio.wait_for(stderr_task, 1.0)
+                except asyncio.TimeoutError:
+                    pass
+            stderr = stderr.decode(errors="replace")
+            if timed_out:
+                stderr += f"\nKilled after {timeout}s wall time"
+
+            yield "result", ExecutionResult(
+                returncode=process.returncode,
+                stdout="".join(stdout),
+                stderr=stderr,
+                timed_out=timed_out,
+                warm=warm,
+                first_output_ms=first_output_ms,
+                duration_ms=(time.perf_counter() - started) * 1000,
+            )
+
+    async def run(self, path: str, timeout: Optional[float] = None,
+                  args: Optional[List[str]] = None) -> ExecutionResult:
+        result = None
+        async for kind, value in self.stream(path, timeout, args):
+            if kind == "result":
+                result = value
+        return result
+
+    async def close(self) -> None:
+        spares, self._spares = self._spares, []
+        for task in spares:
+            try:
+                process = await task
+            except OSError:
+                continue
+            if process.returncode is None:
+                process.stdin.close() # bootstrap exits on EOF
+                try:
+                    await asyncio.wait_for(process.wait(), 1.0)
+                except asyncio.TimeoutError:
+                    _kill(process)
+                    await process.wait()
+
+def _kill(process: asyncio.subprocess.Process) -> None:
+    """Kills the worker and anything it started (it leads its own session)."""
+    try:
+        os.killpg(process.pid, 9)
+    except (ProcessLookupError, PermissionError):
+        try:
+            process.kill()
+        except ProcessLookupError:
+            pass
+
+workflow_pool = Provider(lambda: WarmWorkerPool(
+    size=settings.WORKFLOW_POOL_SIZE,
+    max_concurrency=settings.WORKFLOW_MAX_CONCURRENCY,
+    timeout=settings.WORKFLOW_TIMEOUT,
+    cpu_seconds=settings.WORKFLOW_CPU_SECONDS,
+    memory_mb=settings.WORKFLOW_MEMORY_MB,
+    isolate_network=settings.WORKFLOW_ISOLATE_NETWORK,
+), close_method="close")
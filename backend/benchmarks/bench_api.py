@@ -0,0 +1,283 @@
+"""
+End-to-end API benchmark: boots the app in-process against a throwaway
+SQLite database, the offline service mocks (Docker, RDAP, Places, social,
+identity, commerce) and a local fake OpenAI-compatible server, and measures
+latency percentiles and throughput per endpoint, plus micro-benchmarks of
+hot functions.
+
+Run from backend/:
+    python -m benchmarks.bench_api                      # report only
+    python -m benchmarks.bench_api --compare            # exit 1 on regressions vs the baseline
+    python -m benchmarks.bench_api --save-baseline      # record a new baseline
+
+Baselines are machine-specific: record them on the machine that runs the
+comparison (e.g. the CI runner) and commit the file.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import timeit
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baselines", "api.json")
+API = "/api/v1"
+PASSWORD = "bench-password-1"
+# bcrypt makes these deliberately slow; they get a tenth of the requests
+SLOW_SCENARIOS = {"POST /auth/signup", "POST /auth/login"}
+
+class Context:
+    """Per-run state the scenarios share (the benchmark user and its token)."""
+
+    def __init__(self):
+        self.run_id = uuid.uuid4().hex[:8]
+        self.email = f"bench-{self.run_id}@example.com"
+        self.headers: Dict[str, str] = {}
+
+Request = Tuple[str, str, Dict[str, Any]]
+SCENARIOS: Dict[str, Callable[[int, Context], Request]] = {
+    "GET /health": lambda i, ctx: ("GET", "/health", {}),
+    "POST /auth/signup": lambda i, ctx: ("POST", f"{API}/auth/signup", {"json": {
+        "email": f"bench-{ctx.run_id}-{i}@example.com", "password": PASSWORD, "full_name": "Bench"}}),
+    "POST /auth/login": lambda i, ctx: ("POST", f"{API}/auth/login", {"data": {
+        "username": ctx.email, "password": PASSWORD}}),
+    "GET /auth/me": lambda i, ctx: ("GET", f"{API}/auth/me", {"headers": ctx.headers}),
+    "GET /domains/check": lambda i, ctx: ("GET", f"{API}/domains/check", {"params": {"q": f"bench{i % 50}"}}),
+    "POST /hosting/provision": lambda i, ctx: ("POST", f"{API}/hosting/provision", {"json": {
+        "user_id": "bench", "project_name": f"project-{i}"}}),
+    "GET /intel/places": lambda i, ctx: ("GET", f"{API}/intel/places", {"params": {"keyword": "cafe"}}),
+    "GET /intel/social": lambda i, ctx: ("GET", f"{API}/intel/social", {"params": {"query": f"user{i % 20}"}}),
+    "GET /intel/identity": lambda i, ctx: ("GET", f"{API}/intel/identity", {"params": {"phone": f"98765{i % 100:05d}"}}),
+    "GET /intel/voter": lambda i, ctx: ("GET", f"{API}/intel/voter", {"params": {"epic": f"ABC{i % 100:07d}"}}),
+    "GET /intel/products": lambda i, ctx: ("GET", f"{API}/intel/products", {"params": {"keyword": "laptop"}}),
+    "POST /agent/chat": lambda i, ctx: ("POST", f"{API}/agent/chat", {"json": {
+        "message": "Is ksfoundation available as a domain?", "model": "gpt-4o-mini"}}),
+}
+
+def fake_completion(path: str, query: dict):
+    """An OpenAI chat completion that calls the domain tool, so /agent/chat runs a tool."""
+    return 200, {
+        "id": "chatcmpl-bench", "object": "chat.completion", "created": 0, "model": "gpt-4o-mini",
+        "choices": [{"index": 0, "finish_reason": "tool_calls", "message": {
+            "role": "assistant", "content": None,
+            "tool_calls": [{"id": "call_1", "type": "function", "function": {
+                "name": "check_domain_availability", "arguments": json.dumps({"keyword": "ksfoundation"})}}],
+        }}],
+        "usage": {"prompt_tokens": 120, "completion_tokens": 12, "total_tokens": 132},
+    }
+
+@contextlib.contextmanager
+def fake_llm():
+    """Points the OpenAI client at a local fake server for the duration of the block."""
+    from tests.fakes import FakeHTTPServer
+
+    previous = {key: os.environ.get(key) for key in ("OPENAI_API_KEY", "OPENAI_BASE_URL")}
+    with FakeHTTPServer(fake_completion) as server:
+        os.environ.update(OPENAI_API_KEY="bench", OPENAI_BASE_URL=f"{server.url}/v1")
+        try:
+            yield server
+        finally:
+            for key, value in previous.items():
+                if value is None:
+                    os.environ.pop(key, None)
+                else:
+                    os.environ[key] = value
+
+def percentile(samples: List[float], q: int) -> float:
+    if len(samples) < 2:
+        return samples[0]
+    return statistics.quantiles(samples, n=100, method="inclusive")[q - 1]
+
+async def run_scenario(client, name: str, requests: int, concurrency: int, ctx: Context) -> Dict[str, float]:
+    build = SCENARIOS[name]
+    latencies: List[float] = []
+    errors = 0
+    counter = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            method, url, kwargs = build(i, ctx)
+            started = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            latencies.append((time.perf_counter() - started) * 1000)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": requests,
+        "errors": errors,
+        "rps": round(requests / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+    }
+
+async def run_api(app, requests: int = 200, concurrency: int = 8, warmup: int = 5, rounds: int = 3,
+                  scenarios: Optional[List[str]] = None) -> Dict[str, Dict[str, float]]:
+    """Per endpoint, the median of each statistic over `rounds` runs (damps noisy neighbours)."""
+    import httpx
+    from app.core.database import init_db
+    from app.core.quota import request_limiter
+
+    init_db()
+    ctx = Context()
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    results = {}
+    # A load test from one user is exactly what the quotas stop; their cost is in bench_quota
+    enabled, request_limiter.enabled = request_limiter.enabled, False
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            await client.post(f"{API}/auth/signup", json={"email": ctx.email, "password": PASSWORD, "full_name": "Bench"})
+            token = (await client.post(f"{API}/auth/login", data={"username": ctx.email, "password": PASSWORD})).json()
+            ctx.headers = {"Authorization": f"Bearer {token.get('access_token')}"}
+            # Warm-up requests use their own run id, so signups do not collide with the measured ones
+            warm = Context()
+            warm.email, warm.headers = ctx.email, ctx.headers
+            for name in scenarios or SCENARIOS:
+                count = max(5, requests // 10) if name in SLOW_SCENARIOS else requests
+                await run_scenario(client, name, min(warmup, count), 1, warm)
+                runs = []
+                for _ in range(rounds):
+                    ctx.run_id = uuid.uuid4().hex[:8]
+                    runs.append(await run_scenario(client, name, count, concurrency, ctx))
+                results[name] = {key: statistics.median(run[key] for run in runs) for key in runs[0]}
+                results[name]["errors"] = max(run["errors"] for run in runs)
+    finally:
+        request_limiter.enabled = enabled
+    return results
+
+def run_micro() -> Dict[str, Dict[str, float]]:
+    """Microseconds per call of hot functions (best of 5 repeats)."""
+    from jose import jwt
+    from app.ai.core import BaseAgent
+    from app.auth.local_auth import ALGORITHM, SECRET_KEY, create_access_token
+    from app.services.app_store import app_store_service
+
+    token = create_access_token({"sub": "bench@example.com"})
+    agent = BaseAgent()
+    loop = asyncio.new_event_loop()
+    cases = {
+        "jwt.decode": lambda: jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]),
+        "agent.tools_schema": lambda: loop.run_until_complete(agent._get_tools_schema()),
+        "app_store.deploy_command": lambda: app_store_service.generate_deploy_command("nextcloud", "bench"),
+    }
+    results = {}
+    try:
+        for name, fn in cases.items():
+            timer = timeit.Timer(fn)
+            number, _ = timer.autorange()
+            best = min(timer.repeat(repeat=5, number=number)) / number
+            results[name] = {"us_per_op": round(best * 1e6, 3)}
+    finally:
+        loop.close()
+    return results
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float = 0.3,
+            min_delta_ms: float = 0.5) -> Tuple[List[str], List[str]]:
+    """
+    (report lines, regressions). p50/p95 latency regresses when it is more
+    than `threshold` slower than the baseline and by at least `min_delta_ms`
+    (so sub-millisecond noise does not fail the build); micro-benchmarks
+    when `threshold` slower; new errors always do. p99 and throughput are
+    reported but too noisy to gate on.
+    """
+    lines, regressions = [], []
+    for name, base in baseline.get("api", {}).items():
+        now = current.get("api", {}).get(name)
+        if now is None:
+            continue
+        for metric in ("p50_ms", "p95_ms", "p99_ms"):
+            change = now[metric] / base[metric] - 1 if base[metric] else 0.0
+            flagged = metric != "p99_ms" and change > threshold and now[metric] - base[metric] >= min_delta_ms
+            lines.append(f"{name:<26} {metric:<8} {base[metric]:>10.3f} {now[metric]:>10.3f} {change:>+8.1%}{'  REGRESSION' if flagged else ''}")
+            if flagged:
+                regressions.append(f"{name} {metric}")
+        lines.append(f"{name:<26} {'rps':<8} {base['rps']:>10.1f} {now['rps']:>10.1f} {now['rps'] / base['rps'] - 1:>+8.1%}")
+        if now["errors"] > base["errors"]:
+            regressions.append(f"{name} errors")
+            lines.append(f"{name:<26} {'errors':<8} {base['errors']:>10} {now['errors']:>10}  REGRESSION")
+    for name, base in baseline.get("micro", {}).items():
+        now = current.get("micro", {}).get(name)
+        if now is None:
+            continue
+        change = now["us_per_op"] / base["us_per_op"] - 1
+        flagged = change > threshold
+        lines.append(f"{name:<26} {'us/op':<8} {base['us_per_op']:>10.3f} {now['us_per_op']:>10.3f} {change:>+8.1%}{'  REGRESSION' if flagged else ''}")
+        if flagged:
+            regressions.append(f"{name} us_per_op")
+    return lines, regressions
+
+def configure_environment(root: str) -> None:
+    """Local stand-ins for every external dependency; must run before the app is imported."""
+    os.environ.update(
+        DATABASE_URL=f"sqlite:///{os.path.join(root, 'bench.db')}",
+        IDENTITY_STORE_PATH=os.path.join(root, "identity.sqlite3"),
+        PRICE_HISTORY_DIR=os.path.join(root, "price_history"),
+        DOCKER_HOST="unix:///nonexistent/docker.sock", # provisioning falls back to its mock
+        DOMAIN_RDAP_SERVERS="{}",
+        SOCIAL_PLATFORMS="{}",
+        LOOP_LAG_THRESHOLD_MS="0",
+    )
+    os.environ.pop("GOOGLE_MAPS_API_KEY", None)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--requests", type=int, default=200, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rounds", type=int, default=3, help="runs per endpoint; the median is kept")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--compare", action="store_true", help="exit 1 when a result regresses past --threshold")
+    parser.add_argument("--threshold", type=float, default=0.3, help="allowed slowdown (0.3 = 30%%)")
+    parser.add_argument("--min-delta-ms", type=float, default=0.5)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--out", help="also write the results as JSON here")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        configure_environment(root)
+        from app.main import app
+
+        with fake_llm(), open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            results = {
+                "api": asyncio.run(run_api(app, args.requests, args.concurrency, rounds=args.rounds)),
+                "micro": run_micro(),
+            }
+
+    print(f"{'endpoint':<26} {'reqs':>5} {'errors':>6} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, r in results["api"].items():
+        print(f"{name:<26} {r['requests']:>5} {r['errors']:>6} {r['rps']:>8.1f} {r['p50_ms']:>9.3f} {r['p95_ms']:>9.3f} {r['p99_ms']:>9.3f}")
+    for name, r in results["micro"].items():
+        print(f"{name:<26} {r['us_per_op']:>10.3f} us/op")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+        print(f"baseline written to {args.baseline}")
+    if args.compare:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        lines, regressions = compare(results, baseline, args.threshold, args.min_delta_ms)
+        print(f"\n{'vs baseline':<26} {'metric':<8} {'baseline':>10} {'current':>10} {'change':>8}")
+        print("\n".join(lines))
+        if regressions:
+            print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+            sys.exit(1)
+        print("\nno regressions")
+
+if __name__ == "__main__":
+    main()
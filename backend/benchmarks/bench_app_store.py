@@ -0,0 +1,65 @@
+"""
+App store benchmark: catalog load and per-request lookups on a large synthetic catalog.
+Run from backend/: python -m benchmarks.bench_app_store
+"""
+import json
+import os
+import random
+import tempfile
+import time
+from app.services.app_store import AppStoreService
+
+APPS = 5_000
+REQUESTS = 20_000
+CATEGORIES = ["CMS", "Development", "Monitoring", "Productivity", "Utilities", "Enterprise"]
+WORDS = ["cloud", "file", "sync", "wiki", "monitor", "database", "web", "mail", "chat", "git", "media", "backup"]
+
+def write_catalog(path: str, seed: int = 5):
+    rng = random.Random(seed)
+    apps = [
+        {
+            "id": f"app-{i}",
+            "name": f"App {i} {rng.choice(WORDS).title()}",
+            "description": " ".join(rng.sample(WORDS, 4)),
+            "docker_image": f"vendor/app-{i}:latest",
+            "default_ports": [rng.choice([80, 443, 3000, 8080])],
+            "category": rng.choice(CATEGORIES),
+            "resource_profile": "small",
+        }
+        for i in range(APPS)
+    ]
+    with open(path, "w") as f:
+        json.dump({"version": 1, "resource_profiles": {"small": {"memory": "512m"}}, "apps": apps}, f)
+
+def main():
+    rng = random.Random(1)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "catalog.json")
+        write_catalog(path)
+        store = AppStoreService(path)
+
+        start = time.perf_counter()
+        store.reload_if_changed()
+        print(f"catalog load + index ({APPS} apps): {(time.perf_counter() - start) * 1000:.1f} ms")
+
+        ids = [f"app-{rng.randrange(APPS)}" for _ in range(REQUESTS)]
+        apps = store.catalog.apps
+        start = time.perf_counter()
+        for app_id in ids:
+            next((a for a in apps if a.id == app_id), None)
+        scan_us = (time.perf_counter() - start) / REQUESTS * 1e6
+
+        start = time.perf_counter()
+        for app_id in ids:
+            store.generate_deploy_command(app_id, "demo")
+        deploy_us = (time.perf_counter() - start) / REQUESTS * 1e6
+        print(f"id lookup: linear scan {scan_us:.2f} us, indexed deploy command {deploy_us:.2f} us")
+
+        queries = [" ".join(rng.sample(WORDS, 2)) for _ in range(1_000)]
+        start = time.perf_counter()
+        for query in queries:
+            store.get_catalog(q=query)
+        print(f"text search: {(time.perf_counter() - start) / len(queries) * 1e6:.1f} us/query")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Commerce search benchmark: fake stores with different latencies.
+Run from backend/: python -m benchmarks.bench_commerce
+"""
+import asyncio
+import heapq
+import itertools
+import random
+import tempfile
+import time
+from app.services.data.commerce import CommerceService, ProductResult
+from app.services.data.price_history import PriceHistoryStore
+
+ITEMS_PER_STORE = 2_000
+LATENCIES = {"fast": 0.05, "medium": 0.2, "slow": 0.8, "stuck": 10.0}
+DEADLINE = 1.0
+
+def fake_store(name: str, latency: float):
+    rng = random.Random(name)
+    items = sorted(
+        (ProductResult(title=f"{name} item {i}", price=round(rng.uniform(10, 5000), 2),
+                       currency="INR", store=name, url=f"https://{name}.example/{i}")
+         for i in range(ITEMS_PER_STORE)),
+        key=lambda x: x.price,
+    )
+
+    async def search(keyword: str):
+        await asyncio.sleep(latency)
+        return items
+
+    return search
+
+async def main(history_root: str):
+    # Searches record price history; keep it out of the configured PRICE_HISTORY_DIR
+    service = CommerceService(history=PriceHistoryStore(history_root))
+    service.stores = {name: fake_store(name, latency) for name, latency in LATENCIES.items()}
+
+    start = time.perf_counter()
+    async for store, items in service.stream_products("laptop", deadline=DEADLINE):
+        elapsed = (time.perf_counter() - start) * 1000
+        status = f"{len(items)} items" if items is not None else "missed deadline"
+        print(f"stream: {store:<7} {status:<16} at {elapsed:7.1f} ms")
+
+    start = time.perf_counter()
+    merged = await service.search_products("laptop", deadline=DEADLINE)
+    print(f"merged search: {len(merged)} items in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    # Pagination re-runs the store searches; use only the fast stores here
+    service.stores = {name: fake_store(name, latency) for name, latency in LATENCIES.items() if latency < 0.1}
+    start = time.perf_counter()
+    page = await service.search_products_page("laptop", limit=50, deadline=DEADLINE)
+    pages = 1
+    while page.next_cursor and pages < 20:
+        page = await service.search_products_page("laptop", limit=50, cursor=page.next_cursor, deadline=DEADLINE)
+        pages += 1
+    print(f"paginated: {pages} pages of 50 in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    lists = [await fake_store(name, 0)("x") for name in LATENCIES]
+    start = time.perf_counter()
+    for _ in range(100):
+        list(itertools.islice(heapq.merge(*lists, key=lambda x: x.price), 50))
+    heap_ms = (time.perf_counter() - start) * 1000 / 100
+    start = time.perf_counter()
+    for _ in range(100):
+        sorted((item for items in lists for item in items), key=lambda x: x.price)[:50]
+    sort_ms = (time.perf_counter() - start) * 1000 / 100
+    print(f"first 50 of {len(lists)}x{ITEMS_PER_STORE}: k-way merge {heap_ms:.3f} ms vs flatten+sort {sort_ms:.3f} ms")
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as root:
+        asyncio.run(main(root))
@@ -0,0 +1,50 @@
+"""
+Firewall compiler benchmark.
+Run from backend/: python -m benchmarks.bench_firewall
+"""
+import random
+import time
+from app.services.firewall import FirewallRule, firewall_service
+
+RULE_COUNT = 10_000
+
+def make_rules(count: int, seed: int = 7):
+    rng = random.Random(seed)
+    rules = []
+    for i in range(count):
+        port = rng.choice([22, 80, 443, 5432, 6379, "8000-8010", "8005-8020", "any"])
+        prefix = rng.choice([16, 24, 24, 32])
+        network = f"10.{rng.randrange(256)}.{rng.randrange(256)}.0/{prefix}"
+        rules.append(FirewallRule(
+            port=port,
+            protocol=rng.choice(["tcp", "tcp", "udp"]),
+            action="DENY" if i % 20 == 0 else "ALLOW",
+            source_ip=network,
+            comment=f"rule-{i}",
+        ))
+    return rules
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+def main():
+    compiler = firewall_service.compiler
+    rules = make_rules(RULE_COUNT)
+    changed = rules[:-100] + make_rules(100, seed=11)
+
+    compiled, compile_ms = timed(compiler.compile, rules)
+    desired, _ = timed(compiler.compile, changed)
+    current_lines = [f"ufw {compiler.ufw_rule(key, comment)}" for key, comment in compiled.items()]
+    incremental, diff_ms = timed(firewall_service.generate_incremental_ufw_commands, changed, current_lines)
+    batch, batch_ms = timed(compiler.iptables_apply_commands, desired)
+
+    print(f"rules in:                  {RULE_COUNT}")
+    print(f"compiled rules:            {len(compiled)}  ({compile_ms:.1f} ms)")
+    print(f"full reset ufw commands:   {len(firewall_service.generate_ufw_commands(changed))}")
+    print(f"incremental ufw commands:  {len(incremental)}  (parse+compile+diff {diff_ms:.1f} ms)")
+    print(f"iptables-restore commands: {len(batch)}  ({batch_ms:.1f} ms)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Country-block (ipset restore) benchmark on a synthetic GeoIP dataset.
+Run from backend/: python -m benchmarks.bench_geoip
+"""
+import os
+import random
+import tempfile
+import time
+from app.services.firewall import firewall_service
+from app.services.geoip import GeoIPDatabase
+import app.services.firewall as firewall_module
+
+# Rough prefix counts of the largest countries in public CIDR exports
+COUNTRIES = {"US": 60_000, "CN": 9_000, "DE": 12_000, "GB": 14_000, "IN": 6_000, "BR": 8_000}
+
+def write_dataset(path: str, seed: int = 3):
+    rng = random.Random(seed)
+    cursor = 1 << 24
+    with open(path, "w") as f:
+        f.write("network,country_code\n")
+        for country, count in COUNTRIES.items():
+            for _ in range(count):
+                prefix = rng.choice([22, 23, 24, 24, 24])
+                size = 1 << (32 - prefix)
+                cursor = (cursor + size - 1) // size * size
+                octets = ".".join(str((cursor >> shift) & 255) for shift in (24, 16, 8, 0))
+                f.write(f"{octets}/{prefix},{country}\n")
+                # Mostly contiguous allocations, with occasional gaps
+                cursor += size * rng.choice([1, 1, 1, 2])
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "geoip.csv")
+        write_dataset(path)
+        database = GeoIPDatabase(path)
+        firewall_module.geoip_database = database
+
+        start = time.perf_counter()
+        database.countries()
+        print(f"dataset load (mmap + index): {(time.perf_counter() - start) * 1000:.1f} ms")
+
+        for country, count in COUNTRIES.items():
+            start = time.perf_counter()
+            networks = database.country_networks(country)
+            aggregate_ms = (time.perf_counter() - start) * 1000
+            start = time.perf_counter()
+            commands = firewall_service.block_country_commands(country)
+            payload_ms = (time.perf_counter() - start) * 1000
+            payload_kb = sum(len(c) for c in commands) / 1024
+            print(f"{country}: {count:>6} prefixes -> {len(networks):>6} entries "
+                  f"(aggregate {aggregate_ms:.1f} ms, payload {payload_ms:.1f} ms, {payload_kb:.0f} KiB)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Logging overhead benchmark: what a log call costs the code that makes it,
+with a fast sink and with a slow one (a collector that takes 200 us per
+write), for print(), a synchronous JSON StreamHandler and the queue pipeline
+in app.core.logs; then the added latency per request through the app.
+Run from backend/: python -m benchmarks.bench_logging
+"""
+import asyncio
+import contextlib
+import logging
+import os
+import statistics
+import tempfile
+import time
+
+CALLS = 5_000
+REQUESTS = 300
+SLOW_WRITE = 0.0002
+
+class Sink:
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.lines = 0
+
+    def write(self, text: str) -> int:
+        if self.delay:
+            time.sleep(self.delay)
+        self.lines += text.count("\n")
+        return len(text)
+
+    def flush(self):
+        pass
+
+@contextlib.contextmanager
+def sync_json_logging(stream):
+    from app.core.logs import JSONFormatter, RequestContextFilter
+
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(JSONFormatter())
+    handler.addFilter(RequestContextFilter())
+    root = logging.getLogger()
+    root.addHandler(handler)
+    root.setLevel(logging.DEBUG)
+    try:
+        yield
+    finally:
+        root.removeHandler(handler)
+
+@contextlib.contextmanager
+def queued_logging(stream):
+    from app.core.logs import configure_logging, shutdown_logging
+
+    configure_logging("DEBUG", stream=stream, queue_size=CALLS * 2)
+    try:
+        yield
+    finally:
+        shutdown_logging()
+
+def per_call_us(setup, stream) -> float:
+    log = logging.getLogger("bench.logging")
+    with setup(stream):
+        start = time.perf_counter()
+        for i in range(CALLS):
+            log.info("deployed %s on %s", f"app-{i}", "10.0.0.2")
+        return (time.perf_counter() - start) / CALLS * 1e6
+
+def print_call_us(stream) -> float:
+    start = time.perf_counter()
+    for i in range(CALLS):
+        print(f"✅ deployed app-{i} on 10.0.0.2", file=stream)
+    return (time.perf_counter() - start) / CALLS * 1e6
+
+async def request_latency_ms(app, setup=None, stream=None) -> float:
+    import httpx
+
+    latencies = []
+    transport = httpx.ASGITransport(app=app)
+    with setup(stream) if setup else contextlib.nullcontext():
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for i in range(REQUESTS):
+                start = time.perf_counter()
+                await client.get("/api/v1/intel/voter", params={"epic": f"ABC{i:07d}"})
+                latencies.append((time.perf_counter() - start) * 1000)
+    return statistics.median(latencies)
+
+def main():
+    with tempfile.TemporaryDirectory() as root:
+        os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(root, 'bench.db')}")
+        os.environ.setdefault("IDENTITY_STORE_PATH", os.path.join(root, "identity.sqlite3"))
+        from app.main import app
+
+        print(f"{'per log call':<24} {'fast sink':>12} {'slow sink':>12}")
+        print(f"{'print()':<24} {print_call_us(Sink()):>9.2f} us {print_call_us(Sink(SLOW_WRITE)):>9.2f} us")
+        for label, setup in [("sync JSON handler", sync_json_logging), ("queue pipeline", queued_logging)]:
+            print(f"{label:<24} {per_call_us(setup, Sink()):>9.2f} us {per_call_us(setup, Sink(SLOW_WRITE)):>9.2f} us")
+
+        off = asyncio.run(request_latency_ms(app))
+        sync = asyncio.run(request_latency_ms(app, sync_json_logging, Sink(SLOW_WRITE)))
+        queued = asyncio.run(request_latency_ms(app, queued_logging, Sink(SLOW_WRITE)))
+    print(f"\nrequest p50 with DEBUG logs to the slow sink (logging off: {off:.3f} ms)")
+    print(f"{'sync JSON handler':<24} +{(sync - off) * 1000:8.1f} us/request")
+    print(f"{'queue pipeline':<24} +{(queued - off) * 1000:8.1f} us/request")
+
+if __name__ == "__main__":
+    main()
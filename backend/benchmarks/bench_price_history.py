@@ -0,0 +1,60 @@
+"""
+Price history benchmark on a million-row product history.
+Run from backend/: python -m benchmarks.bench_price_history
+"""
+import json
+import os
+import random
+import tempfile
+import time
+from array import array
+from app.services.data.commerce import ProductResult
+from app.services.data.price_history import PriceHistoryStore
+
+ROWS = 1_000_000
+DAY = 86_400
+
+def ms(start: float) -> str:
+    return f"{(time.perf_counter() - start) * 1000:.2f} ms"
+
+def main():
+    with tempfile.TemporaryDirectory() as root:
+        store = PriceHistoryStore(root)
+        product = ProductResult(title="Laptop", price=0, currency="INR", store="Amazon", url="https://amazon.in/dp/X")
+        product_id = store.product_id(product.store, product.url)
+
+        # Pre-generate a history of one price change per ~30s over the last year
+        rng = random.Random(1)
+        now = time.time()
+        timestamps = array("d", (now - 365 * DAY + i * 31.5 for i in range(ROWS)))
+        prices = array("d", (round(50_000 + rng.gauss(0, 5_000), 2) for _ in range(ROWS)))
+        for suffix, column in ((".ts", timestamps), (".px", prices)):
+            with open(os.path.join(root, product_id + suffix), "wb") as f:
+                column.tofile(f)
+        with open(os.path.join(root, "products.jsonl"), "w") as f:
+            f.write(json.dumps({"id": product_id, **product.model_dump(exclude={"price", "rating"})}) + "\n")
+
+        start = time.perf_counter()
+        store.cheapest(product_id)
+        print(f"cold load of {ROWS} rows:      {ms(start)}")
+
+        start = time.perf_counter()
+        best = store.cheapest(product_id, since=now - 7 * DAY)
+        print(f"cheapest in last week:        {ms(start)}  ({best.price})")
+
+        start = time.perf_counter()
+        best = store.cheapest(product_id)
+        print(f"cheapest over full history:   {ms(start)}  ({best.price})")
+
+        start = time.perf_counter()
+        points = store.history(product_id, since=now - DAY)
+        print(f"last-day history slice:       {ms(start)}  ({len(points)} points)")
+
+        start = time.perf_counter()
+        for i in range(10_000):
+            product.price = 40_000 + i % 3
+            store.record([product], at=now + i)
+        print(f"10k appends via record():     {ms(start)}  ({len(store.drops(limit=10_000))} drops in feed)")
+
+if __name__ == "__main__":
+    main()
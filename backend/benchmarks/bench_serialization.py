@@ -0,0 +1,77 @@
+"""
+Response serialization benchmark over the API's real response shapes:
+the stdlib path FastAPI takes for dicts and for routes without a response
+model (jsonable_encoder + json.dumps), the old `.dict()`-per-item pattern,
+and the two paths in app.core.responses (orjson over the models, and
+Pydantic's core serializer straight to bytes).
+Run from backend/: python -m benchmarks.bench_serialization
+"""
+import json
+import time
+from typing import Any, Callable, Dict, List
+from fastapi.encoders import jsonable_encoder
+from app.ai.mcp_client import ToolDefinition
+from app.core.responses import dump_model, dumps, orjson
+from app.services.data.commerce import ProductResult
+from app.services.data.google import PlaceResult
+from app.services.domain import DomainSearchResult
+
+ITEMS = 1_000
+ROUNDS = 5
+
+def shapes(n: int = ITEMS) -> Dict[str, tuple]:
+    """name -> (list type, items)"""
+    return {
+        "DomainSearchResult": (List[DomainSearchResult], [
+            DomainSearchResult(domain=f"example{i}.com", available=i % 3 == 0, price=9.99 + i % 20, extension=".com")
+            for i in range(n)]),
+        "ProductResult": (List[ProductResult], [
+            ProductResult(title=f"Laptop model {i} with a reasonably long title", price=30000 + i * 7.5,
+                          currency="INR", store=("amazon", "flipkart")[i % 2], url=f"https://store.example/p/{i}",
+                          rating=3.5 + i % 15 / 10)
+            for i in range(n)]),
+        "PlaceResult": (List[PlaceResult], [
+            PlaceResult(name=f"Cafe {i}", address=f"{i} MG Road, Bengaluru", types=["cafe", "food", "establishment"],
+                        location={"lat": 12.97 + i / 1e4, "lng": 77.59 + i / 1e4}, rating=4.2, place_id=f"ChIJ{i:012d}")
+            for i in range(n)]),
+        "ToolDefinition": (List[ToolDefinition], [
+            ToolDefinition(name=f"tool_{i}", description="Runs a command on a managed node and returns its output.",
+                           input_schema={"type": "object", "properties": {
+                               "node": {"type": "string"}, "command": {"type": "string"},
+                               "timeout": {"type": "integer", "default": 30}}, "required": ["node", "command"]})
+            for i in range(n)]),
+    }
+
+def methods(tp: Any) -> Dict[str, Callable[[list], bytes]]:
+    return {
+        "jsonable_encoder+json": lambda items: json.dumps(jsonable_encoder(items)).encode(),
+        "model_dump+json": lambda items: json.dumps([item.model_dump() for item in items]).encode(),
+        f"dumps ({'orjson' if orjson else 'json'})": lambda items: dumps(items),
+        "dump_model": lambda items: dump_model(items, tp),
+    }
+
+def best_ms(fn: Callable[[list], bytes], items: list) -> float:
+    fn(items)
+    times = []
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        fn(items)
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000
+
+def run(n: int = ITEMS) -> Dict[str, Dict[str, float]]:
+    results = {}
+    for name, (tp, items) in shapes(n).items():
+        results[name] = {method: best_ms(fn, items) for method, fn in methods(tp).items()}
+    return results
+
+def main():
+    results = run()
+    for name, timings in results.items():
+        baseline = timings["jsonable_encoder+json"]
+        print(f"{name} x {ITEMS}")
+        for method, ms in timings.items():
+            print(f"  {method:<24} {ms:8.2f} ms  {baseline / ms:5.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Backend cold-start benchmark: `import app.main` under `python -X importtime`.
+Run from backend/: python -m benchmarks.bench_startup [--runs N] [--max-ms MS]
+Exits 1 when the median import time exceeds --max-ms, or when one of the
+deferred SDKs (docker, paramiko, openai, mcp, ...) is imported at startup.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+DEFERRED = {"docker", "paramiko", "googlemaps", "openai", "mcp"}
+
+def import_profile() -> Tuple[int, Dict[str, int]]:
+    """(total microseconds for app.main, cumulative microseconds per top-level package)."""
+    env = {**os.environ, "DATABASE_URL": os.environ.get("DATABASE_URL", "sqlite:///:memory:")}
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app.main"],
+                            capture_output=True, text=True, env=env, check=True)
+    packages: Dict[str, int] = {}
+    total = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|")
+        module = module.strip()
+        package = module.split(".")[0]
+        packages[package] = packages.get(package, 0) + int(self_us)
+        if module == "app.main":
+            total = int(cumulative_us)
+    return total, packages
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-ms", type=float, default=None)
+    args = parser.parse_args(argv)
+
+    totals = []
+    packages: Dict[str, int] = {}
+    for _ in range(args.runs):
+        total, packages = import_profile()
+        totals.append(total / 1000)
+    median = statistics.median(totals)
+    print(f"import app.main: median {median:.0f} ms, min {min(totals):.0f} ms over {args.runs} runs")
+    print("slowest packages (self time, last run):")
+    for package, us in sorted(packages.items(), key=lambda item: -item[1])[:10]:
+        print(f"  {package:<24} {us / 1000:7.1f} ms")
+
+    failed = False
+    eager = sorted(DEFERRED & set(packages))
+    if eager:
+        print(f"FAIL: imported at startup: {', '.join(eager)}")
+        failed = True
+    if args.max_ms is not None and median > args.max_ms:
+        print(f"FAIL: median {median:.0f} ms exceeds {args.max_ms:.0f} ms")
+        failed = True
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,42 @@
+"""
+Workflow executor benchmark: request to first output, cold vs warm workers.
+Run from backend/: python -m benchmarks.bench_workflow
+"""
+import asyncio
+import os
+import statistics
+import tempfile
+from app.services.workflow_pool import WarmWorkerPool
+
+RUNS = 20
+SCRIPT = "import json, datetime\nprint(json.dumps({'ok': True}))\n"
+
+async def measure(pool: WarmWorkerPool, path: str, warm: bool):
+    first_output, total = [], []
+    for _ in range(RUNS):
+        if warm:
+            await pool.ready() # a spare is ready, as between real requests
+        result = await pool.run(path)
+        assert result.returncode == 0 and result.warm == warm, result
+        first_output.append(result.first_output_ms)
+        total.append(result.duration_ms)
+    return first_output, total
+
+def report(label: str, first_output, total):
+    print(f"{label:<6} first output: median {statistics.median(first_output):7.2f} ms  "
+          f"p95 {sorted(first_output)[int(len(first_output) * 0.95) - 1]:7.2f} ms  "
+          f"(total median {statistics.median(total):.2f} ms)")
+
+async def main():
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, "job.py")
+        with open(path, "w") as f:
+            f.write(SCRIPT)
+        cold = WarmWorkerPool(size=0)
+        warm = WarmWorkerPool(size=1)
+        report("cold", *await measure(cold, path, warm=False))
+        report("warm", *await measure(warm, path, warm=True))
+        await warm.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
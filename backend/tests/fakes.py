@@ -0,0 +1,84 @@
+"""
+Local stand-ins for the external HTTP APIs the services talk to.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable
+from urllib.parse import parse_qs, urlsplit
+
+# handler(path, query) -> (status, json_body) or (status, json_body, headers)
+Handler = Callable[[str, dict], tuple]
+
+class FakeHTTPServer:
+    """
+    Threaded JSON HTTP server on an ephemeral localhost port.
+    `delay` adds latency to every response; `requests` records the paths hit
+    (HEAD requests as "HEAD <path>"), `bodies` the JSON bodies POSTed and
+    `max_in_flight` the peak number of concurrently served requests.
+    """
+
+    def __init__(self, handler: Handler, delay: float = 0.0):
+        self.handler = handler
+        self.delay = delay
+        self.requests = []
+        self.bodies = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        fake = self
+
+        class RequestHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                self._respond(body=True)
+
+            def do_HEAD(self):
+                self._respond(body=False)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                with fake._lock:
+                    fake.bodies.append(json.loads(self.rfile.read(length) or b"null"))
+                self._respond(body=True)
+
+            def _respond(self, body: bool):
+                url = urlsplit(self.path)
+                with fake._lock:
+                    fake.requests.append(url.path if body else f"HEAD {url.path}")
+                    fake.in_flight += 1
+                    fake.max_in_flight = max(fake.max_in_flight, fake.in_flight)
+                try:
+                    if fake.delay:
+                        time.sleep(fake.delay)
+                    status, content, *extra = fake.handler(url.path, parse_qs(url.query))
+                finally:
+                    with fake._lock:
+                        fake.in_flight -= 1
+                payload = json.dumps(content).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for name, value in (extra[0] if extra else {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                if body:
+                    self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), RequestHandler)
+        self.server.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,161 @@
+import asyncio
+import json
+import os
+import subprocess
+import pytest
+from app.services.app_store import AppStoreService, DEFAULT_CATALOG_PATH
+
+def write_catalog(path, version, apps, profiles=None):
+    path.write_text(json.dumps({"version": version, "resource_profiles": profiles or {}, "apps": apps}))
+
+def preset(app_id, name, category="Utilities", ports=(80,), description="", **extra):
+    return {"id": app_id, "name": name, "description": description, "docker_image": f"{app_id}:1",
+            "default_ports": list(ports), "category": category, **extra}
+
+def test_bundled_catalog_keeps_the_deploy_command():
+    store = AppStoreService(DEFAULT_CATALOG_PATH)
+    command = store.generate_deploy_command("nextcloud", "files")
+    assert command == (
+        "docker run -d --name nextcloud-files --restart always "
+        "--memory 2g --cpus 1 "
+        "--label 'traefik.enable=true' "
+        "--label 'traefik.http.routers.nextcloud-files.rule=Host(`files.ksfoundation.space`)' "
+        "--label 'traefik.http.services.nextcloud-files.loadbalancer.server.port=8080' "
+        "nextcloud:latest"
+    )
+    assert store.get_plan("sap-dev").ports == [3200, 3300, 8000, 44300]
+    with pytest.raises(ValueError):
+        store.generate_deploy_command("missing", "blog")
+    with pytest.raises(ValueError):
+        store.generate_deploy_command("nextcloud", "x; rm -rf /")
+
+def test_catalog_indexes(tmp_path):
+    path = tmp_path / "catalog.json"
+    write_catalog(path, 1, [
+        preset("nextcloud", "Nextcloud", "Productivity", (8080,), "Private cloud storage"),
+        preset("filebrowser", "File Browser", "Utilities", (80,), "Web file manager"),
+        preset("seafile", "Seafile", "Productivity", (80, 8082), "File sync and cloud storage"),
+    ])
+    store = AppStoreService(str(path))
+    ids = lambda apps: [app.id for app in apps]
+
+    assert store.get_app("seafile").name == "Seafile"
+    assert ids(store.get_catalog(category="productivity")) == ["nextcloud", "seafile"]
+    assert ids(store.get_catalog(port=80)) == ["filebrowser", "seafile"]
+    assert ids(store.get_catalog(q="cloud stor")) == ["nextcloud", "seafile"]
+    assert ids(store.get_catalog(q="file", port=8082)) == ["seafile"]
+    assert store.get_catalog(q="wiki") == []
+
+def test_catalog_hot_reload_keeps_last_good_version(tmp_path):
+    path = tmp_path / "catalog.json"
+    write_catalog(path, 1, [preset("a", "Alpha")])
+    store = AppStoreService(str(path))
+    assert store.catalog.version == 1
+
+    write_catalog(path, 2, [preset("a", "Alpha"), preset("b", "Beta", resource_profile="small")],
+                  {"small": {"memory": "256m"}})
+    os.utime(path, ns=(1, 1)) # a distinct mtime without waiting on the clock
+    store._checked_at = float("-inf")
+    assert store.catalog.version == 2
+    assert "--memory 256m" in store.generate_deploy_command("b", "x")
+
+    # A broken file (unknown profile) leaves version 2 in service
+    write_catalog(path, 3, [preset("c", "Gamma", resource_profile="huge")])
+    os.utime(path, ns=(2, 2))
+    assert not store.reload_if_changed()
+    assert store.catalog.version == 2 and store.get_app("b") is not None
+
+def stack(*services, **extra_app):
+    return preset("shop", "Shop", ports=(8080,), services=[
+        {"name": name, "image": f"{name}:1", "depends_on": deps, **extra} for name, deps, extra in services
+    ], **extra_app)
+
+def test_stack_levels_and_validation(tmp_path):
+    path = tmp_path / "catalog.json"
+    write_catalog(path, 1, [stack(
+        ("web", ["api", "cache"], {"routed": True}),
+        ("api", ["db"], {}),
+        ("cache", [], {}),
+        ("db", [], {}),
+        ("worker", ["db"], {}),
+    )])
+    store = AppStoreService(str(path))
+    assert store.get_plan("shop").levels == [["cache", "db"], ["api", "worker"], ["web"]]
+    assert store.get_app("shop").images[:2] == ["shop:1", "web:1"]
+
+    for services in [(("a", ["b"], {}), ("b", ["a"], {})), (("a", ["missing"], {}),)]:
+        write_catalog(path, 1, [stack(*services)])
+        with pytest.raises(ValueError):
+            AppStoreService(str(path)).catalog
+
+def test_stack_script_starts_levels_after_health_checks(tmp_path, monkeypatch):
+    """Runs the generated script against a fake `docker` that logs its calls."""
+    from app.core.config import settings
+    monkeypatch.setattr(settings, "APP_SECRETS_DIR", str(tmp_path / "secrets"))
+    path = tmp_path / "catalog.json"
+    write_catalog(path, 1, [stack(
+        ("db", [], {"env": {"PASSWORD": "{secret}"}, "volumes": ["data:/var/lib/db"],
+                    "healthcheck": {"test": "db-ping", "interval": 1, "retries": 3}}),
+        ("cache", [], {}),
+        ("web", ["db", "cache"], {"env": {"DB_PASSWORD": "{secret}"}, "routed": True}),
+        resource_profile="small",
+    )], profiles={"small": {"memory": "256m"}})
+    store = AppStoreService(str(path))
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    log = tmp_path / "docker.log"
+    docker = bin_dir / "docker"
+    # `inspect` reports healthy on the third poll
+    docker.write_text(
+        "#!/bin/sh\n"
+        f"echo \"$*\" >> {log}\n"
+        'if [ "$1" = inspect ]; then\n'
+        f"  n=$(grep -c '^inspect' {log})\n"
+        '  if [ "$n" -ge 3 ]; then echo healthy; else echo starting; fi\n'
+        "fi\n"
+    )
+    docker.chmod(0o755)
+
+    async def executor(node, commands, password=None):
+        result = subprocess.run(["sh", "-c", commands[0]], capture_output=True, text=True, timeout=30,
+                                env={"PATH": f"{bin_dir}:{os.environ['PATH']}"})
+        return [result.stdout.strip() if result.returncode == 0 else f"Error: {result.stderr}"]
+
+    from app.services.node_manager import ServerNode
+    result = asyncio.run(store.deploy("shop", "demo", ServerNode(ip="10.0.0.2", name="node-a"), executor=executor))
+    assert result.success and result.output == ["shop-demo started"]
+
+    lines = log.read_text().splitlines()
+    calls = [line.split()[:4] for line in lines]
+    runs = [call[3] for call in calls if call[0] == "run"]
+    assert calls[:2] == [["network", "create", "traefik"], ["network", "create", "shop-demo"]]
+    assert sorted(runs[:2]) == ["shop-demo-cache", "shop-demo-db"]
+    # web only started after db reported healthy, then joined the Traefik network
+    assert [call[0] for call in calls[4:]] == ["inspect", "inspect", "inspect", "run", "network"]
+    assert runs[2] == "shop-demo-web"
+    assert calls[-1] == ["network", "connect", "traefik", "shop-demo-web"]
+    assert "traefik.docker.network=traefik" in lines[-2]
+    # Only the app container gets the profile's limits
+    assert [line.split()[3] for line in lines if line.startswith("run") and "--memory 256m" in line] == ["shop-demo-web"]
+    assert "-v shop-demo-data:/var/lib/db" in log.read_text()
+
+    # The password is made once on the node, reused on redeploy, and never part of the command
+    secret = (tmp_path / "secrets" / "shop-demo").read_text().strip()
+    assert len(secret) > 16 and oct((tmp_path / "secrets" / "shop-demo").stat().st_mode & 0o777) == "0o600"
+    assert f"PASSWORD={secret}" in next(line for line in lines if line.startswith("run -d --name shop-demo-db"))
+    assert f"DB_PASSWORD={secret}" in lines[-2]
+    assert secret not in store.generate_deploy_command("shop", "demo")
+    asyncio.run(store.deploy("shop", "demo", ServerNode(ip="10.0.0.2", name="node-a"), executor=executor))
+    assert log.read_text().count(f"PASSWORD={secret}") == 4
+
+def test_apps_endpoints():
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from app.core.config import settings
+
+    client = TestClient(app)
+    response = client.get(f"{settings.API_V1_STR}/apps", params={"q": "php"})
+    assert response.status_code == 200
+    assert [a["id"] for a in response.json()] == ["php-lamp", "lamp-stack"]
+    assert client.get(f"{settings.API_V1_STR}/apps/nextcloud").json()["docker_image"] == "nextcloud:latest"
+    assert client.get(f"{settings.API_V1_STR}/apps/missing").status_code == 404
@@ -0,0 +1,26 @@
+import asyncio
+from benchmarks.bench_api import compare, fake_llm, run_api
+
+def result(p50, p95, errors=0, us=10.0):
+    return {"api": {"GET /health": {"requests": 100, "errors": errors, "rps": 1000.0,
+                                    "p50_ms": p50, "p95_ms": p95, "p99_ms": p95 * 2}},
+            "micro": {"jwt.decode": {"us_per_op": us}}}
+
+def test_compare_flags_regressions_past_the_threshold():
+    baseline = result(10.0, 20.0)
+    assert compare(result(12.0, 24.0), baseline, threshold=0.3)[1] == []
+    assert compare(result(14.0, 20.0), baseline, threshold=0.3)[1] == ["GET /health p50_ms"]
+    assert compare(result(10.0, 20.0, errors=1, us=20.0), baseline)[1] == ["GET /health errors", "jwt.decode us_per_op"]
+    # Sub-millisecond jitter on fast endpoints is not a regression
+    assert compare(result(0.3, 0.4), result(0.1, 0.2), min_delta_ms=0.5)[1] == []
+
+def test_api_scenarios_succeed_against_the_local_stand_ins():
+    from app.main import app
+
+    scenarios = ["GET /health", "GET /auth/me", "GET /domains/check", "POST /hosting/provision",
+                 "GET /intel/identity", "GET /intel/products", "POST /agent/chat"]
+    with fake_llm() as llm:
+        results = asyncio.run(run_api(app, requests=4, concurrency=2, warmup=1, rounds=1, scenarios=scenarios))
+    assert list(results) == scenarios
+    assert all(r["errors"] == 0 and r["p50_ms"] > 0 for r in results.values()), results
+    assert "/v1/chat/completions" in llm.requests
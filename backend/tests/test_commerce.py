@@ -0,0 +1,146 @@
+import asyncio
+import pytest
+from app.services.data.commerce import CommerceService, ProductResult
+from app.services.data.price_history import PriceHistoryStore
+
+def fake_store(name, prices, latency=0.0):
+    async def search(keyword):
+        await asyncio.sleep(latency)
+        return [ProductResult(title=f"{name} {p}", price=p, currency="INR", store=name, url=f"https://{name}/{p}") for p in prices]
+    return search
+
+def make_service(tmp_path):
+    service = CommerceService(history=PriceHistoryStore(str(tmp_path)))
+    service.stores = {
+        "a": fake_store("a", [1, 4, 7, 10]),
+        "b": fake_store("b", [2, 5, 8], latency=0.01),
+        "slow": fake_store("slow", [0.5], latency=5),
+    }
+    return service
+
+def test_laptop_search_uses_defined_prices(tmp_path):
+    service = CommerceService(history=PriceHistoryStore(str(tmp_path)))
+    results = asyncio.run(service.search_products("Gaming Laptop"))
+    assert [r.store for r in results] == ["Flipkart", "Amazon", "Shopify (Various)"]
+
+def test_stream_yields_in_arrival_order_and_drops_slow_store(tmp_path):
+    async def run():
+        return [(store, items and len(items)) async for store, items in make_service(tmp_path).stream_products("x", deadline=0.2)]
+
+    assert asyncio.run(run()) == [("a", 4), ("b", 3), ("slow", None)]
+
+def test_pages_follow_cursor_through_merged_order(tmp_path):
+    service = make_service(tmp_path)
+
+    async def run():
+        prices, cursor, missing = [], None, set()
+        while True:
+            page = await service.search_products_page("x", limit=3, cursor=cursor, deadline=0.1)
+            prices.extend(item.price for item in page.items)
+            missing.update(page.missing_stores)
+            if not page.next_cursor:
+                return prices, missing
+            cursor = page.next_cursor
+
+    prices, missing = asyncio.run(run())
+    assert prices == [1, 2, 4, 5, 7, 8, 10]
+    assert missing == {"slow"}
+
+def test_store_joining_on_a_later_page_keeps_price_order(tmp_path):
+    service = make_service(tmp_path)
+    service.stores["late"] = fake_store("late", [0.1, 3, 9], latency=5)
+
+    async def run():
+        first = await service.search_products_page("x", limit=3, deadline=0.1)
+        service.stores["late"] = fake_store("late", [0.1, 3, 9])
+        second = await service.search_products_page("x", limit=3, cursor=first.next_cursor, deadline=0.1)
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert [item.price for item in first.items] == [1, 2, 4]
+    assert "late" in first.missing_stores
+    # 0.1 and 3 were below what page one already showed
+    assert [item.price for item in second.items] == [5, 7, 8]
+
+def test_abandoned_stream_cancels_store_searches(tmp_path):
+    service = make_service(tmp_path)
+
+    async def run():
+        stream = service.stream_products("x", deadline=10)
+        store, _ = await stream.__anext__()
+        await stream.aclose()
+        others = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        # The 5 s "slow" search would outlive this wait unless it was cancelled
+        await asyncio.wait_for(asyncio.gather(*others, return_exceptions=True), timeout=1)
+        return store, others
+
+    store, others = asyncio.run(run())
+    assert store == "a"
+    assert any(task.cancelled() for task in others)
+
+def test_cursor_is_bound_to_keyword(tmp_path):
+    service = make_service(tmp_path)
+    service.stores.pop("slow")
+    page = asyncio.run(service.search_products_page("x", limit=2))
+    with pytest.raises(ValueError):
+        asyncio.run(service.search_products_page("y", cursor=page.next_cursor))
+
+def test_repeat_searches_are_cached_and_feed_price_history(tmp_path):
+    calls = []
+    prices = {"a": 100.0}
+
+    async def store(keyword):
+        calls.append(keyword)
+        return [ProductResult(title="Phone", price=prices["a"], currency="INR", store="a", url="https://a/phone")]
+
+    history = PriceHistoryStore(str(tmp_path))
+    service = CommerceService(history=history)
+    service.stores = {"a": store}
+    asyncio.run(service.search_products("phone"))
+    asyncio.run(service.search_products("Phone "))
+    assert len(calls) == 1
+
+    service.result_cache.clear()
+    asyncio.run(service.search_products("phone")) # unchanged price: not stored again
+    prices["a"] = 80.0
+    service.result_cache.clear()
+    asyncio.run(service.search_products("phone"))
+
+    product_id = history.product_id("a", "https://a/phone")
+    assert [p.price for p in history.history(product_id)] == [100.0, 80.0]
+    assert history.cheapest(product_id).price == 80.0
+    [drop] = history.drops()
+    assert (drop.old_price, drop.new_price) == (100.0, 80.0)
+    assert history.drops(since_seq=drop.seq) == []
+
+    reopened = PriceHistoryStore(str(tmp_path))
+    assert [p.price for p in reopened.history(product_id)] == [100.0, 80.0]
+    # The feed and its sequence numbers survive a restart
+    assert reopened.drops() == [drop]
+    # ...but only one store (process) writes a root at a time
+    assert reopened.record([ProductResult(title="Phone", price=60.0, currency="INR", store="a", url="https://a/phone")]) == []
+    assert [p.price for p in history.history(product_id)] == [100.0, 80.0]
+
+    # The reader picks up what the writer appends afterwards
+    reopened.RELOAD_CHECK_INTERVAL = 0
+    history.record([ProductResult(title="Phone", price=70.0, currency="INR", store="a", url="https://a/phone"),
+                    ProductResult(title="Case", price=5.0, currency="INR", store="a", url="https://a/case")])
+    prices["a"] = 75.0
+    service.result_cache.clear()
+    asyncio.run(service.search_products("phone")) # a price rise only appends to the series
+    [second_drop] = history.drops(since_seq=drop.seq)
+    assert [p.price for p in reopened.history(product_id)] == [100.0, 80.0, 70.0, 75.0]
+    assert reopened.product(history.product_id("a", "https://a/case"))["title"] == "Case"
+    assert reopened.drops() == [drop, second_drop]
+
+def test_cheapest_in_window_over_many_blocks(tmp_path):
+    history = PriceHistoryStore(str(tmp_path))
+    product = ProductResult(title="p", price=0, currency="INR", store="s", url="u")
+    for i in range(5000):
+        product.price = 1000 - (i % 700) + (0.5 if i == 2600 else 0)
+        history.record([product], at=float(i))
+    product_id = history.product_id("s", "u")
+    series = [p.price for p in history.history(product_id)]
+    for since, until in [(0, 4999), (1500, 3500), (1030, 1040), (2099, 2101)]:
+        best = history.cheapest(product_id, since=since, until=until)
+        assert best.price == min(series[since:until + 1])
@@ -0,0 +1,133 @@
+import asyncio
+import threading
+from app.services.domain import DomainService, RDAPAvailabilityBackend
+from tests.fakes import FakeHTTPServer
+
+TAKEN = {"ngo.com", "ngo.org"}
+
+def rdap(path, query):
+    name = path.rsplit("/", 1)[-1]
+    if name in TAKEN:
+        return 200, {"objectClassName": "domain", "ldhName": name}
+    return 404, {"errorCode": 404}
+
+def make_service(url: str) -> DomainService:
+    backend = RDAPAvailabilityBackend(url, rate=1000)
+    return DomainService(backends={ext: backend for ext in DomainService.SUPPORTED_EXTENSIONS})
+
+def test_check_availability_queries_all_tlds_concurrently():
+    # Every lookup blocks until all of them are in flight at once
+    barrier = threading.Barrier(len(DomainService.SUPPORTED_EXTENSIONS), timeout=5)
+
+    def concurrent_rdap(path, query):
+        barrier.wait()
+        return rdap(path, query)
+
+    with FakeHTTPServer(concurrent_rdap) as server:
+        service = make_service(server.url)
+
+        async def run():
+            results = await service.check_availability("NGO")
+            await service.close()
+            return results
+
+        results = asyncio.run(run())
+
+    assert {r.domain: r.available for r in results if not r.available} == {"ngo.com": False, "ngo.org": False}
+    assert len(results) == len(DomainService.SUPPORTED_EXTENSIONS)
+    assert server.max_in_flight == len(DomainService.SUPPORTED_EXTENSIONS)
+    assert not barrier.broken
+
+def test_bulk_lookups_are_capped_and_bounded_by_a_deadline():
+    with FakeHTTPServer(rdap, delay=0.05) as server:
+        backend = RDAPAvailabilityBackend(server.url, rate=1000)
+        backend.semaphore = asyncio.Semaphore(4)
+        service = DomainService(backends={ext: backend for ext in DomainService.SUPPORTED_EXTENSIONS})
+
+        async def run():
+            results = await service.check_availability_bulk([f"kw{i}" for i in range(100)], deadline=0.3)
+            await service.close()
+            return results
+
+        results = asyncio.run(run())
+
+    assert len(results) == 100
+    assert server.max_in_flight <= 4
+    # Only part of the 800 names could be verified in time; the rest are not offered
+    assert len(server.requests) < 800
+    assert sum(r.available for rows in results.values() for r in rows) <= len(server.requests)
+
+def test_results_are_cached_and_bulk_dedupes_keywords():
+    with FakeHTTPServer(rdap) as server:
+        service = make_service(server.url)
+
+        async def run():
+            first = await service.check_availability_bulk(["ngo", "school", "ngo"])
+            hits = len(server.requests)
+            await service.check_availability("ngo")
+            await service.close()
+            return first, hits
+
+        results, hits = asyncio.run(run())
+        assert list(results) == ["ngo", "school"]
+        assert hits == 2 * len(DomainService.SUPPORTED_EXTENSIONS)
+        assert len(server.requests) == hits
+
+def test_lookup_errors_are_not_cached():
+    with FakeHTTPServer(lambda path, query: (503, {})) as server:
+        service = make_service(server.url)
+
+        async def run():
+            first = await service.is_available("ngo.io")
+            second = await service.is_available("ngo.io")
+            await service.close()
+            return first, second
+
+        assert asyncio.run(run()) == (False, False)
+        assert len(server.requests) == 2
+
+def test_suggestions_skip_names_in_taken_index(tmp_path):
+    from app.services.domain import build_taken_index, iter_zone_names
+
+    zone = tmp_path / "com.zone"
+    zone.write_text(
+        "$ORIGIN com.\n"
+        "$TTL 86400\n"
+        "@ IN SOA a.gtld-servers.net. nstld.verisign-grs.com. 1 2 3 4 5\n"
+        "greenearth NS ns1.host.net.\n"
+        "\tNS ns2.host.net.\n"
+        "getgreenearth.com. NS ns1.host.net.\n"
+        "GREENEARTHHQ NS ns1.host.net.\n"
+    )
+    assert list(iter_zone_names(str(zone))) == ["greenearth.com", "getgreenearth.com", "greenearthhq.com"]
+    index = build_taken_index([str(zone)], str(tmp_path / "taken.bloom"))
+
+    with FakeHTTPServer(rdap) as server:
+        backend = RDAPAvailabilityBackend(server.url, rate=1000)
+        service = DomainService(backends={ext: backend for ext in DomainService.SUPPORTED_EXTENSIONS}, taken_index=index)
+
+        async def run():
+            # Fresh answers in the availability cache are used without a live check
+            service.cache.set("green-earth.com", False)
+            service.cache.set("green-earth.org", True)
+            unverified = await service.suggest("Green Earth")
+            live_calls = len(server.requests)
+            verified = await service.suggest("Green Earth", limit=10, verify=True)
+            await service.close()
+            return unverified, live_calls, verified
+
+        suggestions, live_calls, verified = asyncio.run(run())
+
+    domains = [s.domain for s in suggestions]
+    assert len(domains) == 50
+    assert domains[:3] == ["green-earth.org", "mygreenearth.com", "greenearthapp.com"]
+    # Neither the keyword's own names nor taken ones are suggested
+    assert not {"greenearth.com", "greenearth.org", "green-earth.com", "getgreenearth.com", "greenearthhq.com"} & set(domains)
+    assert (suggestions[0].available, suggestions[0].verified) == (True, True)
+    assert all(s.available is None and not s.verified for s in suggestions[1:])
+    assert [s.score for s in suggestions] == sorted(s.score for s in suggestions)
+    # The default path is answered from memory alone
+    assert live_calls == 0
+    # Verification only checks one window of survivors; the two cached names need no live call
+    assert all(s.verified for s in verified) and len(verified) == 10
+    assert len(server.requests) == 10 + 5 - 2
@@ -0,0 +1,130 @@
+import pytest
+from app.services.firewall import FirewallRule, RuleKey, firewall_service
+
+compiler = firewall_service.compiler
+
+def test_compile_merges_overlapping_ports_and_cidrs():
+    rules = [
+        FirewallRule(port="8000-8010", source_ip="10.0.0.0/24"),
+        FirewallRule(port="8005:8020", source_ip="10.0.0.0/24"),
+        FirewallRule(port=8021, source_ip="10.0.0.0/24"),
+        FirewallRule(port=22, source_ip="10.0.0.0/25"),
+        FirewallRule(port=22, source_ip="10.0.0.128/25"),
+        FirewallRule(port=22, source_ip="10.0.0.7"),
+    ]
+    assert list(compiler.compile(rules)) == [
+        RuleKey("IN", "ALLOW", "tcp", "22", "10.0.0.0/24"),
+        RuleKey("IN", "ALLOW", "tcp", "8000:8021", "10.0.0.0/24"),
+    ]
+
+def test_incremental_commands_only_touch_changed_rules():
+    current = [
+        "ufw allow 22/tcp",
+        "ufw allow from 0.0.0.0/0 to any port 80 proto tcp comment 'web'",
+        "ufw allow from 10.0.0.0/8 to any port 5432 proto tcp",
+    ]
+    rules = [
+        FirewallRule(port=22),
+        FirewallRule(port=80, comment="web"),
+        FirewallRule(port=443, comment="tls"),
+        FirewallRule(port="any", action="DENY", source_ip="203.0.113.9"),
+    ]
+    commands = firewall_service.generate_incremental_ufw_commands(rules, current)
+    assert commands == [
+        "ufw insert 1 deny from 203.0.113.9/32 to any proto tcp",
+        "ufw allow from 0.0.0.0/0 to any port 443 proto tcp comment tls",
+        "ufw delete allow from 10.0.0.0/8 to any port 5432 proto tcp",
+    ]
+    assert not any("reset" in command for command in commands)
+
+def test_incremental_commands_delete_the_nodes_literal_rules():
+    # Adjacent /25s on the node are two rules, not one merged /24
+    current = [
+        "ufw allow from 10.0.0.0/25 to any port 22 proto tcp",
+        "ufw allow from 10.0.0.128/25 to any port 22 proto tcp",
+        "ufw allow 80,443/tcp",
+    ]
+    commands = firewall_service.generate_incremental_ufw_commands([FirewallRule(port=443)], current)
+    assert commands == [
+        "ufw allow from 0.0.0.0/0 to any port 443 proto tcp",
+        "ufw delete allow from 10.0.0.0/25 to any port 22 proto tcp",
+        "ufw delete allow from 10.0.0.128/25 to any port 22 proto tcp",
+        "ufw delete allow 80,443/tcp",
+    ]
+
+def test_limit_rules_and_protocol_less_port_ranges():
+    rules = [
+        FirewallRule(port=22, action="LIMIT"),
+        FirewallRule(port="60000-61000", protocol="any", comment="mosh"),
+    ]
+    current = ["ufw limit from 0.0.0.0/0 to any port 22 proto tcp"]
+    assert firewall_service.generate_incremental_ufw_commands(rules, current) == [
+        "ufw allow from 0.0.0.0/0 to any port 60000:61000 proto tcp comment mosh",
+        "ufw allow from 0.0.0.0/0 to any port 60000:61000 proto udp comment mosh",
+    ]
+    # A LIMIT rule is not the ALLOW rule of the same port
+    assert firewall_service.generate_incremental_ufw_commands([FirewallRule(port=22)], current) == [
+        "ufw allow from 0.0.0.0/0 to any port 22 proto tcp",
+        "ufw delete limit from 0.0.0.0/0 to any port 22 proto tcp",
+    ]
+    with pytest.raises(ValueError):
+        compiler.compile([FirewallRule(port=22, action="REDIRECT")])
+    with pytest.raises(ValueError):
+        firewall_service.generate_iptables_commands(rules)
+
+def test_iptables_restore_payload_is_single_batch():
+    ruleset = compiler.compile([
+        FirewallRule(port=443, source_ip="192.168.1.0/24"),
+        FirewallRule(port=53, protocol="udp", direction="OUT", source_ip="1.1.1.1"),
+        FirewallRule(port=22, source_ip="2001:db8::/32"),
+    ])
+    payload = compiler.iptables_restore_payload(ruleset)
+    assert payload.startswith("*filter\n") and payload.endswith("COMMIT\n")
+    assert "-A KSF-INPUT -s 192.168.1.0/24 -p tcp --dport 443 -j ACCEPT" in payload
+    assert "-A KSF-OUTPUT -d 1.1.1.1/32 -p udp --dport 53 -j ACCEPT" in payload
+    assert "2001:db8::/32" in compiler.iptables_restore_payload(ruleset, version=6)
+    assert "2001:db8::/32" not in payload
+
+    commented = compiler.iptables_restore_payload(compiler.compile([FirewallRule(port=80, comment='web "edge" server')]))
+    assert '-m comment --comment "web \'edge\' server" -j ACCEPT' in commented
+
+def test_country_block_loads_aggregated_set_in_one_restore(tmp_path, monkeypatch):
+    from app.services import firewall
+    from app.services.geoip import GeoIPDatabase
+
+    dataset = tmp_path / "geoip.csv"
+    dataset.write_text(
+        "network,country_code\n"
+        "1.0.0.0/24,XX\n1.0.1.0/24,XX\n1.0.2.0/23,XX\n"
+        "9.9.9.0/24,YY\n2001:db8::/33,XX\n2001:db8:8000::/33,XX\n"
+    )
+    monkeypatch.setattr(firewall, "geoip_database", GeoIPDatabase(str(dataset)))
+
+    commands = firewall_service.block_country_commands("xx")
+    v4_restore = next(c for c in commands if "swap country_xx-new country_xx\n" in c)
+    assert v4_restore.startswith("ipset restore <<'KSF_EOF'\ncreate country_xx-new hash:net family inet hashsize ")
+    assert "-exist" not in v4_restore and "flush" not in v4_restore
+    assert "add country_xx-new 1.0.0.0/22\n" in v4_restore
+    assert v4_restore.count("\nadd ") == 1
+    assert v4_restore.endswith("destroy country_xx-new\nKSF_EOF")
+    # The staging set is always created fresh, the live set only when missing
+    before = commands[:commands.index(v4_restore)]
+    assert before[-2:] == ["ipset destroy country_xx-new 2>/dev/null || true",
+                           "ipset list -n country_xx >/dev/null 2>&1 || "
+                           "ipset create country_xx hash:net family inet hashsize 16384 maxelem 65536"]
+    assert any("add country_xx_v6-new 2001:db8::/32" in c for c in commands)
+
+    monkeypatch.setattr(firewall, "geoip_database", GeoIPDatabase(str(tmp_path / "missing.csv")))
+    assert "ipset create country_xx hash:net" in firewall_service.block_country_commands("XX")
+
+def test_geoip_dataset_tolerates_missing_empty_and_garbled_files(tmp_path):
+    from app.services.geoip import GeoIPDatabase
+
+    assert not GeoIPDatabase(str(tmp_path / "missing.csv")).available
+    empty = tmp_path / "empty.csv"
+    empty.write_bytes(b"")
+    assert GeoIPDatabase(str(empty)).country_networks("XX") == []
+
+    garbled = tmp_path / "garbled.csv"
+    garbled.write_bytes(b"1.0.0.0/24,XX\n\xff\xfe.0.0/8,XX\n1.0.1.0/24,\xe9\xe9\n1.0.1.0/24,XX\n")
+    assert GeoIPDatabase(str(garbled)).country_networks("XX") == ["1.0.0.0/23"]
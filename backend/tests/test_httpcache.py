@@ -0,0 +1,77 @@
+import os
+from email.utils import formatdate
+from fastapi.testclient import TestClient
+from starlette.requests import Request
+from app.core.config import settings
+from app.core.httpcache import HTTPCache
+from app.main import app
+from app.services.app_store import AppStoreService
+from tests.test_app_store import preset, write_catalog
+
+def request(**headers) -> Request:
+    return Request({"type": "http", "method": "GET", "path": "/",
+                    "headers": [(k.replace("_", "-").encode(), v.encode()) for k, v in headers.items()]})
+
+def test_rendered_bytes_are_reused_until_the_version_changes():
+    cache = HTTPCache()
+    renders = []
+
+    def render(body: bytes):
+        def run():
+            renders.append(body)
+            return body
+        return run
+
+    first = cache.respond(request(), "k", 1, render(b"[1]"), max_age=60, last_modified=1_000_000)
+    etag = first.headers["etag"]
+    assert first.body == b"[1]" and first.headers["cache-control"] == "public, max-age=60"
+    assert first.headers["last-modified"] == formatdate(1_000_000, usegmt=True)
+
+    assert cache.respond(request(if_none_match=etag), "k", 1, render(b"[1]")).status_code == 304
+    assert cache.respond(request(if_none_match=f'"other", W/{etag}'), "k", 1, render(b"[1]")).status_code == 304
+    assert cache.respond(request(if_modified_since=formatdate(1_000_000, usegmt=True)), "k", 1, render(b"[1]")).status_code == 304
+    assert cache.respond(request(if_modified_since=formatdate(999_999, usegmt=True)), "k", 1, render(b"[1]")).status_code == 200
+    assert renders == [b"[1]"]
+
+    # New version, same bytes: nothing changed for the client
+    same = cache.respond(request(if_none_match=etag), "k", 2, render(b"[1]"), last_modified=2_000_000)
+    assert same.status_code == 304 and same.headers["last-modified"] == formatdate(1_000_000, usegmt=True)
+    changed = cache.respond(request(if_none_match=etag), "k", 3, render(b"[1,2]"))
+    assert changed.status_code == 200 and changed.body == b"[1,2]" and changed.headers["etag"] != etag
+    assert changed.headers["cache-control"] == "no-cache"
+    assert len(renders) == 3
+
+def test_app_catalog_revalidates_against_the_catalog_file(tmp_path, monkeypatch):
+    path = tmp_path / "catalog.json"
+    write_catalog(path, 1, [preset("nextcloud", "Nextcloud")])
+    store = AppStoreService(str(path))
+    store.RELOAD_CHECK_INTERVAL = 0
+    monkeypatch.setattr("app.routers.hosting.app_store_service", store)
+    client = TestClient(app)
+    url = f"{settings.API_V1_STR}/apps"
+
+    response = client.get(url)
+    assert [a["id"] for a in response.json()] == ["nextcloud"]
+    assert response.headers["last-modified"] == formatdate(os.stat(path).st_mtime, usegmt=True)
+    etag = response.headers["etag"]
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+    assert client.get(url, params={"q": "next"}, headers={"If-None-Match": etag}).status_code == 304
+
+    write_catalog(path, 2, [preset("nextcloud", "Nextcloud"), preset("ghost", "Ghost")])
+    os.utime(path, (os.stat(path).st_atime, os.stat(path).st_mtime + 10))
+    response = client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert [a["id"] for a in response.json()] == ["nextcloud", "ghost"]
+    assert response.headers["etag"] != etag
+
+def test_models_and_domains_serve_etags():
+    client = TestClient(app)
+    models = client.get(f"{settings.API_V1_STR}/models")
+    assert models.status_code == 200 and models.json()[0]["id"] == "gpt-4-turbo-preview"
+    assert client.get(f"{settings.API_V1_STR}/models", headers={"If-None-Match": models.headers["etag"]}).status_code == 304
+
+    domains = client.get(f"{settings.API_V1_STR}/domains/check", params={"q": "etagtest"})
+    assert domains.headers["cache-control"] == "public, max-age=60"
+    again = client.get(f"{settings.API_V1_STR}/domains/check", params={"q": "etagtest"},
+                       headers={"If-None-Match": domains.headers["etag"]})
+    assert again.status_code == 304 and again.content == b""
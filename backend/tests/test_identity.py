@@ -0,0 +1,80 @@
+import asyncio
+import json
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services.data import identity
+from app.services.data.identity import IdentityDataService, iter_upload_values, normalize_epics, normalize_phones
+from app.services.data.identity_store import IdentityStore
+
+def test_normalize_phones_to_e164():
+    assert normalize_phones([
+        "98765 43210", "098765-43210", "+91 98765 43210", "0044 20 7946 0958", "(415) 555-0100", "12", "n/a",
+    ]) == [
+        "+919876543210", "+919876543210", "+919876543210", "+442079460958", "+914155550100", None, None,
+    ]
+    assert normalize_epics(["abc1234567", "ABC-123 4567", "AB1234567"]) == ["ABC1234567", "ABC1234567", None]
+
+class SlowIdentityService(IdentityDataService):
+    BULK_CONCURRENCY = 4
+
+    def __init__(self, store):
+        super().__init__(store)
+        self.calls = []
+        self.in_flight = self.max_in_flight = 0
+
+    async def _fetch_phone(self, phone_number):
+        self.calls.append(phone_number)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        if phone_number.endswith("99"):
+            raise RuntimeError("provider error")
+        return {"name": f"Owner of {phone_number}"}
+
+async def upload(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+def test_bulk_lookup_dedupes_bounds_concurrency_and_stores_results(tmp_path):
+    service = SlowIdentityService(IdentityStore(str(tmp_path / "identity.sqlite3")))
+    numbers = [f"98765{i:05d}" for i in range(40)] + ["+91 9876500000", "bogus", "9876500099"]
+    body = ("phone,name\n" + "\n".join(f"{n},x" for n in numbers)).encode()
+
+    async def run():
+        # The body arrives in arbitrary pieces, split mid-line
+        values = iter_upload_values(upload(body[:37], body[37:300], body[300:]), "text/csv", ("phone",))
+        first = [line async for line in service.lookup_bulk("phone", values)]
+        calls_after_first = len(service.calls)
+        values = iter_upload_values(upload(body), "text/csv", ("phone",))
+        second = [line async for line in service.lookup_bulk("phone", values)]
+        return first, second, calls_after_first
+
+    first, second, calls_after_first = asyncio.run(run())
+
+    by_status = lambda lines, status: [line for line in lines if line["status"] == status]
+    assert len(first) == 42 # 41 distinct valid numbers + 1 invalid
+    assert by_status(first, "invalid")[0]["input"] == "bogus"
+    assert [line["key"] for line in by_status(first, "error")] == ["+919876500099"]
+    assert calls_after_first == 41
+    assert service.max_in_flight == 4
+
+    # Second upload: everything but the failed lookup comes from the store
+    assert sum(line["cached"] for line in second) == 40
+    assert len(service.calls) == 42
+
+def test_bulk_endpoint_streams_ndjson(tmp_path, monkeypatch):
+    monkeypatch.setattr(identity.identity_service, "store", IdentityStore(str(tmp_path / "identity.sqlite3")))
+    client = TestClient(app)
+    body = "\n".join(json.dumps(item) for item in [{"epic": "ABC1234567"}, "abc-1234567", "XYZ7654321", "nope"])
+
+    response = client.post("/api/v1/intel/voter/bulk", content=body, headers={"Content-Type": "application/x-ndjson"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    # "abc-1234567" is a duplicate of the first EPIC and is not looked up again
+    assert {line["input"]: line["status"] for line in lines} == {
+        "ABC1234567": "ok", "XYZ7654321": "ok", "nope": "invalid",
+    }
+    assert all(line["result"]["status"] == "Active" for line in lines if line["status"] == "ok")
@@ -0,0 +1,105 @@
+import asyncio
+import json
+import re
+from datetime import datetime, timezone
+from app.services.app_store import AppStoreService
+from app.services.image_prefetch import ImagePrefetchScheduler, RegistryClient
+from app.services.node_manager import ServerNode
+from tests.fakes import FakeHTTPServer
+
+MB = 1024 * 1024
+NIGHT = datetime(2026, 1, 5, 2, tzinfo=timezone.utc)
+NOON = datetime(2026, 1, 5, 12, tzinfo=timezone.utc)
+
+def digest(n):
+    return "sha256:" + f"{n:x}".rjust(64, "0")
+
+class FakeRegistry:
+    """Registry v2 stand-in: a manifest list per tag, one amd64 image each."""
+
+    def __init__(self, sizes):
+        self.tags = {repo: digest(i + 1) for i, repo in enumerate(sizes)}
+        self.sizes = sizes
+
+    def __call__(self, path, query):
+        repo, reference = re.fullmatch(r"/v2/(.+)/manifests/(.+)", path).groups()
+        if not reference.startswith("sha256:"): # a tag
+            return 200, {}, {"Docker-Content-Digest": self.tags[repo]}
+        if reference in self.tags.values():
+            return 200, {"manifests": [{"digest": reference + "-amd64", "platform": {"os": "linux", "architecture": "amd64"}}]}
+        return 200, {"config": {"size": 0}, "layers": [{"size": self.sizes[repo] * MB}]}
+
+def make_store(tmp_path):
+    apps = [
+        {"id": app_id, "name": app_id, "description": "", "docker_image": image,
+         "default_ports": [80], "category": "Apps"}
+        for app_id, image in [("cloud", "nextcloud:latest"), ("files", "filebrowser/filebrowser"), ("kuma", "louislam/uptime-kuma:1")]
+    ]
+    path = tmp_path / "catalog.json"
+    path.write_text(json.dumps({"version": 1, "apps": apps}))
+    return AppStoreService(str(path))
+
+def test_prefetch_pins_digests_within_idle_hours_and_budget(tmp_path):
+    registry = FakeRegistry({"library/nextcloud": 900, "filebrowser/filebrowser": 50, "louislam/uptime-kuma": 300})
+    store = make_store(tmp_path)
+    for app_id in ["kuma", "kuma", "cloud"]:
+        store.generate_deploy_command(app_id, "demo")
+    commands = []
+
+    async def executor(node, batch):
+        commands.extend(batch)
+        if batch[0].startswith("docker images"):
+            # The node already runs filebrowser at the current digest
+            return [f"filebrowser/filebrowser:latest {digest(2)}"]
+        return [f"Success: {cmd}" for cmd in batch]
+
+    async def run(server):
+        prefetcher = ImagePrefetchScheduler(RegistryClient(server.url), store, executor,
+                                            idle_hours="1-6", budget_mb=1000)
+        prefetcher.register_node(ServerNode(ip="10.0.0.2", name="node-a"))
+        outside = await prefetcher.run_cycle(NOON)
+        first = await prefetcher.run_cycle(NIGHT)
+        second = await prefetcher.run_cycle(NIGHT)
+        coverage = prefetcher.coverage()[0]
+
+        # `:latest` moves upstream: nothing is re-pulled until the pin is refreshed
+        registry.tags["library/nextcloud"] = digest(9)
+        unchanged = await prefetcher.run_cycle(NIGHT.replace(day=6))
+        moved = await prefetcher.refresh_pins()
+        stale = prefetcher.coverage()[0].stale
+        await prefetcher.registry.close()
+        return outside, first, second, coverage, unchanged, moved, stale
+
+    with FakeHTTPServer(registry) as server:
+        outside, first, second, coverage, unchanged, moved, stale = asyncio.run(run(server))
+
+    assert outside == {}
+    # Most deployed first; nextcloud (900 MB) no longer fits the 1000 MB budget after kuma
+    assert first == {"node-a": ["louislam/uptime-kuma:1"]}
+    assert second == {"node-a": []}
+    assert f"docker pull -q louislam/uptime-kuma@{digest(3)}" in commands
+    assert f"docker tag louislam/uptime-kuma@{digest(3)} louislam/uptime-kuma:1" in commands
+    assert (coverage.cached, coverage.total, coverage.missing) == (2, 3, ["nextcloud:latest"])
+    assert round(coverage.weighted, 2) == 0.67 # kuma's 2 of 3 deploys
+    # Next day: budget renewed, nextcloud pulled at its pinned (old) digest
+    assert unchanged == {"node-a": ["nextcloud:latest"]}
+    assert f"docker pull -q nextcloud@{digest(1)}" in commands
+    assert moved == {"nextcloud:latest": digest(9)}
+    assert stale == ["nextcloud:latest"]
+
+def test_scheduling_loop_starts_once_and_stops_on_close(tmp_path):
+    cycles = []
+
+    async def run():
+        prefetcher = ImagePrefetchScheduler(RegistryClient(None), make_store(tmp_path), None)
+        prefetcher.run_cycle = lambda: cycles.append(1) or asyncio.sleep(0)
+        prefetcher.start(interval=0.01)
+        task = prefetcher._task
+        prefetcher.start(interval=0.01)
+        await asyncio.sleep(0.05)
+        await prefetcher.close()
+        return task, prefetcher._task
+
+    task, after = asyncio.run(run())
+    assert task.cancelled() and after is None
+    assert 1 < len(cycles) < 10
@@ -0,0 +1,90 @@
+import asyncio
+import io
+import json
+import logging
+import threading
+import httpx
+from fastapi.testclient import TestClient
+from app.core.logs import LOGS_DROPPED, LogContextMiddleware, bind, configure_logging, shutdown_logging
+from app.core.tracing import TracingMiddleware
+
+def lines(stream: io.StringIO):
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+def test_records_carry_request_context():
+    async def endpoint(scope, receive, send):
+        bind(user="user-1")
+        logging.getLogger("tests.logs").info("deploying %s", "blog", extra={"node": "10.0.0.2"})
+        await send({"type": "http.response.start", "status": 204, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    app = TracingMiddleware(LogContextMiddleware(endpoint))
+    stream = io.StringIO()
+    configure_logging("INFO", stream=stream)
+    try:
+        async def call():
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://t") as client:
+                return await client.get("/deploy", headers={"X-Request-ID": "log-req-1"})
+        response = asyncio.run(call())
+        logging.getLogger("tests.logs").warning("outside a request")
+    finally:
+        shutdown_logging()
+
+    inside, outside = [r for r in lines(stream) if r["logger"] == "tests.logs"]
+    assert inside["msg"] == "deploying blog" and inside["level"] == "info" and inside["logger"] == "tests.logs"
+    assert (inside["request_id"], inside["user"], inside["node"]) == (response.headers["x-request-id"], "user-1", "10.0.0.2")
+    assert outside["msg"] == "outside a request" and "request_id" not in outside and "user" not in outside
+
+def test_route_template_is_logged_for_app_requests():
+    from app.main import app
+
+    stream = io.StringIO()
+    configure_logging("DEBUG", stream=stream)
+    try:
+        response = TestClient(app).get("/api/v1/intel/voter", params={"epic": "ABC1234567"})
+    finally:
+        shutdown_logging()
+    record = next(r for r in lines(stream) if r.get("request_id") == response.headers["x-request-id"])
+    assert record["route"] == "/api/v1/intel/voter" and record["logger"] == "app.services.data.identity"
+
+def test_debug_lines_are_sampled_per_call_site():
+    stream = io.StringIO()
+    configure_logging("DEBUG", debug_sample_rate=0.1, stream=stream)
+    log = logging.getLogger("tests.sampling")
+    try:
+        for i in range(100):
+            log.debug("executing %d", i)
+            log.debug("connecting")
+        log.error("always kept")
+    finally:
+        shutdown_logging()
+    records = lines(stream)
+    assert [r["msg"] for r in records if r["msg"].startswith("executing")] == [f"executing {i}" for i in range(0, 100, 10)]
+    assert sum(r["msg"] == "connecting" for r in records) == 10
+    assert all(r["sampled"] == 10 for r in records[:-1]) and "sampled" not in records[-1]
+
+class BlockedStream(io.StringIO):
+    """A log collector that stops accepting writes until released."""
+
+    def __init__(self):
+        super().__init__()
+        self.release = threading.Event()
+
+    def write(self, text):
+        self.release.wait(10)
+        return super().write(text)
+
+def test_full_queue_drops_instead_of_blocking():
+    stream = BlockedStream()
+    dropped = LOGS_DROPPED.labels().value
+    configure_logging("INFO", queue_size=10, stream=stream)
+    log = logging.getLogger("tests.backpressure")
+    try:
+        for i in range(1_000):
+            log.info("line %d", i)
+        # At most one record in the writer plus a full queue got through
+        assert LOGS_DROPPED.labels().value - dropped >= 1_000 - 11
+    finally:
+        stream.release.set()
+        shutdown_logging()
+    assert 10 <= len(stream.getvalue().splitlines()) <= 11
@@ -0,0 +1,86 @@
+import re
+import threading
+import pytest
+from fastapi.testclient import TestClient
+from app.core.metrics import Counter, Histogram, Registry
+
+def sample(text, name, **labels):
+    """Value of one sample in Prometheus text output (0 if absent)."""
+    wanted = ",".join(f'{key}="{value}"' for key, value in labels.items())
+    for line in text.splitlines():
+        match = re.fullmatch(r"([^{ ]+)(?:\{(.*)\})? (\S+)", line)
+        if match and match.group(1) == name and (match.group(2) or "") == wanted:
+            return float(match.group(3))
+    return 0.0
+
+def test_sharded_metrics_sum_across_threads():
+    registry = Registry()
+    requests = Counter("jobs_total", "Jobs.", ["kind"], registry=registry)
+    latency = Histogram("job_seconds", "Job time.", buckets=(0.1, 1.0), registry=registry)
+    barrier = threading.Barrier(8)
+
+    def work():
+        barrier.wait()
+        for i in range(1000):
+            requests.labels("a").inc()
+            latency.observe(0.05 if i % 2 else 0.5)
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    text = registry.render()
+    assert "# TYPE job_seconds histogram" in text
+    assert sample(text, "jobs_total", kind="a") == 8000
+    assert sample(text, "job_seconds_bucket", le="0.1") == 4000
+    assert sample(text, "job_seconds_bucket", le="1") == 8000
+    assert sample(text, "job_seconds_bucket", le="+Inf") == 8000
+    assert sample(text, "job_seconds_count") == 8000
+    assert sample(text, "job_seconds_sum") == pytest.approx(4000 * 0.05 + 4000 * 0.5)
+
+def test_metrics_endpoint_reports_route_templates_and_db_queries():
+    from app.main import app
+
+    with TestClient(app) as client: # runs the lifespan, so init_db issues SQL
+        before = client.get("/metrics").text
+        client.get("/api/v1/apps/nextcloud")
+        client.get("/api/v1/apps/wordpress")
+        client.get("/api/v1/apps/missing")
+        client.get("/no-such-page")
+        after = client.get("/metrics").text
+
+    delta = lambda name, **labels: sample(after, name, **labels) - sample(before, name, **labels)
+    route = "/api/v1/apps/{app_id}"
+    assert delta("http_requests_total", route=route, method="GET", status="200") == 2
+    assert delta("http_requests_total", route=route, method="GET", status="404") == 1
+    assert delta("http_request_duration_seconds_count", route=route, method="GET") == 3
+    assert delta("http_requests_total", route="<unmatched>", method="GET", status="404") == 1
+    assert sample(after, "http_requests_in_flight") == 1 # the scrape itself
+    assert sample(after, "db_query_duration_seconds_count", operation="PRAGMA") > 0
+
+def test_tool_latency_labels_only_registered_tools(monkeypatch):
+    import asyncio
+    import json
+    from app.ai.core import BaseAgent
+    from app.core.config import settings
+    from app.core.metrics import TOOL_LATENCY
+    from tests.fakes import FakeHTTPServer
+
+    def completion(path, query):
+        calls = [{"id": f"call_{i}", "type": "function", "function": {"name": name, "arguments": json.dumps({"keyword": "metricstest"})}}
+                 for i, name in enumerate(["made_up_tool_7f3a", "check_domain_availability"])]
+        return 200, {"id": "chatcmpl-test", "object": "chat.completion", "created": 0, "model": "gpt-4o-mini",
+                     "choices": [{"index": 0, "finish_reason": "tool_calls",
+                                  "message": {"role": "assistant", "content": None, "tool_calls": calls}}]}
+
+    unknown = TOOL_LATENCY.labels("unknown", "ok").snapshot()[1]
+    with FakeHTTPServer(completion) as server:
+        monkeypatch.setattr(settings, "OPENAI_API_KEY", "test")
+        monkeypatch.setenv("OPENAI_BASE_URL", f"{server.url}/v1")
+        response = asyncio.run(BaseAgent().chat("hello"))
+
+    assert [call["function"] for call in response.tool_calls] == ["made_up_tool_7f3a", "check_domain_availability"]
+    assert TOOL_LATENCY.labels("unknown", "ok").snapshot()[1] == unknown + 1
+    assert not any(key[0] == "made_up_tool_7f3a" for key in TOOL_LATENCY._children)
@@ -0,0 +1,143 @@
+import asyncio
+import pytest
+from app.core import geo
+from app.services.data.google import GoogleDataService
+from tests.fakes import FakeHTTPServer
+
+def fake_places(path, query):
+    """Places Nearby Search stand-in: one place at each searched centre."""
+    lat, lng = map(float, query["location"][0].split(","))
+    cell = geo.encode(lat, lng, 9)
+    return 200, {"status": "OK", "results": [{
+        "name": f"{query['keyword'][0]} {cell}",
+        "vicinity": "Somewhere",
+        "types": ["school"],
+        "geometry": {"location": {"lat": lat, "lng": lng}},
+        "rating": 4.0,
+        "place_id": cell,
+    }]}
+
+def make_service(url):
+    service = GoogleDataService()
+    service.api_key = "test-key"
+    service.base_url = url
+    return service
+
+def test_repeat_and_overlapping_queries_are_served_from_cells():
+    with FakeHTTPServer(fake_places) as server:
+        service = make_service(server.url)
+
+        async def run():
+            first = await service.search_nearby_business("Schools", "37.7749,-122.4194", 5000)
+            after_first = len(server.requests)
+            again = await service.search_nearby_business("schools ", "37.7749,-122.4194", 5000)
+            nearby = await service.search_nearby_business("Schools", "37.7760,-122.4180", 1000)
+            await service.close()
+            return first, after_first, again, nearby
+
+        first, after_first, again, nearby = asyncio.run(run())
+
+    assert after_first == len(server.requests)
+    assert [p.place_id for p in again] == [p.place_id for p in first]
+    assert first and all(geo.distance_m(37.7749, -122.4194, p.location["lat"], p.location["lng"]) <= 5000 for p in first)
+    assert set(p.place_id for p in nearby) <= set(p.place_id for p in first)
+
+def test_concurrent_identical_queries_share_upstream_fetches():
+    with FakeHTTPServer(fake_places, delay=0.05) as server:
+        service = make_service(server.url)
+
+        async def run():
+            results = await asyncio.gather(*(
+                service.search_nearby_business("NGO", "12.9716,77.5946", 3000) for _ in range(10)
+            ))
+            await service.close()
+            return results
+
+        results = asyncio.run(run())
+
+    cells = service._covering_cells(12.9716, 77.5946, 3000)
+    assert len(server.requests) == len(cells)
+    assert all(r == results[0] for r in results)
+
+def test_cancelled_caller_does_not_strand_coalesced_waiters():
+    with FakeHTTPServer(fake_places, delay=0.2) as server:
+        service = make_service(server.url)
+
+        async def run():
+            leader = asyncio.ensure_future(service.search_nearby_business("NGO", "12.9716,77.5946", 500))
+            await asyncio.sleep(0.05)
+            follower = asyncio.ensure_future(service.search_nearby_business("NGO", "12.9716,77.5946", 500))
+            await asyncio.sleep(0.01)
+            leader.cancel()
+            result = await asyncio.wait_for(follower, timeout=2)
+            await service.close()
+            return result
+
+        result = asyncio.run(run())
+
+    assert result
+    assert len(service.cell_fetches) == 0
+
+def test_invalid_location_is_rejected():
+    with pytest.raises(ValueError):
+        asyncio.run(GoogleDataService().search_nearby_business("NGO", "somewhere"))
+
+def fake_details(path, query):
+    place_id = query["place_id"][0]
+    if place_id == "missing":
+        return 200, {"status": "NOT_FOUND"}
+    if place_id == "broken":
+        return 200, {"status": "OVER_QUERY_LIMIT"}
+    return 200, {"status": "OK", "result": {
+        "name": f"Place {place_id}",
+        "formatted_address": "1 Main St",
+        "rating": 4.2,
+        "opening_hours": {"open_now": True, "weekday_text": ["Monday: 9-5"]},
+    }}
+
+def test_details_lookups_are_batched_deduplicated_and_cached():
+    with FakeHTTPServer(fake_details, delay=0.02) as server:
+        service = make_service(server.url)
+
+        async def run():
+            ids = [f"p{i % 20}" for i in range(40)] + ["missing"]
+            first = await asyncio.gather(*(service.get_business_details(place_id) for place_id in ids))
+            hits = len(server.requests)
+            again = await service.get_business_details_many(["p1", "p2"], fields=["name", "rating"])
+            # Only the short-lived fields expired: the next lookup refetches
+            service.details_cache.pop(("p1", "open_now"))
+            refreshed = await service.get_business_details("p1", fields=["name", "open_now"])
+            await service.close()
+            return first, hits, again, refreshed
+
+        first, hits, again, refreshed = asyncio.run(run())
+
+    assert service.details_loader.batches == 2
+    assert hits == 21
+    assert first[-1] is None and first[0].name == "Place p0" and first[0].opening_hours == ["Monday: 9-5"]
+    assert [d.model_dump(exclude_none=True) for d in again] == [
+        {"place_id": "p1", "name": "Place p1", "rating": 4.2},
+        {"place_id": "p2", "name": "Place p2", "rating": 4.2},
+    ]
+    assert refreshed.open_now is True
+    assert len(server.requests) == 22
+
+def test_failing_place_only_fails_its_own_callers():
+    with FakeHTTPServer(fake_details) as server:
+        service = make_service(server.url)
+
+        async def run():
+            results = await asyncio.gather(
+                service.get_business_details("good1"),
+                service.get_business_details("broken"),
+                service.get_business_details("good2"),
+                return_exceptions=True,
+            )
+            await service.close()
+            return results
+
+        good1, broken, good2 = asyncio.run(run())
+
+    assert service.details_loader.batches == 1
+    assert isinstance(broken, RuntimeError)
+    assert good1.name == "Place good1" and good2.name == "Place good2"
@@ -0,0 +1,87 @@
+import asyncio
+import threading
+import time
+import uuid
+from fastapi.testclient import TestClient
+from app.core.profiler import LoopLagMonitor, SamplingProfiler
+
+def burn_cpu(stop: threading.Event):
+    while not stop.is_set():
+        sum(range(100))
+
+def test_profiler_collapses_thread_and_task_stacks():
+    stop = threading.Event()
+    profiler = SamplingProfiler(interval=0.001)
+    worker = threading.Thread(target=burn_cpu, args=(stop,), name="burner")
+
+    def sample_then_stop():
+        profiler.run(0.2)
+        stop.set()
+
+    async def crunch():
+        # Blocks the loop until the profiler is done, like a hot coroutine would
+        burn_cpu(stop)
+
+    async def main():
+        profiler.watch_loop(asyncio.get_running_loop(), threading.get_ident())
+        threading.Thread(target=sample_then_stop).start()
+        await asyncio.create_task(crunch(), name="crunch")
+
+    worker.start()
+    asyncio.run(main())
+    worker.join()
+
+    lines = profiler.collapsed().splitlines()
+    assert profiler.samples > 0 and lines
+    stacks = {line.rsplit(" ", 1)[0]: int(line.rsplit(" ", 1)[1]) for line in lines}
+    assert any(s.startswith("burner;") and "threading:Thread.run;test_profiler:burn_cpu" in s for s in stacks)
+    assert any(s.startswith("MainThread;task:crunch;") and "crunch;test_profiler:burn_cpu" in s
+               for s in stacks)
+
+def blocking_call(monitor: LoopLagMonitor):
+    # Holds the loop until the watchdog has reported the stall
+    deadline = time.monotonic() + 10
+    while not monitor.stalls and time.monotonic() < deadline:
+        time.sleep(0.005)
+
+def test_loop_lag_monitor_reports_the_blocking_stack():
+    monitor = LoopLagMonitor(threshold=0.02, interval=0.01)
+
+    async def main():
+        monitor.start()
+        await asyncio.sleep(0.05)
+        blocking_call(monitor)
+        await monitor.stop()
+
+    asyncio.run(main())
+    assert len(monitor.stalls) == 1
+    stall = monitor.stalls[0]
+    assert stall.lag_ms > 20
+    assert stall.stack[-1] == "test_profiler:blocking_call"
+
+def test_profile_endpoint_is_admin_only():
+    from app.main import app
+    from app.core.config import settings
+    from app.auth.local_auth import create_access_token
+    from app.core.database import SessionLocal, User, init_db
+
+    init_db()
+    client = TestClient(app)
+    email = f"ops-{uuid.uuid4().hex[:8]}@example.com"
+    with SessionLocal() as db:
+        db.add(User(email=email, hashed_password="unused", full_name="Ops"))
+        db.commit()
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': email})}"}
+    url = f"{settings.API_V1_STR}/admin/profile"
+
+    assert client.get(url, params={"seconds": 0.05}).status_code == 401
+    assert client.get(url, params={"seconds": 0.05}, headers=headers).status_code == 403
+
+    with SessionLocal() as db:
+        db.query(User).filter(User.email == email).update({"is_superuser": True})
+        db.commit()
+    response = client.get(url, params={"seconds": 0.1, "interval_ms": 5, "include_idle": True}, headers=headers)
+    assert response.status_code == 200
+    assert int(response.headers["x-profile-samples"]) > 0
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in response.text.splitlines())
+    assert client.get(f"{settings.API_V1_STR}/admin/loop-stalls", headers=headers).status_code == 200
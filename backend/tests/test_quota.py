@@ -0,0 +1,94 @@
+import asyncio
+import httpx
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.auth.local_auth import create_access_token
+from app.core.quota import MemoryQuotaBackend, QuotaMiddleware, RequestLimiter, RouteTable
+
+def make_app(**limits) -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(QuotaMiddleware, limiter=RequestLimiter(MemoryQuotaBackend(), **limits))
+    release = asyncio.Event()
+    app.state.release = release
+
+    @app.get("/items")
+    async def items():
+        return []
+
+    @app.post("/apps/{app_id}/deploy")
+    async def deploy(app_id: str):
+        await release.wait()
+        return {"app": app_id}
+
+    @app.get("/health")
+    async def health():
+        return {"status": "online"}
+
+    return app
+
+def auth(email: str) -> dict:
+    return {"Authorization": f"Bearer {create_access_token({'sub': email})}"}
+
+def test_user_bucket_rejects_with_retry_after_per_user():
+    client = TestClient(make_app(user_rate=0.5, user_burst=2, routes={}))
+    alice, bob = auth("alice@example.com"), auth("bob@example.com")
+    assert [client.get("/items", headers=alice).status_code for _ in range(3)] == [200, 200, 429]
+    rejected = client.get("/items", headers=alice)
+    assert rejected.status_code == 429
+    assert rejected.headers["retry-after"] == "2"
+    assert client.get("/items", headers=bob).status_code == 200
+    # Exempt paths are never limited; invalid tokens fall back to the client IP
+    assert client.get("/health", headers=alice).status_code == 200
+    assert client.get("/items", headers={"Authorization": "Bearer forged"}).status_code == 200
+
+def test_route_bucket_matches_templated_paths():
+    routes = {"POST /apps/{app_id}/deploy": {"rate": 0.01, "burst": 1}}
+    app = make_app(user_rate=100, user_burst=100, routes=routes)
+    app.state.release.set()
+    client = TestClient(app)
+    headers = auth("alice@example.com")
+    assert client.post("/apps/wordpress/deploy", headers=headers).status_code == 200
+    rejected = client.post("/apps/ghost/deploy", headers=headers)
+    assert rejected.status_code == 429
+    assert int(rejected.headers["retry-after"]) == 100
+    assert client.get("/items", headers=headers).status_code == 200
+
+def test_concurrency_slots_are_per_user_and_released():
+    app = make_app(user_rate=100, user_burst=100, routes={"POST /apps/{app_id}/deploy": {"concurrency": 1}})
+    alice, bob = auth("alice@example.com"), auth("bob@example.com")
+
+    async def main():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            first = asyncio.create_task(client.post("/apps/a/deploy", headers=alice))
+            await asyncio.sleep(0.05)
+            second = await client.post("/apps/b/deploy", headers=alice)
+            other_user = asyncio.create_task(client.post("/apps/c/deploy", headers=bob))
+            await asyncio.sleep(0.05)
+            app.state.release.set()
+            statuses = [(await first).status_code, second.status_code, (await other_user).status_code]
+            third = await client.post("/apps/d/deploy", headers=alice)
+        return statuses, second.headers.get("retry-after"), third.status_code
+
+    statuses, retry_after, after_release = asyncio.run(main())
+    assert statuses == [200, 429, 200]
+    assert retry_after == "1"
+    assert after_release == 200
+
+def test_route_table_and_backend_pruning():
+    table = RouteTable({"POST /api/v1/agent/chat": {"rate": 1}, "POST /api/v1/apps/{app_id}/deploy": {"concurrency": 2}})
+    assert table.match("POST", "/api/v1/agent/chat/").name == "POST /api/v1/agent/chat"
+    assert table.match("POST", "/api/v1/apps/x.y/deploy").concurrency == 2
+    assert table.match("GET", "/api/v1/agent/chat") is None
+    assert table.match("POST", "/api/v1/apps/x/y/deploy") is None
+
+    backend = MemoryQuotaBackend(max_keys=2)
+
+    async def main():
+        await backend.hit("spent", 0.001, 1)
+        await backend.hit("fresh", 1000, 1)
+        await asyncio.sleep(0.01)
+        await backend.hit("new", 1, 1)
+
+    asyncio.run(main())
+    assert set(backend._buckets) == {"spent", "new"}
@@ -0,0 +1,33 @@
+import json
+from typing import List
+from fastapi.testclient import TestClient
+from app.ai.mcp_client import ToolDefinition, mcp_manager
+from app.core import responses
+from app.core.responses import FastJSONResponse, dump_model, dumps
+from app.main import app
+from app.services.domain import DomainSearchResult
+
+TOOLS = [ToolDefinition(name="run", description="Run a command", input_schema={"type": "object"})]
+
+class FakeClient:
+    async def list_tools(self):
+        return TOOLS
+
+def test_dump_model_matches_pydantic_json():
+    results = [DomainSearchResult(domain="example.com", available=True, price=9.99, extension=".com")]
+    assert json.loads(dump_model(results, List[DomainSearchResult])) == [r.model_dump(mode="json") for r in results]
+    assert dump_model(results[0]) == results[0].model_dump_json().encode()
+
+def test_dumps_renders_nested_models_with_and_without_orjson(monkeypatch):
+    content = {"tools": TOOLS, "count": 1, 2: "non-str key"}
+    expected = {"tools": [TOOLS[0].model_dump()], "count": 1, "2": "non-str key"}
+    assert json.loads(dumps(content)) == expected
+    monkeypatch.setattr(responses, "orjson", None)
+    assert json.loads(dumps(content)) == expected
+    assert json.loads(FastJSONResponse({"name": "é"}).body) == {"name": "é"}
+
+def test_mcp_tools_is_serialized_from_the_models(monkeypatch):
+    monkeypatch.setattr(mcp_manager, "clients", {"local": FakeClient()})
+    response = TestClient(app).get("/api/v1/mcp/tools")
+    assert response.status_code == 200
+    assert response.json() == {"tools": [TOOLS[0].model_dump()]}
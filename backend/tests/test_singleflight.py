@@ -0,0 +1,84 @@
+import asyncio
+import pytest
+from app.core.singleflight import SINGLEFLIGHT_CALLS, SingleFlight, singleflight
+from app.services.domain import DomainService, RDAPAvailabilityBackend
+from tests.fakes import FakeHTTPServer
+from tests.test_domain import rdap
+
+def test_concurrent_calls_share_one_run_and_its_exception():
+    flight = SingleFlight("test.shared")
+    runs = []
+
+    async def fetch(key):
+        runs.append(key)
+        await asyncio.sleep(0.02)
+        if key == "bad":
+            raise ValueError(key)
+        return [key]
+
+    async def main():
+        results = await asyncio.gather(*(flight.do(k, lambda k=k: fetch(k)) for k in ["a", "a", "a", "b"]))
+        failures = await asyncio.gather(*(flight.do("bad", lambda: fetch("bad")) for _ in range(3)), return_exceptions=True)
+        again = await flight.do("a", lambda: fetch("a"))
+        return results, failures, again
+
+    results, failures, again = asyncio.run(main())
+    assert results == [["a"], ["a"], ["a"], ["b"]] and results[0] is results[1]
+    assert all(isinstance(f, ValueError) for f in failures)
+    # Finished calls are forgotten: the next one runs again
+    assert again == ["a"] and runs == ["a", "b", "bad", "a"]
+    assert len(flight) == 0
+    assert SINGLEFLIGHT_CALLS.labels("test.shared", "collapsed").value == 4
+    assert SINGLEFLIGHT_CALLS.labels("test.shared", "leader").value == 4
+
+def test_cancelled_caller_does_not_cancel_the_others():
+    flight = SingleFlight("test.cancel")
+
+    async def slow():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def main():
+        first = asyncio.ensure_future(flight.do("k", slow))
+        second = asyncio.ensure_future(flight.do("k", slow))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(main()) == "done"
+
+def test_decorator_keys_by_instance_and_arguments():
+    class Service:
+        def __init__(self):
+            self.calls = 0
+
+        @singleflight("test.method", key=lambda self, q: (self, q.lower()))
+        async def search(self, q):
+            self.calls += 1
+            await asyncio.sleep(0.02)
+            return q.lower()
+
+    one, two = Service(), Service()
+
+    async def main():
+        return await asyncio.gather(one.search("NGO"), one.search("ngo"), one.search("school"), two.search("ngo"))
+
+    assert asyncio.run(main()) == ["ngo", "ngo", "school", "ngo"]
+    assert (one.calls, two.calls) == (2, 1)
+
+def test_identical_domain_checks_hit_the_registry_once():
+    with FakeHTTPServer(rdap, delay=0.02) as server:
+        backend = RDAPAvailabilityBackend(server.url, rate=1000)
+        service = DomainService(backends={ext: backend for ext in DomainService.SUPPORTED_EXTENSIONS})
+
+        async def run():
+            results = await asyncio.gather(*(service.check_availability(q) for q in ["ngo", "NGO", "ngo.com"] * 5))
+            await service.close()
+            return results
+
+        results = asyncio.run(run())
+
+    assert all(r == results[0] for r in results)
+    assert len(server.requests) == len(DomainService.SUPPORTED_EXTENSIONS)
@@ -0,0 +1,95 @@
+import asyncio
+import threading
+import time
+from app.services.data.social import HTTPPlatformAdapter, SocialDataService
+from tests.fakes import FakeHTTPServer
+
+def platform(host, found=True, keys_seen=None, barrier=None, delay=0.0):
+    """
+    Platform search stand-in returning one profile for the query.
+    With a barrier, the response waits until every platform has been called.
+    """
+    def handler(path, query):
+        if barrier is not None:
+            barrier.wait()
+        time.sleep(delay)
+        if keys_seen is not None:
+            keys_seen.append(query.get("key", [None])[0])
+        if not found:
+            return 200, {"profiles": []}
+        name = query["q"][0].replace(" ", "").lower()
+        return 200, {"profiles": [{"username": name, "url": f"https://{host}/{name}", "followers": len(host)}]}
+    return handler
+
+def test_fan_out_returns_partial_results_at_deadline():
+    # All three platforms must be in flight at once for any of them to answer
+    barrier = threading.Barrier(3, timeout=5)
+    with FakeHTTPServer(platform("instagram.com", barrier=barrier)) as fast, \
+         FakeHTTPServer(platform("facebook.com", barrier=barrier)) as medium, \
+         FakeHTTPServer(platform("x.com", barrier=barrier, delay=10)) as slow:
+        service = SocialDataService([
+            HTTPPlatformAdapter("instagram", fast.url),
+            HTTPPlatformAdapter("facebook", medium.url),
+            HTTPPlatformAdapter("x", slow.url),
+        ])
+
+        async def run():
+            profiles = await service.search_social_identity("Jane Doe", deadline=1.0)
+            await service.close()
+            return profiles
+
+        profiles = asyncio.run(run())
+
+    assert [p.platform for p in profiles] == ["instagram", "facebook"]
+    assert len(slow.requests) == 1
+
+def test_same_profile_is_deduplicated_and_empty_platforms_are_cached():
+    with FakeHTTPServer(platform("www.instagram.com")) as search, \
+         FakeHTTPServer(platform("instagram.com")) as insta, \
+         FakeHTTPServer(platform("facebook.com", found=False)) as empty:
+        service = SocialDataService([
+            HTTPPlatformAdapter("instagram", insta.url),
+            HTTPPlatformAdapter("bing_search", search.url),
+            HTTPPlatformAdapter("facebook", empty.url),
+        ])
+
+        async def run():
+            first = await service.search_social_identity("Jane Doe")
+            second = await service.search_social_identity("jane  doe")
+            await service.close()
+            return first, second
+
+        first, second = asyncio.run(run())
+
+    # www.instagram.com/janedoe and instagram.com/janedoe are one profile
+    assert len(first) == 1
+    assert first[0].url == "https://www.instagram.com/janedoe"
+    assert len(second) == 1
+    assert len(empty.requests) == 1
+    assert len(insta.requests) == 2
+
+def test_requests_rotate_across_api_keys_within_their_limits(monkeypatch):
+    from app.services.data import social
+
+    waits = []
+    real_sleep = asyncio.sleep
+
+    async def recording_sleep(delay):
+        waits.append(delay)
+        await real_sleep(delay)
+
+    monkeypatch.setattr(social.asyncio, "sleep", recording_sleep)
+    keys_seen = []
+    with FakeHTTPServer(platform("instagram.com", keys_seen=keys_seen)) as server:
+        adapter = HTTPPlatformAdapter("instagram", server.url, rate=100.0, api_keys=["k1", "k2"], key_rate=1.0)
+
+        async def run():
+            await asyncio.gather(*(adapter.search(f"user {i}") for i in range(3)))
+            await adapter.close()
+
+        asyncio.run(run())
+
+    assert sorted(keys_seen[:2]) == ["k1", "k2"]
+    assert len(keys_seen) == 3
+    # Both keys were spent, so the third call waited for a key to refill (1 token/second)
+    assert waits and max(waits) > 0.5
@@ -0,0 +1,50 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+
+HEAVY = ["docker", "paramiko", "googlemaps", "openai", "mcp"]
+
+def test_starting_the_app_defers_heavy_sdks_and_services():
+    code = (
+        "import json, os, sys\n"
+        "import app.main\n"
+        "from fastapi.testclient import TestClient\n"
+        "from app.services.image_prefetch import image_prefetcher\n"
+        "from app.services.provisioning import provisioning_service\n"
+        "from app.services.workflow import workflow_engine\n"
+        "with TestClient(app.main.app):\n"
+        "    pass\n"
+        f"print(json.dumps({{'loaded': [m for m in {HEAVY!r} if m in sys.modules],\n"
+        "                  'built': [p.initialized for p in (provisioning_service, workflow_engine, image_prefetcher)]}))\n"
+    )
+    backend = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = {**os.environ, "DATABASE_URL": os.environ.get("DATABASE_URL", "sqlite:///:memory:")}
+    result = subprocess.run([sys.executable, "-c", code], cwd=backend, env=env,
+                            capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    assert report == {"loaded": [], "built": [False, False, False]}
+
+def test_provider_builds_once_and_forwards():
+    from app.core.lazy import Provider
+
+    built = []
+
+    class Service:
+        value = 1
+        def close(self):
+            built.append("closed")
+
+    provider = Provider(lambda: built.append("built") or Service(), close_method="close")
+    assert not provider.initialized
+    provider.value = 2
+    assert provider.value == 2 and provider.get() is provider.get()
+    asyncio.run(provider.close())
+    assert built == ["built", "closed"] and not provider.initialized
+    # A closed service is never handed out again: the next use builds a new one
+    assert provider.value == 1 and built == ["built", "closed", "built"]
+    asyncio.run(provider.close())
+    asyncio.run(provider.close())
+    assert built == ["built", "closed", "built", "closed"]
@@ -0,0 +1,107 @@
+import asyncio
+import uuid
+from fastapi.testclient import TestClient
+from app.core.tracing import OTLPExporter, Tracer, annotate
+from tests.fakes import FakeHTTPServer
+
+def test_spans_nest_across_awaits_and_tasks():
+    tracer = Tracer(capacity=10)
+
+    async def ssh(node):
+        with tracer.span("ssh.execute", node=node):
+            await asyncio.sleep(0)
+
+    async def request():
+        with tracer.span("POST /agent/chat", request_id="req-1"):
+            with tracer.span("agent.chat"):
+                with tracer.span("tool.deploy_k3s_cluster"):
+                    annotate(cluster="k3s-a")
+                    await asyncio.gather(ssh("10.0.0.1"), ssh("10.0.0.2"))
+
+    asyncio.run(request())
+    waterfall = tracer.waterfall("req-1")
+    assert [(s.name, s.depth) for s in waterfall.spans] == [
+        ("POST /agent/chat", 0), ("agent.chat", 1), ("tool.deploy_k3s_cluster", 2),
+        ("ssh.execute", 3), ("ssh.execute", 3),
+    ]
+    root, _, tool, first, second = waterfall.spans
+    assert tool.attributes == {"cluster": "k3s-a"}
+    assert first.parent_id == second.parent_id == tool.span_id
+    assert all(s.duration_ms is not None and s.offset_ms >= 0 for s in waterfall.spans)
+    assert root.duration_ms == waterfall.duration_ms >= tool.duration_ms
+
+def test_errors_are_recorded_and_old_traces_evicted():
+    tracer = Tracer(capacity=2)
+    try:
+        with tracer.span("job", request_id="a"):
+            raise RuntimeError("boom")
+    except RuntimeError:
+        pass
+    assert tracer.waterfall("a").spans[0].error == "RuntimeError: boom"
+    for request_id in ["b", "c"]:
+        with tracer.span("job", request_id=request_id):
+            pass
+    assert tracer.get("a") is None and tracer.get("b") and tracer.get("c")
+
+def test_otlp_export_posts_finished_traces():
+    with FakeHTTPServer(lambda path, query: (200, {})) as collector:
+        exporter = OTLPExporter(f"{collector.url}/v1/traces", "ksf-test")
+        tracer = Tracer(capacity=10, exporter=exporter)
+
+        async def run():
+            with tracer.span("GET /health", request_id="req-2"):
+                with tracer.span("db.query", rows=3):
+                    pass
+            await exporter.close()
+
+        asyncio.run(run())
+    assert collector.requests == ["/v1/traces"]
+    spans = collector.bodies[0]["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    root, child = spans
+    assert child["parentSpanId"] == root["spanId"] and child["traceId"] == root["traceId"]
+    assert len(root["traceId"]) == 32 and len(root["spanId"]) == 16
+    assert {"key": "rows", "value": {"intValue": "3"}} in child["attributes"]
+    assert int(child["endTimeUnixNano"]) >= int(child["startTimeUnixNano"])
+
+def test_request_id_header_and_waterfall_endpoint():
+    from app.main import app
+    from app.auth.local_auth import create_access_token
+    from app.core.config import settings
+    from app.core.database import SessionLocal, User, init_db
+
+    init_db()
+    email = f"tracer-{uuid.uuid4().hex[:8]}@example.com"
+    with SessionLocal() as db:
+        db.add(User(email=email, hashed_password="unused", full_name="Ops", is_superuser=True))
+        db.commit()
+    admin = {"Authorization": f"Bearer {create_access_token({'sub': email})}"}
+    client = TestClient(app)
+    url = f"{settings.API_V1_STR}/admin/traces"
+
+    # The client's id is only an attribute: traces are stored under a generated id
+    response = client.get("/health", headers={"X-Request-ID": "trace-me-1"})
+    request_id = response.headers["x-request-id"]
+    assert len(request_id) == 32 and request_id != "trace-me-1"
+    assert client.get(f"{url}/{request_id}").status_code == 401
+    trace = client.get(f"{url}/{request_id}", headers=admin).json()
+    assert trace["spans"][0]["name"] == "GET /health"
+    assert trace["spans"][0]["attributes"] == {"client_request_id": "trace-me-1", "status": 200}
+    assert client.get(f"{url}/trace-me-1", headers=admin).status_code == 404
+
+    # Malformed ids are not recorded
+    generated = client.get("/health", headers={"X-Request-ID": "bad id\twith spaces"}).headers["x-request-id"]
+    assert client.get(f"{url}/{generated}", headers=admin).json()["spans"][0]["attributes"] == {"status": 200}
+
+def test_service_calls_become_child_spans():
+    from app.core.tracing import tracer
+    from app.services.k3s_manager import k3s_manager
+    from app.services.node_manager import ServerNode
+
+    async def run():
+        with tracer.span("POST /agent/chat", request_id="k3s-req"):
+            await k3s_manager.bootstrap_master(ServerNode(ip="127.0.0.1", name="master"))
+
+    asyncio.run(run())
+    spans = tracer.waterfall("k3s-req").spans
+    assert [(s.name, s.depth) for s in spans] == [("POST /agent/chat", 0), ("k3s.bootstrap_master", 1), ("ssh.execute", 2)]
+    assert spans[2].attributes == {"node": "127.0.0.1", "commands": 2}
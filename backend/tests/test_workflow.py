@@ -0,0 +1,141 @@
+import asyncio
+from app.services.workflow_pool import WarmWorkerPool
+
+def script(tmp_path, name, code):
+    path = tmp_path / name
+    path.write_text(code)
+    return str(path)
+
+def test_warm_worker_runs_script_and_is_replaced(tmp_path):
+    path = script(tmp_path, "hello.py", "import sys\nprint('hello', sys.argv[0].endswith('hello.py'))\n")
+    pool = WarmWorkerPool(size=1, isolate_network=False)
+
+    async def run():
+        assert await pool.ready() == 1
+        first = await pool.run(path)
+        assert await pool.ready() == 1
+        second = await pool.run(path)
+        idle = len(pool._spares)
+        await pool.close()
+        return first, second, idle
+
+    first, second, idle = asyncio.run(run())
+    assert (first.returncode, first.stdout, first.warm) == (0, "hello True\n", True)
+    assert second.warm
+    assert idle == 1
+
+def test_cold_path_when_pool_is_empty(tmp_path):
+    path = script(tmp_path, "cold.py", "raise SystemExit('boom')\n")
+    pool = WarmWorkerPool(size=0, isolate_network=False)
+    result = asyncio.run(pool.run(path))
+    assert not result.warm
+    assert result.returncode == 1 and "boom" in result.stderr
+
+def test_wall_time_and_memory_limits(tmp_path):
+    spin = script(tmp_path, "spin.py", "while True:\n    pass\n")
+    hog = script(tmp_path, "hog.py", "data = bytearray(512 * 1024 * 1024)\nprint('allocated')\n")
+    pool = WarmWorkerPool(size=0, memory_mb=128, isolate_network=False)
+
+    async def run():
+        return await pool.run(spin, timeout=0.5), await pool.run(hog)
+
+    spun, hogged = asyncio.run(run())
+    assert spun.timed_out and spun.returncode != 0
+    assert hogged.returncode != 0 and "MemoryError" in hogged.stderr
+
+def test_lines_longer_than_the_stream_limit(tmp_path):
+    path = script(tmp_path, "long.py", "import sys\nprint('x' * 200000)\nprint('tail', end='')\nsys.stderr.write('warned')\n")
+    pool = WarmWorkerPool(size=0, isolate_network=False)
+
+    async def run():
+        result = await pool.run(path)
+        # A caller that stops reading early still gets the worker and its stderr reader cleaned up
+        stream = pool.stream(path)
+        first = await stream.__anext__()
+        await stream.aclose()
+        pending = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        return result, first, pending
+
+    result, first, pending = asyncio.run(run())
+    assert result.returncode == 0 and result.stderr == "warned"
+    assert result.stdout == "x" * 200000 + "\ntail"
+    assert first == ("stdout", "x" * 200000 + "\n")
+    assert pending == []
+
+def test_output_is_streamed_and_concurrency_is_capped(tmp_path):
+    gate = tmp_path / "gate"
+    log = tmp_path / "log"
+    waiter = script(tmp_path, "waiter.py", (
+        "import os, time\n"
+        f"open({str(log)!r}, 'a').write('start\\n')\n"
+        "print('ready', flush=True)\n"
+        f"while not os.path.exists({str(gate)!r}):\n"
+        "    time.sleep(0.01)\n"
+        f"open({str(log)!r}, 'a').write('end\\n')\n"
+        "print('done')\n"
+    ))
+    pool = WarmWorkerPool(size=0, max_concurrency=1, isolate_network=False)
+
+    async def first_run():
+        lines = []
+        async for kind, value in pool.stream(waiter):
+            if kind == "stdout":
+                lines.append(value)
+                # The first line arrives while the script is still running
+                gate.touch()
+        return lines
+
+    async def run():
+        streamed, other = await asyncio.gather(first_run(), pool.run(waiter))
+        return streamed, other
+
+    streamed, other = asyncio.run(run())
+    assert streamed == ["ready\n", "done\n"]
+    assert other.stdout == "ready\ndone\n"
+    # One script at a time: the second only started after the first ended
+    assert log.read_text() == "start\nend\nstart\nend\n"
+
+def test_scripts_get_a_private_network_namespace(tmp_path):
+    import pytest
+
+    path = script(tmp_path, "net.py", "import socket\nprint(sorted(name for _, name in socket.if_nameindex()))\n")
+    result = asyncio.run(WarmWorkerPool(size=0, require_isolation=True).run(path))
+    if result.returncode == 126:
+        pytest.skip("network namespaces are not available here")
+    assert result.stdout == "['lo']\n"
+
+def test_scripts_are_content_addressed_and_pure_results_memoized(tmp_path):
+    from app.services.workflow import WorkflowGenerator
+
+    pool = WarmWorkerPool(size=0, isolate_network=False)
+    engine = WorkflowGenerator(pool=pool, workflow_dir=str(tmp_path))
+    code = "import json, sys\nprint(json.loads(sys.argv[1])['n'] * 2)\n"
+    runs = []
+    original = pool.stream
+
+    def counting_stream(path, timeout=None, args=None):
+        runs.append(path)
+        return original(path, timeout, args)
+
+    pool.stream = counting_stream
+
+    async def run():
+        # Same task name, different code: separate files, no overwrite
+        a, b = await asyncio.gather(
+            engine.generate_and_execute("job", code, pure=True, inputs={"n": 2}),
+            engine.generate_and_execute("job", "print('other')\n"),
+        )
+        again = await engine.generate_and_execute("renamed", code, pure=True, inputs={"n": 2})
+        other_input = await engine.generate_and_execute("job", code, pure=True, inputs={"n": 5})
+        broken = await engine.generate_and_execute("job", "def broken(:\n")
+        return a, b, again, other_input, broken
+
+    a, b, again, other_input, broken = asyncio.run(run())
+    assert (a.status, a.output, a.cached) == ("success", "4", False)
+    assert b.output == "other" and b.filename != a.filename
+    assert (again.output, again.cached, again.filename) == ("4", True, a.filename)
+    assert (other_input.output, other_input.cached) == ("10", False)
+    assert broken.status == "error" and "SyntaxError" in broken.output
+    # Compiled once per distinct script; the memoized run did not execute
+    assert len(runs) == 3 and all(path.endswith(".pyc") for path in runs)
+    assert sorted(p.suffix for p in tmp_path.iterdir()) == [".py", ".py", ".pyc", ".pyc"]